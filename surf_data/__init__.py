@@ -1,5 +1,6 @@
 from dataclasses import dataclass
 from enum import Enum
+import os
 from typing import Dict, Optional
 
 
@@ -59,3 +60,138 @@ class DynamoDBConfig:
     REGION = "us-west-2"
     PARTITION_KEY = "spot_name"
     SORT_KEY = "entry_date"
+    # Point this at DynamoDB Local or similar for benchmarking
+    ENDPOINT_URL: Optional[str] = os.getenv("SURF_DATA_DYNAMODB_ENDPOINT_URL")
+    MAX_POOL_CONNECTIONS = 10
+    CONNECT_TIMEOUT_SECONDS = 2
+    READ_TIMEOUT_SECONDS = 5
+    MAX_RETRY_ATTEMPTS = 4
+    # "adaptive" also backs off client side when DynamoDB starts throttling us
+    RETRY_MODE = "adaptive"
+
+
+class HTTPCacheConfig:
+    # Lambda gives us 512MB of /tmp by default
+    CACHE_DIR = "/tmp/surf_data_http_cache"
+    MAX_BYTES = 64 * 1024 * 1024
+    # How long we'll use a cached response without checking back with the server.
+    # NDBC updates realtime2 files about once an hour,
+    # and tide predictions never change.
+    TTL_SECONDS = {
+        "ndbc_realtime": 10 * 60,
+        # latest_obs.txt gets rewritten every few minutes
+        "ndbc_latest_obs": 5 * 60,
+        "noaa_tides": 24 * 60 * 60,
+        "noaa_harmonics": 30 * 24 * 60 * 60,
+        "station_lists": 7 * 24 * 60 * 60,
+    }
+
+
+class RuntimeConfig:
+    # Connections that have been idle longer than this (say the lambda was frozen)
+    # are assumed to be dead, so we start a new session.
+    IDLE_RESET_SECONDS = 60
+    KEEPALIVE_SECONDS = 60
+    DNS_CACHE_SECONDS = 10 * 60
+    CONNECTIONS_PER_HOST = 10
+    REQUEST_TIMEOUT_SECONDS = 10
+
+
+class StationHealthConfig:
+    # Failures in a row before we stop asking a station for data
+    FAILURE_THRESHOLD = 2
+    # How often we let a request through to a station with an open circuit
+    PROBE_INTERVAL_SECONDS = 30 * 60
+    # A station whose newest record is older than this counts as failing
+    STALE_AFTER_SECONDS = 6 * 60 * 60
+    LATENCY_SAMPLES = 20
+    # Set this to a table name (partition key "station_id") to persist station health
+    TABLE_NAME: Optional[str] = None
+
+
+class FetchConfig:
+    # Alexa gives up on us after about 8 seconds
+    SPOT_DATA_DEADLINE_SECONDS = 6.5
+    # If a buoy is slower than this percentile of its recent response times,
+    # we ask the fallback buoy as well.
+    HEDGE_LATENCY_PERCENTILE = 90
+    HEDGE_DEFAULT_DELAY_SECONDS = 1.5
+    HEDGE_MIN_DELAY_SECONDS = 0.3
+    HEDGE_MAX_DELAY_SECONDS = 3.0
+    # Spots that share a station share one fetch, and its result
+    # gets handed out for this long after it finishes.
+    SHARED_RESULT_SECONDS = 60
+    SHARED_RESULT_MAX_ENTRIES = 128
+    # Buoy reports are shared between requests within the same bucket of time
+    BUOY_REPORT_BUCKET_SECONDS = 3600
+    # In batch lookups, a record further than this from the time we asked about
+    # doesn't count
+    MAX_RECORD_OFFSET_SECONDS = 3 * 60 * 60
+    # "interpolate" reads each column between the records either side of the time
+    # we asked about. "closest" just takes the nearest record.
+    RECORD_SELECTION = "interpolate"
+    # Records further apart than this are too far apart to interpolate between
+    MAX_INTERPOLATION_GAP_SECONDS = 3 * 60 * 60
+    # Read current weather for every buoy from NDBC's one latest_obs.txt,
+    # rather than downloading each buoy's realtime2 .txt
+    USE_LATEST_OBS = True
+    # A station's latest observation only stands in for times up to this long after it.
+    # Anything else reads the station's realtime2 report.
+    LATEST_OBS_MAX_AGE_SECONDS = 60 * 60
+    # Also read the raw wave spectra (.data_spec and .swdir) to pick out every swell
+    FETCH_SPECTRA = True
+
+
+class NDBCArchiveConfig:
+    # realtime2 only reaches back this far. Anything older comes from the archives.
+    REALTIME_DAYS = 45
+    # Parsed months of archive data, plus an index of which months each station has
+    CACHE_DIR: Optional[str] = "/tmp/surf_data_ndbc_archive"
+    # How many (station, product, month) blocks we keep in memory
+    MAX_CACHED_MONTHS = 24
+    # A year of 10 minute data is a few MB gzipped, which takes a while
+    DOWNLOAD_TIMEOUT_SECONDS = 60
+    DOWNLOAD_CHUNK_BYTES = 64 * 1024
+
+
+class StationCatalogConfig:
+    # A JSON file of spots by position, like
+    # {"Linda Mar": {"lat": 37.594, "lon": -122.504, "surfline_spot_id": null}}
+    # They get the nearest buoys and tide station when the process starts.
+    SPOT_LOCATIONS_FILE: Optional[str] = os.getenv("SURF_DATA_SPOT_LOCATIONS_FILE")
+    # If we couldn't get the station lists, carry on without those spots
+    # and try again after this long
+    RETRY_AFTER_SECONDS = 10 * 60
+
+
+class TideConfig:
+    # "harmonic" predicts tides locally from each station's harmonic constituents.
+    # "noaa" asks the CO-OPS datagetter API for hourly predictions a month at a time.
+    PREDICTION_SOURCE = "harmonic"
+    # How many (station, month) blocks of predictions we keep in memory
+    MAX_CACHED_MONTHS = 48
+
+
+class SnapshotConfig:
+    # A table (partition key "spot_name") to share snapshots written by the scheduled
+    # prewarm job. The prewarm job needs it. Without it, spot checks keep the
+    # snapshots they fetch themselves in memory.
+    TABLE_NAME: Optional[str] = os.getenv("SURF_DATA_SNAPSHOT_TABLE_NAME")
+    # Snapshots in memory older than this get checked against the table,
+    # in case the prewarm job has written a newer one
+    REFRESH_AFTER_SECONDS = 20 * 60
+    # Older snapshots are ignored and we fetch live
+    MAX_AGE_SECONDS = 2 * 60 * 60
+
+
+class EnrichmentConfig:
+    # Set this to an SQS queue that triggers enrichment.sqs_handler.
+    # Otherwise pending entries wait for enrichment.scheduled_handler to sweep them up.
+    QUEUE_URL: Optional[str] = os.getenv("SURF_DATA_ENRICHMENT_QUEUE_URL")
+    # After this many failed attempts we give up and mark the entry failed
+    MAX_ATTEMPTS = 8
+    # Attempt n waits BACKOFF_BASE_SECONDS * 2**n, up to BACKOFF_MAX_SECONDS
+    BACKOFF_BASE_SECONDS = 60
+    BACKOFF_MAX_SECONDS = 6 * 60 * 60
+    # How many entries the scheduled sweep fetches conditions for at once
+    CONCURRENT_ENTRIES = 8
@@ -5,26 +5,30 @@ the intent handlers.
 """
 
 
+from typing import Any, Dict
 from ask_sdk_core.skill_builder import SkillBuilder
-from surf_data import alexa_handlers
+from surf_data import StationCatalogConfig, alexa_handlers
 
 # The SkillBuilder object acts as the entry point for your skill,
 # routing all request and response payloads to the handlers above.
-# Make sure any new handlers or interceptors you've defined are included below.
-# The order matters - they're processed top to bottom.
 
 
 sb = SkillBuilder()
 
-sb.add_request_handler(alexa_handlers.LaunchRequestHandler())
-sb.add_request_handler(alexa_handlers.GetConditionsHandler())
-sb.add_request_handler(alexa_handlers.LogEntryHandler())
-sb.add_request_handler(alexa_handlers.HelpIntentHandler())
-sb.add_request_handler(alexa_handlers.CancelOrStopIntentHandler())
-sb.add_request_handler(alexa_handlers.SessionEndedRequestHandler())
-# make sure IntentReflectorHandler is last so it doesn't
-# override your custom intent handlers
-sb.add_request_handler(alexa_handlers.IntentReflectorHandler())
+# LazyRequestHandler routes by request type and intent name, and only imports
+# a handler the first time it's needed. Register new handlers in
+# alexa_handlers/lazy_registry.py rather than here.
+sb.add_request_handler(alexa_handlers.LazyRequestHandler())
 sb.add_exception_handler(alexa_handlers.CatchAllExceptionHandler())
 
-lambda_handler = sb.lambda_handler()
\ No newline at end of file
+skill_handler = sb.lambda_handler()
+
+
+def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    if StationCatalogConfig.SPOT_LOCATIONS_FILE is not None:
+        # the station catalog pulls in numpy, so only import it if there are
+        # spots by position to add before any handler looks at SPOT_MAPPING
+        from surf_data.lib.station_catalog import ensure_located_spots
+
+        ensure_located_spots()
+    return skill_handler(event, context)
@@ -1,11 +1,16 @@
-from .cancel_intent import CancelOrStopIntentHandler
-from .exception_handler import CatchAllExceptionHandler
-from .help_intent import HelpIntentHandler
-from .intent_reflector import IntentReflectorHandler
-from .launch_request import LaunchRequestHandler
-from .log_entry import LogEntryHandler
-from .session_ended_request import SessionEndedRequestHandler
-from .get_current_conditions import GetConditionsHandler
+"""
+Handlers are imported lazily, see lazy_registry.py.
+Grabbing one off this package, like alexa_handlers.LogEntryHandler,
+imports its module right then.
+"""
+
+from .lazy_registry import HANDLER_MODULES, LazyRequestHandler, load_handler_class
+
+
+def __getattr__(name: str) -> type:
+    if name in HANDLER_MODULES:
+        return load_handler_class(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 __all__ = [
@@ -17,4 +22,6 @@ __all__ = [
     "LogEntryHandler",
     "SessionEndedRequestHandler",
     "GetConditionsHandler",
+    "GetAllConditionsHandler",
+    "LazyRequestHandler",
 ]
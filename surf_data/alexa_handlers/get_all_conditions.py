@@ -0,0 +1,65 @@
+from ask_sdk_core.dispatch_components import AbstractRequestHandler
+import ask_sdk_core.utils as ask_utils
+from surf_data import SPOT_MAPPING
+from surf_data.lib.alexa_helpers import prepare_spot_check_farewell
+from surf_data.get_data import get_all_spot_data
+from surf_data.lib.runtime import RUNTIME
+
+import typing
+if typing.TYPE_CHECKING:
+    from ask_sdk_model import Response
+    from ask_sdk_core.handler_input import HandlerInput
+
+
+def _join_spot_names(spot_names: typing.List[str]) -> str:
+    if len(spot_names) == 1:
+        return spot_names[0]
+    return f"{', '.join(spot_names[:-1])} and {spot_names[-1]}"
+
+
+def prepare_all_spots_report() -> str:
+    """
+    grabs wave and tide data for every spot in one go.
+    Spots that share a buoy and tide station get read out together.
+    """
+    all_spot_data = RUNTIME.run(lambda session: get_all_spot_data(session=session))
+    spot_groups: typing.Dict[tuple, typing.List[str]] = {}
+    for spot_name, spot in SPOT_MAPPING.items():
+        key = (spot.nbdc_buoy_id, spot.fallback_buoy_id, spot.noaa_tide_station_id)
+        spot_groups.setdefault(key, []).append(spot_name)
+    reports = []
+    for spot_names in spot_groups.values():
+        wave, tide = all_spot_data[spot_names[0]]
+        tide_report = (
+            tide.serialize_for_alexa()
+            if tide
+            else "I couldn't get the tide data in time."
+        )
+        wave_report = (
+            wave.serialize_for_alexa()
+            if wave
+            else "I couldn't get the buoy data in time."
+        )
+        reports.append(
+            f"For {_join_spot_names(spot_names)}. {tide_report} {wave_report}"
+        )
+    return f"{' '.join(reports)} {prepare_spot_check_farewell()}"
+
+
+class GetAllConditionsHandler(AbstractRequestHandler):
+    """
+    Used for grabbing tide and wave conditions for every spot we know about
+    """
+    def can_handle(self, handler_input):
+        # type: (HandlerInput) -> bool
+        return ask_utils.is_intent_name("get_all_conditions")(handler_input)
+
+    def handle(self, handler_input):
+        # type: (HandlerInput) -> Response
+        output = prepare_all_spots_report()
+
+        return (
+            handler_input.response_builder
+                         .speak(output)
+                         .response
+        )
@@ -1,8 +1,7 @@
-import asyncio
 from ask_sdk_core.dispatch_components import AbstractRequestHandler
 import ask_sdk_core.utils as ask_utils
 from surf_data.lib.alexa_helpers import resolve_canonical_value, prepare_spot_check_farewell
-from surf_data.get_data import get_spot_data
+from surf_data.snapshots import get_spot_snapshot
 
 import typing
 if typing.TYPE_CHECKING:
@@ -15,11 +14,17 @@ def prepare_spot_condition_report(spot: str) -> str:
     grabs wave and tide data and pops them into a string for
     Alexa to speak.
     """
-    wave, tide = asyncio.run(get_spot_data(spot))
+    wave, tide = get_spot_snapshot(spot)
+    tide_report = (
+        tide.serialize_for_alexa() if tide else "I couldn't get the tide data in time."
+    )
+    wave_report = (
+        wave.serialize_for_alexa() if wave else "I couldn't get the buoy data in time."
+    )
     return (
         f"Here's your report for {spot}. "
-        f"{tide.serialize_for_alexa()} "
-        f"{wave.serialize_for_alexa()} "
+        f"{tide_report} "
+        f"{wave_report} "
         f"{prepare_spot_check_farewell()}"
     )
 
@@ -0,0 +1,99 @@
+"""
+Routes requests to handlers without importing them all up front.
+
+Some handlers drag in heavy dependencies (boto3 for the log entry,
+aiohttp and numpy for the spot checks), and importing every handler
+at module load makes every cold start pay for all of them.
+Instead we look up the handler by request type or intent name
+and only import its module the first time it's needed.
+"""
+
+from importlib import import_module
+from typing import Dict, Optional, Tuple
+from ask_sdk_core.dispatch_components import AbstractRequestHandler
+import ask_sdk_core.utils as ask_utils
+
+import typing
+if typing.TYPE_CHECKING:
+    from ask_sdk_model import Response
+    from ask_sdk_core.handler_input import HandlerInput
+
+
+# handler class name -> the module it lives in
+HANDLER_MODULES: Dict[str, str] = {
+    "CancelOrStopIntentHandler": ".cancel_intent",
+    "CatchAllExceptionHandler": ".exception_handler",
+    "HelpIntentHandler": ".help_intent",
+    "IntentReflectorHandler": ".intent_reflector",
+    "LaunchRequestHandler": ".launch_request",
+    "LogEntryHandler": ".log_entry",
+    "SessionEndedRequestHandler": ".session_ended_request",
+    "GetConditionsHandler": ".get_current_conditions",
+    "GetAllConditionsHandler": ".get_all_conditions",
+}
+
+# request type -> handler class name
+REQUEST_TYPE_HANDLERS: Dict[str, str] = {
+    "LaunchRequest": "LaunchRequestHandler",
+    "SessionEndedRequest": "SessionEndedRequestHandler",
+}
+
+# intent name -> handler class name
+INTENT_HANDLERS: Dict[str, str] = {
+    "get_conditions": "GetConditionsHandler",
+    "get_all_conditions": "GetAllConditionsHandler",
+    "log_entry": "LogEntryHandler",
+    "AMAZON.HelpIntent": "HelpIntentHandler",
+    "AMAZON.CancelIntent": "CancelOrStopIntentHandler",
+    "AMAZON.StopIntent": "CancelOrStopIntentHandler",
+}
+
+# Any other intent gets repeated back to the user
+FALLBACK_INTENT_HANDLER = "IntentReflectorHandler"
+
+
+def load_handler_class(class_name: str) -> type:
+    module = import_module(HANDLER_MODULES[class_name], package=__package__)
+    return getattr(module, class_name)
+
+
+class LazyRequestHandler(AbstractRequestHandler):
+    """
+    The only request handler the skill builder sees.
+    It picks the real handler for each request, building it on first use.
+    """
+    def __init__(self) -> None:
+        self._handlers: Dict[str, AbstractRequestHandler] = {}
+
+    def _get_handler_name(self, handler_input: "HandlerInput") -> Optional[str]:
+        request_type = ask_utils.get_request_type(handler_input)
+        if request_type == "IntentRequest":
+            intent_name = ask_utils.get_intent_name(handler_input)
+            return INTENT_HANDLERS.get(intent_name, FALLBACK_INTENT_HANDLER)
+        return REQUEST_TYPE_HANDLERS.get(request_type)
+
+    def get_handler(self, class_name: str) -> AbstractRequestHandler:
+        if class_name not in self._handlers:
+            self._handlers[class_name] = load_handler_class(class_name)()
+        return self._handlers[class_name]
+
+    def can_handle(self, handler_input):
+        # type: (HandlerInput) -> bool
+        return self._get_handler_name(handler_input) is not None
+
+    def handle(self, handler_input):
+        # type: (HandlerInput) -> Response
+        handler = self.get_handler(self._get_handler_name(handler_input))
+        return handler.handle(handler_input)
+
+
+def get_registered_handlers() -> Tuple[str, ...]:
+    """
+    Every handler the registry can route to, for checking they all import.
+    """
+    return tuple(
+        sorted(
+            {*REQUEST_TYPE_HANDLERS.values(), *INTENT_HANDLERS.values()}
+            | {FALLBACK_INTENT_HANDLER}
+        )
+    )
@@ -1,6 +1,7 @@
 from ask_sdk_core.dispatch_components import AbstractRequestHandler
 import ask_sdk_core.utils as ask_utils
-from surf_data.log_entry import LogEntry, prepare_and_submit_entry
+from surf_data.enrichment import submit_entry
+from surf_data.log_entry import LogEntry
 from surf_data.lib.time_helpers import map_time_to_datetime
 from surf_data.lib.alexa_helpers import resolve_canonical_value, prepare_log_entry_farewell
 
@@ -26,7 +27,8 @@ class LogEntryHandler(AbstractRequestHandler):
         notes = slots['notes'].value
         rating = slots['rating'].value
         entry = LogEntry(entry_date=entry_datetime, spot_name=spot, rating=rating, notes=notes)
-        prepare_and_submit_entry(entry)
+        # the buoy and tide data get added to the entry after we've answered
+        submit_entry(entry)
         speak_output = f"""
             <speak>
                 I've logged the entry for {spot}.
@@ -0,0 +1,187 @@
+"""
+Fills in missing conditions on diary entries that are already in the table.
+
+    python -m surf_data.backfill --dry-run
+    python -m surf_data.backfill --spot "Ocean Beach" --requests-per-second 2
+
+An entry gets picked up if it's missing wind_and_waves or tides (enrichment
+gave up on it, or it's older than enrichment), or if it's still an old style item.
+We page through each spot's entries with a Query, since the spot is the
+partition key, and then resolve everything we found in one go with
+bulk_import.resolve_conditions. That fetches once per (buoy, month) and once
+per tide station, whichever spots the entries are for, and only for whatever
+each entry is missing. Entries older than 45 days come from the NDBC archives.
+
+A semaphore and a token bucket keep the fetches polite to NDBC and NOAA.
+The updates all go out at once, capped by the DynamoDB thread pool.
+Each update only sets the condition attributes (and drops old style ones),
+so it's safe to run again if it gets interrupted.
+"""
+
+import argparse
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from aiohttp import ClientSession
+from surf_data import SPOT_MAPPING, DynamoDBConfig
+from surf_data.bulk_import import ImportProgress, resolve_conditions
+from surf_data.lib.diary_items import (
+    SCHEMA_VERSION_ATTRIBUTE,
+    encode_conditions,
+    get_legacy_attributes,
+)
+from surf_data.lib.dynamo import AsyncSurfDiaryDB
+from surf_data.lib.runtime import RUNTIME
+from surf_data.lib.station_catalog import ensure_located_spots
+from surf_data.lib.time_helpers import ensure_timezone
+from surf_data.lib.token_bucket import TokenBucket
+from surf_data.log_entry import EnrichmentStatus, LogEntry
+
+
+# Fetches per second we allow ourselves on average, and how many can go at once
+REQUESTS_PER_SECOND = 4
+REQUEST_BURST = 8
+QUERY_PAGE_SIZE = 200
+
+# An entry to backfill, and the old style attributes to drop from its item
+Candidate = Tuple[LogEntry, List[str]]
+
+
+@dataclass
+class BackfillSummary:
+    scanned: int = 0
+    selected: int = 0
+    # selected entries that now have both wind_and_waves and tides
+    complete: int = 0
+    failed_writes: int = 0
+
+
+def select_entry(item: Dict[str, Any]) -> Optional[Candidate]:
+    """
+    Returns the entry if its item needs backfilling, otherwise None.
+    """
+    entry = LogEntry.from_database_item(item)
+    if (
+        SCHEMA_VERSION_ATTRIBUTE in item
+        and entry.wind_and_waves is not None
+        and entry.tides is not None
+    ):
+        return None
+    # entry dates are stored as pacific time without a time zone
+    entry.entry_date = ensure_timezone(entry.entry_date)
+    return entry, get_legacy_attributes(item)
+
+
+async def find_candidates(
+    db: AsyncSurfDiaryDB,
+    spot_names: Sequence[str],
+    summary: BackfillSummary,
+    page_size: int = QUERY_PAGE_SIZE,
+) -> List[Candidate]:
+    async def find_for_spot(spot_name: str) -> List[Candidate]:
+        candidates = []
+        async for page in db.query_spot(spot_name, page_size):
+            summary.scanned += len(page)
+            for item in page:
+                try:
+                    candidate = select_entry(item)
+                except (KeyError, ValueError):
+                    logging.exception(f"Skipping unreadable item {item}")
+                    continue
+                if candidate is not None:
+                    candidates.append(candidate)
+        logging.info(f"{len(candidates)} entries for {spot_name} need backfilling")
+        return candidates
+
+    per_spot = await asyncio.gather(*(find_for_spot(name) for name in spot_names))
+    return [candidate for candidates in per_spot for candidate in candidates]
+
+
+def get_update(
+    entry: LogEntry, legacy_attributes: List[str]
+) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    The attributes to set on the entry's item, and the ones to remove.
+    """
+    remove = list(legacy_attributes)
+    complete = entry.wind_and_waves is not None and entry.tides is not None
+    if complete and entry.enrichment_status is not None:
+        entry.enrichment_status = EnrichmentStatus.done
+        entry.enrich_after = None
+        remove.append("enrich_after")
+    attributes = {
+        **encode_conditions(entry.wind_and_waves, entry.tides),
+        **entry.serialize_enrichment_state(),
+    }
+    return attributes, remove
+
+
+async def backfill(
+    session: ClientSession,
+    db: AsyncSurfDiaryDB,
+    spot_names: Optional[Sequence[str]] = None,
+    rate_limit: Optional[TokenBucket] = None,
+    dry_run: bool = False,
+) -> BackfillSummary:
+    if spot_names is None:
+        spot_names = list(SPOT_MAPPING)
+    if rate_limit is None:
+        rate_limit = TokenBucket(REQUESTS_PER_SECOND, REQUEST_BURST)
+    summary = BackfillSummary()
+    candidates = await find_candidates(db, spot_names, summary)
+    summary.selected = len(candidates)
+    await resolve_conditions(session, [entry for entry, _ in candidates], rate_limit)
+    summary.complete = sum(
+        entry.wind_and_waves is not None and entry.tides is not None
+        for entry, _ in candidates
+    )
+    logging.info(
+        f"Scanned {summary.scanned} entries, {summary.selected} needed backfilling "
+        f"and {summary.complete} of those are now complete"
+    )
+    if dry_run:
+        logging.info(f"Dry run, so not updating {summary.selected} entries")
+        return summary
+    progress = ImportProgress(total=len(candidates))
+
+    async def write(entry: LogEntry, legacy_attributes: List[str]) -> None:
+        attributes, remove = get_update(entry, legacy_attributes)
+        await db.update_entry(entry.key, attributes, remove)
+        progress.record_batch(1)
+
+    results = await asyncio.gather(
+        *(write(entry, legacy) for entry, legacy in candidates),
+        return_exceptions=True,
+    )
+    for (entry, _), result in zip(candidates, results):
+        if isinstance(result, Exception):
+            logging.error(f"Couldn't update {entry.key}", exc_info=result)
+            summary.failed_writes += 1
+    return summary
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    # so spots by position are --spot choices too
+    ensure_located_spots()
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--spot",
+        action="append",
+        choices=list(SPOT_MAPPING),
+        help="only backfill this spot, can be given more than once",
+    )
+    parser.add_argument("--table", default=DynamoDBConfig.TABLE_NAME)
+    parser.add_argument(
+        "--requests-per-second", type=float, default=REQUESTS_PER_SECOND
+    )
+    parser.add_argument("--burst", type=int, default=REQUEST_BURST)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    db = AsyncSurfDiaryDB(args.table)
+    rate_limit = TokenBucket(args.requests_per_second, args.burst)
+    summary = RUNTIME.run(
+        lambda session: backfill(session, db, args.spot, rate_limit, args.dry_run)
+    )
+    print(summary)
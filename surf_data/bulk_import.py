@@ -0,0 +1,236 @@
+"""
+Imports a pile of diary entries at once, with their conditions.
+
+    python -m surf_data.bulk_import sessions.csv
+    python -m surf_data.bulk_import sessions.jsonl --dry-run
+
+Each entry needs spot_name, entry_date, rating and notes.
+entry_date can be "2022-09-10 17:00:00" or any ISO format, pacific time unless it says.
+Times in other zones are converted to pacific, which is how entries are stored.
+CSV files need a header row with those names. JSONL files have one object per line.
+
+Entries get grouped by (buoy, month) so each buoy's reports are fetched once
+per group, and by tide station for the tides. The groups are all resolved at
+the same time. Entries we couldn't get conditions for are saved as pending,
+so the enrichment sweep tries them again later.
+The items go out through BatchWriteItem, see AsyncSurfDiaryDB.batch_put.
+"""
+
+import argparse
+import asyncio
+import csv
+from dataclasses import dataclass, field
+from datetime import datetime
+import json
+import logging
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from aiohttp import ClientSession
+from surf_data import SPOT_MAPPING, DynamoDBConfig
+from surf_data.lib.buoys import get_station_data_for_times
+from surf_data.lib.dynamo import DDB_DATE_FORMAT, AsyncSurfDiaryDB
+from surf_data.lib.runtime import RUNTIME
+from surf_data.lib.station_catalog import ensure_located_spots
+from surf_data.lib.tides import get_tide_data_for_times
+from surf_data.lib.token_bucket import TokenBucket
+from surf_data.lib.time_helpers import PST_TIME_ZONE, UTC_TIME_ZONE, ensure_timezone
+from surf_data.log_entry import EnrichmentStatus, LogEntry
+
+
+# How many (buoy, month) or tide station groups we resolve at once
+CONCURRENT_GROUPS = 8
+# How often we log progress while writing
+PROGRESS_EVERY_ITEMS = 250
+REQUIRED_FIELDS = ("spot_name", "entry_date", "rating", "notes")
+
+
+def parse_entry_date(raw_date: str) -> datetime:
+    """
+    Entries are stored by their pacific wall clock time,
+    so dates in other time zones get converted to pacific.
+    """
+    try:
+        parsed = datetime.strptime(raw_date, DDB_DATE_FORMAT)
+    except ValueError:
+        parsed = datetime.fromisoformat(raw_date)
+    return ensure_timezone(parsed).astimezone(PST_TIME_ZONE)
+
+
+def parse_entry(row: Dict[str, Any]) -> LogEntry:
+    missing = [name for name in REQUIRED_FIELDS if not row.get(name)]
+    if missing:
+        raise ValueError(f"Entry {row} is missing {', '.join(missing)}")
+    if row["spot_name"] not in SPOT_MAPPING:
+        raise ValueError(f"Unknown spot {row['spot_name']!r}")
+    return LogEntry(
+        entry_date=parse_entry_date(row["entry_date"]),
+        spot_name=row["spot_name"],
+        rating=row["rating"],
+        notes=row["notes"],
+    )
+
+
+def read_entries(path: str) -> Iterator[LogEntry]:
+    with open(path, newline="") as entry_file:
+        if path.endswith(".jsonl"):
+            rows: Iterator[Dict[str, Any]] = (
+                json.loads(line) for line in entry_file if line.strip()
+            )
+        elif path.endswith(".csv"):
+            rows = csv.DictReader(entry_file)
+        else:
+            raise ValueError(f"Can only import .csv or .jsonl files, not {path}")
+        for row in rows:
+            yield parse_entry(row)
+
+
+def _month_of(entry: LogEntry) -> Tuple[int, int]:
+    """
+    The UTC month, since that's how the buoy archives are split up.
+    A Pacific evening on the last of the month is already next month there.
+    """
+    utc_date = ensure_timezone(entry.entry_date).astimezone(UTC_TIME_ZONE)
+    return utc_date.year, utc_date.month
+
+
+async def _resolve_group(
+    semaphore: asyncio.Semaphore,
+    description: str,
+    fetch: Any,
+    entries: Sequence[LogEntry],
+    rate_limit: Optional[TokenBucket] = None,
+) -> List[Any]:
+    """
+    Runs one group's batch fetch. A failed group just leaves its entries empty.
+    """
+    async with semaphore:
+        if rate_limit is not None:
+            await rate_limit.acquire()
+        try:
+            return await fetch([entry.entry_date for entry in entries])
+        except Exception:
+            logging.exception(f"Couldn't get {description}")
+            return [None] * len(entries)
+
+
+async def resolve_conditions(
+    session: ClientSession,
+    entries: Sequence[LogEntry],
+    rate_limit: Optional[TokenBucket] = None,
+) -> None:
+    """
+    Fills in whichever of wind_and_waves and tides are missing on the entries,
+    in place. With a rate_limit, each group's fetch waits for a token first,
+    and so does each month of tides a group has to ask NOAA for.
+    """
+    buoy_groups: Dict[Tuple[int, int, Tuple[int, int]], List[LogEntry]] = {}
+    tide_groups: Dict[int, List[LogEntry]] = {}
+    for entry in entries:
+        spot = SPOT_MAPPING[entry.spot_name]
+        if entry.wind_and_waves is None:
+            buoy_key = (spot.nbdc_buoy_id, spot.fallback_buoy_id, _month_of(entry))
+            buoy_groups.setdefault(buoy_key, []).append(entry)
+        if entry.tides is None:
+            tide_groups.setdefault(spot.noaa_tide_station_id, []).append(entry)
+    logging.info(
+        f"Resolving {len(entries)} entries in {len(buoy_groups)} buoy groups "
+        f"and {len(tide_groups)} tide groups"
+    )
+    semaphore = asyncio.Semaphore(CONCURRENT_GROUPS)
+
+    async def resolve_buoy_group(key, group: List[LogEntry]) -> None:
+        spot = SPOT_MAPPING[group[0].spot_name]
+        reports = await _resolve_group(
+            semaphore,
+            f"buoy data for {key}",
+            lambda times: get_station_data_for_times(session, spot, times),
+            group,
+            rate_limit,
+        )
+        for entry, report in zip(group, reports):
+            entry.wind_and_waves = report
+
+    async def resolve_tide_group(station_id: int, group: List[LogEntry]) -> None:
+        spot = SPOT_MAPPING[group[0].spot_name]
+        tides = await _resolve_group(
+            semaphore,
+            f"tides for {station_id}",
+            lambda times: get_tide_data_for_times(session, spot, times, rate_limit),
+            group,
+            rate_limit,
+        )
+        for entry, tide in zip(group, tides):
+            entry.tides = tide
+
+    await asyncio.gather(
+        *(resolve_buoy_group(key, group) for key, group in buoy_groups.items()),
+        *(resolve_tide_group(key, group) for key, group in tide_groups.items()),
+    )
+
+
+@dataclass
+class ImportProgress:
+    total: int
+    started_at: float = field(default_factory=time.monotonic)
+    written: int = 0
+    _last_logged: int = 0
+
+    def record_batch(self, items_written: int) -> None:
+        self.written += items_written
+        if self.written - self._last_logged >= PROGRESS_EVERY_ITEMS or (
+            self.written == self.total
+        ):
+            self._last_logged = self.written
+            logging.info(self.summary())
+
+    def summary(self) -> str:
+        elapsed = time.monotonic() - self.started_at
+        rate = self.written / elapsed if elapsed > 0 else 0.0
+        return (
+            f"Wrote {self.written}/{self.total} entries "
+            f"in {elapsed:.1f}s ({rate:.1f} items/s)"
+        )
+
+
+async def import_entries(
+    session: ClientSession,
+    entries: Sequence[LogEntry],
+    db: Optional[AsyncSurfDiaryDB] = None,
+    dry_run: bool = False,
+) -> ImportProgress:
+    if db is None and not dry_run:
+        db = AsyncSurfDiaryDB()
+    await resolve_conditions(session, entries)
+    for entry in entries:
+        if entry.wind_and_waves is None or entry.tides is None:
+            entry.enrichment_status = EnrichmentStatus.pending
+    incomplete = sum(entry.enrichment_status is not None for entry in entries)
+    logging.info(f"{incomplete} entries are missing conditions and will be pending")
+    # BatchWriteItem rejects a batch with the same key twice, so the last one wins
+    items = {
+        tuple(entry.key.values()): entry.serialize_for_database()["Item"]
+        for entry in entries
+    }
+    progress = ImportProgress(total=len(items))
+    if dry_run:
+        logging.info(f"Dry run, so not writing {len(items)} entries")
+        return progress
+    assert db is not None
+    await db.batch_put(list(items.values()), on_batch_written=progress.record_batch)
+    return progress
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("path", help="a .csv or .jsonl file of entries")
+    parser.add_argument("--table", default=DynamoDBConfig.TABLE_NAME)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    ensure_located_spots()
+    all_entries = list(read_entries(args.path))
+    db = None if args.dry_run else AsyncSurfDiaryDB(args.table)
+    progress = RUNTIME.run(
+        lambda session: import_entries(session, all_entries, db, args.dry_run)
+    )
+    print(progress.summary())
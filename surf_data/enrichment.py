@@ -0,0 +1,236 @@
+"""
+Two phase diary entries.
+
+The log entry handler saves what the user told us (spot, time, rating, notes)
+with enrichment_status "pending" and answers right away.
+The buoy and tide data get filled in afterwards, off the critical path:
+ - sqs_handler enriches each entry as it's queued, if EnrichmentConfig.QUEUE_URL is set
+ - scheduled_handler sweeps up any pending entries whose retry time has come
+
+Every failed attempt pushes the next one back exponentially.
+After MAX_ATTEMPTS the entry is marked failed and keeps whatever we managed to get.
+"""
+
+import asyncio
+from datetime import datetime
+import json
+import logging
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from aiohttp import ClientSession
+from boto3.dynamodb.conditions import Attr
+from surf_data import EnrichmentConfig
+from surf_data.get_data import get_spot_data
+from surf_data.lib.buoys import ConditionReport
+from surf_data.lib.diary_items import encode_conditions
+from surf_data.lib.dynamo import (
+    AsyncSurfDiaryDB,
+    SurfDiaryDB,
+    get_botocore_config,
+)
+from surf_data.lib.runtime import RUNTIME
+from surf_data.lib.station_catalog import ensure_located_spots
+from surf_data.lib.tides import TideData
+from surf_data.log_entry import EnrichmentStatus, LogEntry
+
+
+_sqs_client = None
+
+
+def get_sqs_client():
+    global _sqs_client
+    if _sqs_client is None:
+        import boto3
+
+        _sqs_client = boto3.client("sqs", config=get_botocore_config())
+    return _sqs_client
+
+
+def get_backoff_seconds(attempts: int) -> float:
+    return min(
+        EnrichmentConfig.BACKOFF_BASE_SECONDS * 2**attempts,
+        EnrichmentConfig.BACKOFF_MAX_SECONDS,
+    )
+
+
+def enqueue_enrichment(entry: LogEntry, delay_seconds: float = 0) -> None:
+    if EnrichmentConfig.QUEUE_URL is None:
+        return
+    get_sqs_client().send_message(
+        QueueUrl=EnrichmentConfig.QUEUE_URL,
+        MessageBody=json.dumps(entry.key),
+        # the most SQS will hold a message back for
+        DelaySeconds=int(min(delay_seconds, 15 * 60)),
+    )
+
+
+def submit_entry(entry: LogEntry) -> None:
+    """
+    The only write on the Alexa handler's critical path.
+    Saves the entry without conditions and queues it up for enrichment.
+    """
+    entry.enrichment_status = EnrichmentStatus.pending
+    entry.enrichment_attempts = 0
+    SurfDiaryDB().persist_entry(args=entry.serialize_for_database())
+    try:
+        enqueue_enrichment(entry)
+    except Exception:
+        # the entry is safe, and the scheduled sweep will find it
+        logging.exception(f"Couldn't queue {entry.key} for enrichment")
+
+
+SpotData = Tuple[Optional[ConditionReport], Optional[TideData]]
+
+
+async def _get_spot_data(
+    session: ClientSession, spot_name: str, entry_date: datetime
+) -> SpotData:
+    try:
+        return await get_spot_data(
+            spot_name, entry_date, session, deadline_seconds=None
+        )
+    except Exception:
+        logging.exception(f"Couldn't get conditions for {spot_name} at {entry_date}")
+        return None, None
+
+
+async def enrich_entry(
+    session: ClientSession,
+    db: AsyncSurfDiaryDB,
+    entry: LogEntry,
+    spot_data: Optional[SpotData] = None,
+) -> bool:
+    """
+    Saves the conditions for the entry onto its item, fetching them unless
+    they're passed in. Returns False if we have to try again later.
+    """
+    if spot_data is None:
+        spot_data = await _get_spot_data(session, entry.spot_name, entry.entry_date)
+    conditions, tide = spot_data
+    entry.wind_and_waves = entry.wind_and_waves or conditions
+    entry.tides = entry.tides or tide
+    complete = entry.wind_and_waves is not None and entry.tides is not None
+    if complete:
+        entry.enrichment_status = EnrichmentStatus.done
+        entry.enrich_after = None
+    else:
+        entry.enrichment_attempts += 1
+        if entry.enrichment_attempts >= EnrichmentConfig.MAX_ATTEMPTS:
+            logging.error(f"Giving up on enriching {entry.key}")
+            entry.enrichment_status = EnrichmentStatus.failed
+        else:
+            backoff = get_backoff_seconds(entry.enrichment_attempts)
+            entry.enrich_after = time.time() + backoff
+    await db.update_entry(
+        entry.key,
+        {
+            **encode_conditions(entry.wind_and_waves, entry.tides),
+            **entry.serialize_enrichment_state(),
+        },
+    )
+    return complete
+
+
+async def _process_message(
+    session: ClientSession, db: AsyncSurfDiaryDB, key: Dict[str, str]
+) -> None:
+    """
+    SQS only holds a message back for 15 minutes, so a message can turn up
+    before the entry's backoff is over. Then it just goes back on the queue
+    for the rest of the backoff, without counting as an attempt.
+    """
+    item = await db.get_entry(key)
+    if item is None:
+        return
+    entry = LogEntry.from_database_item(item)
+    if entry.enrichment_status != EnrichmentStatus.pending:
+        return
+    now = time.time()
+    if entry.enrich_after is not None and entry.enrich_after > now:
+        enqueue_enrichment(entry, entry.enrich_after - now)
+        return
+    if not await enrich_entry(session, db, entry):
+        if entry.enrichment_status == EnrichmentStatus.pending:
+            enqueue_enrichment(entry, entry.enrich_after - time.time())
+
+
+def sqs_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Entry point for the enrichment queue. Every message in the batch runs at once.
+    Failed entries get queued again with a delay rather than left for SQS to retry.
+    """
+    ensure_located_spots()
+    db = AsyncSurfDiaryDB()
+    records = event["Records"]
+
+    async def process_all(session: ClientSession) -> List[Any]:
+        return await asyncio.gather(
+            *(
+                _process_message(session, db, json.loads(record["body"]))
+                for record in records
+            ),
+            return_exceptions=True,
+        )
+
+    failures: List[Dict[str, str]] = []
+    for record, result in zip(records, RUNTIME.run(process_all)):
+        if isinstance(result, Exception):
+            logging.error(
+                f"Couldn't process message {record['messageId']}", exc_info=result
+            )
+            failures.append({"itemIdentifier": record["messageId"]})
+    return {"batchItemFailures": failures}
+
+
+def scan_pending_entries(table: Any, now: float) -> Iterator[LogEntry]:
+    scan_kwargs: Dict[str, Any] = {
+        "FilterExpression": Attr("enrichment_status").eq(
+            EnrichmentStatus.pending.value
+        )
+        & (Attr("enrich_after").not_exists() | Attr("enrich_after").lte(int(now)))
+    }
+    while True:
+        resp = table.scan(**scan_kwargs)
+        for item in resp["Items"]:
+            yield LogEntry.from_database_item(item)
+        if "LastEvaluatedKey" not in resp:
+            return
+        scan_kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+
+def scheduled_handler(event: Dict[str, Any], context: Any) -> Dict[str, int]:
+    """
+    Entry point for a scheduled sweep of pending entries.
+    A sweep can pick up a lot of entries, so only
+    EnrichmentConfig.CONCURRENT_ENTRIES of them fetch at once.
+    An entry that blows up gets logged and picked up again next sweep.
+    """
+    ensure_located_spots()
+    entries = list(scan_pending_entries(SurfDiaryDB().table, time.time()))
+    db = AsyncSurfDiaryDB()
+
+    async def enrich_all(session: ClientSession) -> List[Any]:
+        semaphore = asyncio.Semaphore(EnrichmentConfig.CONCURRENT_ENTRIES)
+
+        async def enrich(entry: LogEntry) -> bool:
+            async with semaphore:
+                return await enrich_entry(session, db, entry)
+
+        return await asyncio.gather(
+            *(enrich(entry) for entry in entries), return_exceptions=True
+        )
+
+    enriched = retrying = errors = 0
+    for entry, result in zip(entries, RUNTIME.run(enrich_all)):
+        if isinstance(result, Exception):
+            logging.error(f"Couldn't enrich {entry.key}", exc_info=result)
+            errors += 1
+        elif result:
+            enriched += 1
+        else:
+            retrying += 1
+    logging.info(
+        f"Enriched {enriched} entries, {retrying} need another try, "
+        f"{errors} errored"
+    )
+    return {"enriched": enriched, "retrying": retrying, "errors": errors}
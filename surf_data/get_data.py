@@ -1,28 +1,127 @@
 from surf_data.lib.buoys import get_station_data, ConditionReport
 from surf_data.lib.tides import TideData, get_tide_data
-from surf_data.lib.time_helpers import get_current_time
-from surf_data import SPOT_MAPPING, Spots
+from surf_data.lib.time_helpers import ensure_timezone, get_current_time
+from surf_data import SPOT_MAPPING, FetchConfig, Spots, SurfSpotDetails
 import asyncio
+from dataclasses import replace
+import logging
 from aiohttp import ClientSession
 from datetime import datetime
-from typing import Optional
+from typing import Any, Awaitable, Dict, List, Optional, Tuple
+
+
+async def gather_within_deadline(
+    *aws: Awaitable[Any], deadline_seconds: Optional[float]
+) -> List[Optional[Any]]:
+    """
+    Like asyncio.gather, but anything that fails or isn't done by the deadline
+    comes back as None instead of sinking the whole batch.
+    If nothing at all succeeds we raise the first error (or a timeout).
+    """
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    done, pending = await asyncio.wait(tasks, timeout=deadline_seconds)
+    for task in pending:
+        task.cancel()
+    if pending:
+        logging.warning(f"{len(pending)} fetches missed the {deadline_seconds}s deadline")
+        await asyncio.gather(*pending, return_exceptions=True)
+    results: List[Optional[Any]] = []
+    first_error: Optional[BaseException] = None
+    for task in tasks:
+        if task in done and task.exception() is None:
+            results.append(task.result())
+            continue
+        if task in done:
+            logging.error("Fetch failed", exc_info=task.exception())
+            first_error = first_error or task.exception()
+        results.append(None)
+    if all(result is None for result in results):
+        raise first_error or asyncio.TimeoutError(
+            f"Nothing finished within {deadline_seconds} seconds"
+        )
+    return results
 
 
 async def get_spot_data(
-    spot_name: str, start_time: Optional[datetime] = None
-) -> tuple[ConditionReport, TideData]:
-    surf_spot = SPOT_MAPPING[spot_name]
+    spot_name: str,
+    start_time: Optional[datetime] = None,
+    session: Optional[ClientSession] = None,
+    deadline_seconds: Optional[float] = FetchConfig.SPOT_DATA_DEADLINE_SECONDS,
+) -> tuple[Optional[ConditionReport], Optional[TideData]]:
+    """
+    Pass in a session to reuse its connections,
+    like the one RUNTIME.run hands out. Otherwise we make a new one.
+
+    If the buoy or tide data can't be had within deadline_seconds
+    we return None in its place.
+    """
+    surf_spot = SPOT_MAPPING.get(spot_name)
+    if surf_spot is None:
+        raise ValueError(
+            f"Unknown spot {spot_name!r}. Spots by position only get added "
+            "once ensure_located_spots has run."
+        )
+    if start_time is None:
+        start_time = get_current_time()
+    # diary entry dates come back from the table without a time zone
+    start_time = ensure_timezone(start_time)
+    if session is None:
+        async with ClientSession(raise_for_status=True) as new_session:
+            return await get_spot_data(
+                spot_name, start_time, new_session, deadline_seconds
+            )
+    conditions, tide = await gather_within_deadline(
+        get_station_data(session, surf_spot, start_time),
+        get_tide_data(session, surf_spot, start_time),
+        deadline_seconds=deadline_seconds,
+    )
+    return conditions, tide
+
+
+def _get_buoy_key(spot: SurfSpotDetails) -> Tuple[int, int]:
+    return spot.nbdc_buoy_id, spot.fallback_buoy_id
+
+
+async def get_all_spot_data(
+    start_time: Optional[datetime] = None,
+    session: Optional[ClientSession] = None,
+    deadline_seconds: Optional[float] = FetchConfig.SPOT_DATA_DEADLINE_SECONDS,
+) -> Dict[str, tuple[Optional[ConditionReport], Optional[TideData]]]:
+    """
+    Conditions and tides for every spot in SPOT_MAPPING.
+    Each distinct buoy pair and tide station is fetched once, all at the same time,
+    and the spots that share them get their own copy of the result.
+    """
     if start_time is None:
         start_time = get_current_time()
-    async with ClientSession(raise_for_status=True) as session:
-        results = await asyncio.gather(
-            get_station_data(session, surf_spot, start_time),
-            get_tide_data(session, surf_spot, start_time),
+    start_time = ensure_timezone(start_time)
+    if session is None:
+        async with ClientSession(raise_for_status=True) as new_session:
+            return await get_all_spot_data(start_time, new_session, deadline_seconds)
+    buoys = {_get_buoy_key(spot): spot for spot in SPOT_MAPPING.values()}
+    tide_stations = {spot.noaa_tide_station_id: spot for spot in SPOT_MAPPING.values()}
+    results = await gather_within_deadline(
+        *(get_station_data(session, spot, start_time) for spot in buoys.values()),
+        *(get_tide_data(session, spot, start_time) for spot in tide_stations.values()),
+        deadline_seconds=deadline_seconds,
+    )
+    conditions_by_buoy = dict(zip(buoys, results[: len(buoys)]))
+    tide_by_station = dict(zip(tide_stations, results[len(buoys):]))
+    all_spot_data = {}
+    for spot_name, spot in SPOT_MAPPING.items():
+        conditions = conditions_by_buoy[_get_buoy_key(spot)]
+        tide = tide_by_station[spot.noaa_tide_station_id]
+        all_spot_data[spot_name] = (
+            replace(conditions) if conditions else None,
+            replace(tide) if tide else None,
         )
-    return results
+    return all_spot_data
 
 
 if __name__ == "__main__":
+    from surf_data.lib.station_catalog import ensure_located_spots
+
+    ensure_located_spots()
     # from surf_data.lib.time_helpers import PST_TIME_ZONE
 
     conditions, tide = asyncio.run(
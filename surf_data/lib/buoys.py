@@ -25,21 +25,59 @@ For a guide to raw data available see:
 https://www.ndbc.noaa.gov/docs/ndbc_web_data_guide.pdf
 """
 
+import asyncio
 from asyncio import gather
+import calendar
 import re
 from datetime import datetime
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from functools import cached_property
 from aiohttp import ClientSession
-from aiohttp.client_exceptions import ClientResponseError
+from aiohttp.client_exceptions import ClientError
 import logging
-from typing import List, Literal, Optional, Type, TypeVar, Union
+import time
+import zlib
+from typing import (
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Literal,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
 from enum import Enum
-from surf_data.lib.time_helpers import get_current_time, UTC_TIME_ZONE
+from http import HTTPStatus
+import numpy as np
+from surf_data.lib.http_cache import (
+    RESPONSE_CACHE,
+    CachedResponse,
+    ResponseCache,
+    cached_get,
+    note_full_response,
+    track_full_responses,
+)
+from surf_data.lib.single_flight import SINGLE_FLIGHT
+from surf_data.lib.spectra import SpectralReport, SwellPartition
+from surf_data.lib.station_health import STATION_HEALTH
+from surf_data.lib.time_helpers import UTC_TIME_ZONE, get_current_time
 from surf_data.lib.record_helpers import DataPoint
-from surf_data import SurfSpotDetails
+from surf_data import (
+    FetchConfig,
+    HTTPCacheConfig,
+    NDBCArchiveConfig,
+    StationHealthConfig,
+    SurfSpotDetails,
+)
 
 
 NDBC_BASE_URL = "https://www.ndbc.noaa.gov/data/realtime2/"
+NDBC_CACHE_SOURCE = "ndbc_realtime"
 TAG_TO_ATTRIBUTE_MAP = {
     "Wind Direction (WDIR):": "wind_direction",
     "Wind Speed (WSPD):": "wind_speed",
@@ -82,9 +120,46 @@ NDBC_COL_TO_ATTRIBUTE_MAP = {
 }
 
 
+MISSING_VALUE = "MM"
+TIME_COLUMNS = ("YY", "MM", "DD", "hh", "mm")
+# How many records older than the requested time we read before we stop streaming.
+STREAM_RECORDS_PAST_TARGET = 3
+# Only look this far into a report to work out how many decimals a column uses.
+DECIMAL_SCAN_ROWS = 48
+
+# Units of columns that hold directions, which we interpolate around the circle
+DIRECTION_UNITS = ("degT",)
+
+# Columns that hold labels rather than numbers.
+# We store these as small int codes into a vocabulary, with -1 for "MM".
+# The known values come first so the codes are stable between reports.
+COMPASS_POINTS = (
+    "N", "NNE", "NE", "ENE", "E", "ESE", "SE", "SSE",
+    "S", "SSW", "SW", "WSW", "W", "WNW", "NW", "NNW",
+)
+CATEGORICAL_COLUMNS: Dict[str, Tuple[str, ...]] = {
+    "SwD": COMPASS_POINTS,
+    "WWD": COMPASS_POINTS,
+    "STEEPNESS": ("SWELL", "AVERAGE", "STEEP", "VERY_STEEP", "N/A"),
+}
+
+
 class NDBCDataTypes(Enum):
     weather = "weather"
     waves = "waves"
+    spectral_density = "spectral_density"
+    spectral_direction = "spectral_direction"
+
+
+REPORT_EXTENSIONS = {
+    NDBCDataTypes.weather: "txt",
+    NDBCDataTypes.waves: "spec",
+    NDBCDataTypes.spectral_density: "data_spec",
+    NDBCDataTypes.spectral_direction: "swdir",
+}
+# What a station has to answer for to count as working. The spectra are optional
+# and plenty of buoys don't publish them, so they stay out of the circuit breaker.
+REQUIRED_REPORT_TYPES = {NDBCDataTypes.weather, NDBCDataTypes.waves}
 
 
 def parse_report_header(raw_report_header: str) -> List[str]:
@@ -96,36 +171,6 @@ def parse_report_header(raw_report_header: str) -> List[str]:
     return [col.strip() for col in processed_headers]
 
 
-def get_closest_record(
-    report: "RawReport", desired_time: datetime
-) -> Union["RawWeatherRecord", "RawWaveRecord"]:
-    """
-    Takes a datetime and returns the closest report record we can
-    to that datetime.
-    The dates of the report are in time order, so once we pass the minimum
-    we can stop searching
-    """
-    min_date_diff = float("inf")
-    desired_seconds = desired_time.timestamp()
-    current_rec = None
-    for rec in report.report_records:
-        current_rec = rec
-        rec_date = datetime(
-            int(rec.YY.measure),
-            int(rec.MM.measure),
-            int(rec.DD.measure),
-            int(rec.hh.measure),
-            int(rec.mm.measure),
-            tzinfo=UTC_TIME_ZONE,  # Buoy data is in UTC
-        ).timestamp()
-        if abs(rec_date - desired_seconds) > min_date_diff:
-            break
-        min_date_diff = abs(rec_date - desired_seconds)
-    if current_rec is None:
-        raise ValueError("Could not find a closest record")
-    return current_rec
-
-
 @dataclass
 class BaseRecord:
     YY: DataPoint
@@ -168,6 +213,8 @@ class RawWaveRecord(BaseRecord):
 
 
 T = TypeVar("T", RawWaveRecord, RawWeatherRecord)
+R = TypeVar("R")
+ReportT = TypeVar("ReportT", "ColumnarReport", SpectralReport)
 
 
 @dataclass
@@ -198,6 +245,319 @@ class RawReport:
         return cls(report_records=report_records)
 
 
+def _encode_categorical(
+    values: List[str], vocabulary: Tuple[str, ...]
+) -> Tuple[np.ndarray, Tuple[str, ...]]:
+    """
+    Maps a column of labels to int8 codes into the vocabulary.
+    Labels we haven't seen before get appended to the vocabulary
+    so we never lose data.
+    """
+    categories = list(vocabulary)
+    lookup = {MISSING_VALUE: -1}
+    for label in set(values):
+        if label in lookup:
+            continue
+        if label not in categories:
+            categories.append(label)
+        lookup[label] = categories.index(label)
+    codes = np.fromiter(map(lookup.__getitem__, values), dtype=np.int8, count=len(values))
+    return codes, tuple(categories)
+
+
+def _count_decimals(header: List[str], body: str) -> Dict[str, int]:
+    """
+    NDBC reports each column with a fixed number of decimals.
+    We keep track of that so values read back out look just like the raw report.
+    """
+    decimals: Dict[str, int] = {}
+    for line in body.splitlines()[:DECIMAL_SCAN_ROWS]:
+        for col, value in zip(header, line.split()):
+            if col not in decimals and value != MISSING_VALUE:
+                decimals[col] = len(value.partition(".")[2])
+        if len(decimals) == len(header):
+            break
+    return decimals
+
+
+@dataclass
+class ColumnarReport:
+    """
+    A whole NDBC report stored as one typed NumPy array per column.
+    Numeric columns are float64 with NaN for missing values,
+    the time columns are ints and the categorical columns are int8 codes.
+
+    This is much cheaper to build than a RawReport since we never make
+    a python object per cell.
+    """
+
+    columns: Dict[str, np.ndarray]
+    units: Dict[str, str]
+    decimals: Dict[str, int]
+    categories: Dict[str, Tuple[str, ...]]
+    # Record times in ascending order, and the row each one came from.
+    # NDBC rows are mostly newest first, but not always, so we sort them.
+    sorted_epochs: np.ndarray = field(init=False, repr=False)
+    sorted_rows: np.ndarray = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        epochs = self.record_epochs()
+        self.sorted_rows = np.argsort(epochs, kind="stable")
+        self.sorted_epochs = epochs[self.sorted_rows]
+
+    @classmethod
+    def from_raw_report(cls, raw_report: str) -> "ColumnarReport":
+        header, units, body = (raw_report.split("\n", 2) + ["", ""])[:3]
+        return cls.from_body(
+            parse_report_header(header), parse_report_header(units), body
+        )
+
+    @classmethod
+    def from_lines(
+        cls, header: List[str], units: List[str], record_lines: List[str]
+    ) -> "ColumnarReport":
+        return cls.from_body(header, units, "\n".join(record_lines))
+
+    @classmethod
+    def from_body(
+        cls, header: List[str], units: List[str], body: str
+    ) -> "ColumnarReport":
+        """
+        Every row of a report has the same number of cells ("MM" fills in the gaps),
+        so we can parse the whole body as one flat array of floats and reshape it.
+        Categorical columns get pulled out first and swapped for placeholders.
+        """
+        categories: Dict[str, Tuple[str, ...]] = {}
+        codes: Dict[str, np.ndarray] = {}
+        categorical_idx = [
+            i for i, col in enumerate(header) if col in CATEGORICAL_COLUMNS
+        ]
+        numeric_body = body
+        if categorical_idx:
+            cells = body.split()
+            n_rows = len(cells) // len(header)
+            for i in categorical_idx:
+                col = header[i]
+                codes[col], categories[col] = _encode_categorical(
+                    cells[i::len(header)], CATEGORICAL_COLUMNS[col]
+                )
+                cells[i::len(header)] = ["0"] * n_rows
+            numeric_body = " ".join(cells)
+        grid = np.fromstring(
+            numeric_body.replace(MISSING_VALUE, "nan"), dtype=np.float64, sep=" "
+        )
+        if grid.size % len(header) != 0:
+            raise ValueError(
+                f"Report has {grid.size} cells, which doesn't fit {len(header)} columns"
+            )
+        grid = grid.reshape(-1, len(header))
+        columns: Dict[str, np.ndarray] = {}
+        for i, col in enumerate(header):
+            if col in TIME_COLUMNS:
+                columns[col] = grid[:, i].astype(np.int16)
+            elif col in codes:
+                columns[col] = codes[col]
+            else:
+                columns[col] = grid[:, i]
+        return cls(
+            columns=columns,
+            units=dict(zip(header, units)),
+            decimals=_count_decimals(header, body),
+            categories=categories,
+        )
+
+    def __len__(self) -> int:
+        return len(self.columns["YY"])
+
+    def record_epochs(self) -> np.ndarray:
+        """
+        Seconds since the epoch for each row. Buoy data is in UTC.
+        """
+        years = (self.columns["YY"].astype(np.int64) - 1970).astype("datetime64[Y]")
+        months = years.astype("datetime64[M]") + (self.columns["MM"] - 1)
+        days = months.astype("datetime64[D]") + (self.columns["DD"] - 1)
+        return (
+            days.astype(np.int64) * 86400
+            + self.columns["hh"].astype(np.int64) * 3600
+            + self.columns["mm"].astype(np.int64) * 60
+        )
+
+    def get_data_point(self, column: str, row: int) -> Optional[DataPoint]:
+        """
+        Reads a single cell back out as a DataPoint, formatted like the raw report.
+        Returns None for missing values.
+        """
+        value = self.columns[column][row]
+        if column in self.categories:
+            if value < 0:
+                return None
+            return DataPoint(self.categories[column][value], self.units[column])
+        if column in TIME_COLUMNS:
+            return DataPoint(f"{value:02d}", self.units[column])
+        return self.format_value(column, value)
+
+    def take(self, rows: Sequence[int]) -> "ColumnarReport":
+        """
+        A new report with just these rows.
+        """
+        return ColumnarReport(
+            columns={col: values[rows] for col, values in self.columns.items()},
+            units=self.units,
+            decimals=self.decimals,
+            categories=self.categories,
+        )
+
+    def format_value(self, column: str, value: float) -> Optional[DataPoint]:
+        """
+        A number for a numeric column as a DataPoint, formatted like the raw report.
+        """
+        if np.isnan(value):
+            return None
+        return DataPoint(f"{value:.{self.decimals.get(column, 1)}f}", self.units[column])
+
+    @cached_property
+    def numeric_columns(self) -> Tuple[str, ...]:
+        return tuple(
+            col
+            for col in self.columns
+            if col not in TIME_COLUMNS and col not in self.categories
+        )
+
+    @cached_property
+    def sorted_numeric_values(self) -> np.ndarray:
+        """
+        The numeric columns stacked into one (record x column) array,
+        with the records in time order.
+        """
+        if not self.numeric_columns:
+            return np.zeros((len(self), 0))
+        return np.column_stack(
+            [self.columns[col][self.sorted_rows] for col in self.numeric_columns]
+        )
+
+
+@dataclass
+class ClosestRecord:
+    """
+    The row closest to the time we asked for, along with the rows recorded
+    just before and just after it (None at the ends of the report).
+    offset_seconds is how far the record is from the requested time.
+    """
+
+    row: int
+    previous_row: Optional[int]
+    next_row: Optional[int]
+    offset_seconds: float
+
+
+def get_closest_records(
+    report: Union[ColumnarReport, SpectralReport], desired_times: Sequence[datetime]
+) -> List[ClosestRecord]:
+    """
+    Binary searches the report's sorted record times for each of the desired times.
+    Passing a batch of times is much cheaper than looking them up one by one.
+    """
+    n_records = len(report.sorted_epochs)
+    if n_records == 0:
+        raise ValueError("Could not find a closest record")
+    epochs = report.sorted_epochs
+    targets = np.array([t.timestamp() for t in desired_times], dtype=np.float64)
+    after = np.searchsorted(epochs, targets)
+    before = np.clip(after - 1, 0, n_records - 1)
+    after_clipped = np.clip(after, 0, n_records - 1)
+    use_before = (after >= n_records) | (
+        (after > 0) & (targets - epochs[before] <= epochs[after_clipped] - targets)
+    )
+    closest = np.where(use_before, before, after_clipped)
+    offsets = epochs[closest] - targets
+    closest_records = []
+    for position, offset in zip(closest.tolist(), offsets.tolist()):
+        closest_records.append(
+            ClosestRecord(
+                row=int(report.sorted_rows[position]),
+                previous_row=(
+                    int(report.sorted_rows[position - 1]) if position > 0 else None
+                ),
+                next_row=(
+                    int(report.sorted_rows[position + 1])
+                    if position + 1 < n_records
+                    else None
+                ),
+                offset_seconds=offset,
+            )
+        )
+    return closest_records
+
+
+def get_closest_record(report: ColumnarReport, desired_time: datetime) -> ClosestRecord:
+    """
+    Takes a datetime and returns the closest report record we can
+    to that datetime.
+    """
+    return get_closest_records(report, [desired_time])[0]
+
+
+@dataclass
+class InterpolatedRecords:
+    """
+    A report's numeric columns interpolated to a batch of times,
+    as a (time x column) array in the order of report.numeric_columns.
+    closest_records has the nearest real record to each time. Labels like SwD
+    come from that record, and its offset_seconds is how far the data is
+    from an actual observation.
+    """
+
+    values: np.ndarray
+    closest_records: List[ClosestRecord]
+
+
+def interpolate_records(
+    report: ColumnarReport, desired_times: Sequence[datetime]
+) -> InterpolatedRecords:
+    """
+    Linearly interpolates every numeric column between the records either side
+    of each time, all in one go. Direction columns are interpolated around the
+    circle, so 350 and 10 average out to 0 rather than 180.
+    A column missing from either record, records more than
+    FetchConfig.MAX_INTERPOLATION_GAP_SECONDS apart, and times outside the report
+    all just take the value from the closest record.
+    """
+    closest_records = get_closest_records(report, desired_times)
+    values = report.sorted_numeric_values
+    epochs = report.sorted_epochs
+    n_records = len(epochs)
+    targets = np.array([t.timestamp() for t in desired_times], dtype=np.float64)
+    if n_records < 2:
+        only_record = np.zeros(len(targets), dtype=np.int64)
+        return InterpolatedRecords(values[only_record], closest_records)
+    after = np.clip(np.searchsorted(epochs, targets), 1, n_records - 1)
+    before = after - 1
+    gap = epochs[after] - epochs[before]
+    weight = np.clip((targets - epochs[before]) / np.maximum(gap, 1), 0, 1)[:, None]
+    low, high = values[before], values[after]
+    interpolated = low + (high - low) * weight
+
+    is_direction = np.array(
+        [report.units.get(col) in DIRECTION_UNITS for col in report.numeric_columns],
+        dtype=bool,
+    )
+    if is_direction.any():
+        # the shortest way around from the earlier direction to the later one
+        turn = (high[:, is_direction] - low[:, is_direction] + 180) % 360 - 180
+        interpolated[:, is_direction] = (low[:, is_direction] + turn * weight) % 360
+
+    # ties go to the earlier record, same as get_closest_records
+    closest = np.where(weight[:, 0] <= 0.5, before, after)
+    use_closest = (
+        np.isnan(low)
+        | np.isnan(high)
+        | (gap > FetchConfig.MAX_INTERPOLATION_GAP_SECONDS)[:, None]
+    )
+    return InterpolatedRecords(
+        np.where(use_closest, values[closest], interpolated), closest_records
+    )
+
+
 @dataclass
 class ConditionReport:
     station_id: int
@@ -217,6 +577,12 @@ class ConditionReport:
     wind_wave_direction: Optional[DataPoint] = None
     wave_steepness: Optional[DataPoint] = None
     average_wave_period: Optional[DataPoint] = None
+    # every swell we could pick out of the wave spectrum, biggest first
+    swell_partitions: Tuple[SwellPartition, ...] = ()
+    # How far the time we asked about is from the nearest weather or wave record
+    # (whichever is further). With interpolation that's the distance to
+    # the nearest observation the values were read between.
+    record_offset_seconds: Optional[float] = None
 
     def parse_raw_record_data(
         self, raw_record: Union[RawWeatherRecord, RawWaveRecord]
@@ -229,15 +595,277 @@ class ConditionReport:
             if hasattr(raw_record, raw_attr):
                 setattr(self, combined_attribute, getattr(raw_record, raw_attr))
 
+    def parse_columnar_row(self, report: ColumnarReport, row: int) -> None:
+        """
+        Same as parse_raw_record_data, but reads a single row of a ColumnarReport.
+        """
+        for raw_attr, combined_attribute in NDBC_COL_TO_ATTRIBUTE_MAP.items():
+            if raw_attr in report.columns:
+                setattr(self, combined_attribute, report.get_data_point(raw_attr, row))
+
+    def parse_interpolated_values(
+        self, report: ColumnarReport, values: np.ndarray, record: ClosestRecord
+    ) -> None:
+        """
+        Same as parse_columnar_row, but the numeric columns come from a row of
+        interpolate_records. Labels can't be interpolated, so those come from
+        the closest record.
+        """
+        numeric = dict(zip(report.numeric_columns, values.tolist()))
+        for raw_attr, combined_attribute in NDBC_COL_TO_ATTRIBUTE_MAP.items():
+            if raw_attr in numeric:
+                value = report.format_value(raw_attr, numeric[raw_attr])
+            elif raw_attr in report.columns:
+                value = report.get_data_point(raw_attr, record.row)
+            else:
+                continue
+            setattr(self, combined_attribute, value)
+
     def serialize_for_alexa(self) -> str:
+        partitions = ""
+        if self.swell_partitions:
+            partitions = (
+                "Looking at the whole spectrum, there's "
+                + ", and ".join(
+                    partition.serialize_for_alexa()
+                    for partition in self.swell_partitions
+                )
+                + '. <break time=".5s"/>'
+            )
         return (
             f"The wind is coming from {self.wind_direction} with speed {self.wind_speed} and gusts up to {self.wind_gust}. "
             f'The main swell is from {self.swell_direction} and is {self.swell_height} at {self.swell_period}. <break time=".5s"/>'
             f'Secondary swell is from {self.wind_wave_direction} and is {self.wind_wave_height} at {self.wind_wave_period}. <break time=".5s"/>'
+            f"{partitions}"
             f"Wave steepness is {self.wave_steepness or 'missing'}. "
         ).replace(" kts", " knots")
 
 
+def _get_station_url(station_id: int, report_type: NDBCDataTypes) -> str:
+    if report_type not in REPORT_EXTENSIONS:
+        raise ValueError(
+            f"Supplied report_type must be one of {list(REPORT_EXTENSIONS)}. "
+            f"Got {report_type}"
+        )
+    return f"{NDBC_BASE_URL}{station_id}.{REPORT_EXTENSIONS[report_type]}"
+
+
+def _get_newest_record_epoch(
+    result: Union[str, ColumnarReport, SpectralReport]
+) -> Optional[float]:
+    if isinstance(result, (ColumnarReport, SpectralReport)):
+        if len(result) == 0:
+            return None
+        return float(result.sorted_epochs[-1])
+    for line in result.splitlines():
+        if line.strip() and not line.startswith("#"):
+            return _get_record_epoch(line)
+    return None
+
+
+def _get_hedge_delay(station_id: int, report_type: NDBCDataTypes) -> float:
+    """
+    How long we give a station before we also ask the next one.
+    Based on how quickly the station has answered this report recently.
+    """
+    delay = STATION_HEALTH.get(station_id).latency_percentile(
+        report_type.value, FetchConfig.HEDGE_LATENCY_PERCENTILE
+    )
+    if delay is None:
+        return FetchConfig.HEDGE_DEFAULT_DELAY_SECONDS
+    return min(
+        max(delay, FetchConfig.HEDGE_MIN_DELAY_SECONDS),
+        FetchConfig.HEDGE_MAX_DELAY_SECONDS,
+    )
+
+
+async def _fetch_with_fallback(
+    fetch: Callable[[int], Awaitable[R]],
+    station_id: int,
+    fallback_station_id: int,
+    report_type: NDBCDataTypes,
+) -> R:
+    """
+    Calls fetch with the station, and then the fallback station
+    if NDBC gives us an error or the data is stale.
+    Stations the health registry knows are dead get skipped.
+
+    Requests are hedged: if a station hasn't answered within its usual latency
+    we ask the next station too, and take whichever good report arrives first.
+    If everything comes back stale we return the first stale result.
+
+    Only REQUIRED_REPORT_TYPES count towards a station's circuit.
+    A station can be fine without its spectra, so those just get the latency.
+    """
+    counts_for_health = report_type in REQUIRED_REPORT_TYPES
+    candidates = STATION_HEALTH.order_stations(
+        list(dict.fromkeys([station_id, fallback_station_id])),
+        probe=counts_for_health,
+    )
+
+    async def attempt(candidate: int) -> Tuple[R, bool]:
+        logging.info(f"Asking station {candidate} for {report_type.value} data")
+        # each attempt runs in its own task, so this only sees its own requests
+        full_responses = track_full_responses()
+        started = time.monotonic()
+        try:
+            result = await fetch(candidate)
+        except (ClientError, asyncio.TimeoutError):
+            if counts_for_health:
+                STATION_HEALTH.record_failure(candidate)
+            raise
+        except asyncio.CancelledError:
+            # we gave up on it while it was on the network,
+            # so all we know is it's at least this slow
+            STATION_HEALTH.record_latency(
+                candidate, report_type.value, time.monotonic() - started
+            )
+            raise
+        if full_responses:
+            # cache hits and 304s don't say anything about how fast NDBC is
+            STATION_HEALTH.record_latency(
+                candidate, report_type.value, time.monotonic() - started
+            )
+        newest_epoch = _get_newest_record_epoch(result)
+        record_age = float("inf") if newest_epoch is None else time.time() - newest_epoch
+        if not counts_for_health:
+            return result, record_age <= StationHealthConfig.STALE_AFTER_SECONDS
+        return result, STATION_HEALTH.record_success(candidate, record_age)
+
+    remaining = list(candidates)
+    pending: Set["asyncio.Task[Tuple[R, bool]]"] = set()
+    stale_result: Optional[R] = None
+    last_error: Optional[BaseException] = None
+    try:
+        while remaining or pending:
+            hedge_delay = None
+            if remaining:
+                candidate = remaining.pop(0)
+                pending.add(asyncio.create_task(attempt(candidate)))
+                if remaining:
+                    hedge_delay = _get_hedge_delay(candidate, report_type)
+            done, pending = await asyncio.wait(
+                pending, timeout=hedge_delay, return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done and remaining:
+                logging.info(f"Station {candidate} is slow. Hedging with the next one.")
+            for task in done:
+                try:
+                    result, is_fresh = task.result()
+                except (ClientError, asyncio.TimeoutError) as e:
+                    logging.error(f"Error getting {report_type.value} data: {e!r}")
+                    last_error = e
+                    continue
+                if is_fresh:
+                    return result
+                if stale_result is None:
+                    stale_result = result
+    finally:
+        for task in pending:
+            task.cancel()
+    if stale_result is not None:
+        return stale_result
+    assert last_error is not None
+    raise last_error
+
+
+def is_archived(rep_time: datetime) -> bool:
+    """
+    True if rep_time is too old for realtime2.
+    """
+    return time.time() - rep_time.timestamp() > NDBCArchiveConfig.REALTIME_DAYS * 86400
+
+
+def _in_realtime_boundary_month(rep_time: datetime) -> bool:
+    """
+    True if rep_time is in the (UTC) month that realtime2 reaches back into.
+    NDBC only archives a month some time after it ends,
+    so for that month realtime2 may be all there is.
+    """
+    boundary = datetime.fromtimestamp(
+        time.time() - NDBCArchiveConfig.REALTIME_DAYS * 86400, UTC_TIME_ZONE
+    )
+    utc_time = rep_time.astimezone(UTC_TIME_ZONE)
+    return (utc_time.year, utc_time.month) >= (boundary.year, boundary.month)
+
+
+def _get_record_epoch(record_line: str) -> float:
+    """
+    Reads just the time columns off the front of a raw record line.
+    """
+    year, month, day, hour, minute = record_line.split(None, 5)[:5]
+    return calendar.timegm(
+        (int(year), int(month), int(day), int(hour), int(minute), 0)
+    )
+
+
+def _report_covers(
+    report: Union[ColumnarReport, SpectralReport], target_epoch: float
+) -> bool:
+    """
+    True if the report reaches far enough back to answer for the target time.
+    """
+    records_past_target = int(np.sum(report.sorted_epochs < target_epoch))
+    return records_past_target >= STREAM_RECORDS_PAST_TARGET
+
+
+async def _stream_station_report(
+    session: ClientSession,
+    station_url: str,
+    rep_time: datetime,
+    cache: Optional[ResponseCache] = None,
+    parse: Callable[[str], ReportT] = ColumnarReport.from_raw_report,
+) -> ReportT:
+    """
+    NDBC writes the newest records first, so we read the report line by line
+    and hang up as soon as we're a few records past the time we want.
+    We read a couple records past the target in case the rows are a little
+    out of order.
+
+    Whatever we read gets cached. A cached copy that reaches back past the target
+    is used as is while fresh, and revalidated with a conditional GET after that.
+    """
+    if cache is None:
+        cache = RESPONSE_CACHE
+    target_epoch = rep_time.timestamp()
+    cached = cache.get(station_url)
+    cached_report = None
+    if cached is not None:
+        cached_report = parse(cached.body.decode())
+        if not (cached.complete or _report_covers(cached_report, target_epoch)):
+            cached = None
+    if cached is not None and cached.is_fresh(
+        HTTPCacheConfig.TTL_SECONDS[NDBC_CACHE_SOURCE]
+    ):
+        logging.info(f"Using cached report for {station_url}")
+        return cached_report
+    headers = cached.conditional_headers() if cached is not None else {}
+    raw_lines = []
+    async with session.get(station_url, headers=headers) as resp:
+        if resp.status == HTTPStatus.NOT_MODIFIED and cached is not None:
+            logging.info(f"Cached report for {station_url} is still valid")
+            cache.put(station_url, cached.revalidated())
+            return cached_report
+        records_past_target = 0
+        complete = True
+        async for raw_line in resp.content:
+            raw_lines.append(raw_line)
+            if raw_line.startswith(b"#") or not raw_line.strip():
+                continue
+            if _get_record_epoch(raw_line.decode()) < target_epoch:
+                records_past_target += 1
+            if records_past_target >= STREAM_RECORDS_PAST_TARGET:
+                # don't bother downloading the rest of the file
+                resp.close()
+                complete = False
+                break
+        body = b"".join(raw_lines)
+        note_full_response(station_url)
+        cache.put(station_url, CachedResponse.from_response(resp, body, complete))
+    logging.info(f"Read {len(raw_lines)} lines from {station_url}")
+    return parse(body.decode())
+
+
 async def _get_raw_station_data(
     session: ClientSession,
     station_id: int,
@@ -248,31 +876,222 @@ async def _get_raw_station_data(
     gets the raw weather data from NDBC at a URL like this:
     https://www.ndbc.noaa.gov/data/realtime2/14040.txt
     """
-    if report_type not in (NDBCDataTypes.weather, NDBCDataTypes.waves):
-        raise ValueError(
-            "Supplied report_type must be either "
-            f"{NDBCDataTypes.weather} or {NDBCDataTypes.waves}. "
-            f"Got {report_type}"
+
+    async def fetch(candidate: int) -> str:
+        station_url = _get_station_url(candidate, report_type)
+        body = await cached_get(session, station_url, NDBC_CACHE_SOURCE)
+        return body.decode()
+
+    return await _fetch_with_fallback(
+        fetch, station_id, fallback_station_id, report_type
+    )
+
+
+def _get_report_bucket(rep_time: datetime) -> Tuple[int, datetime]:
+    bucket_seconds = FetchConfig.BUOY_REPORT_BUCKET_SECONDS
+    bucket_start = int(rep_time.timestamp()) // bucket_seconds * bucket_seconds
+    return bucket_start, datetime.fromtimestamp(bucket_start, rep_time.tzinfo)
+
+
+async def _get_realtime_report(
+    session: ClientSession,
+    station_id: int,
+    fallback_station_id: int,
+    report_type: NDBCDataTypes,
+    rep_time: datetime,
+    parse: Callable[[str], ReportT],
+) -> ReportT:
+    """
+    Streams just enough of the station's realtime2 report to cover rep_time.
+    Requests for the same stations in the same bucket of time share one report,
+    read back to the start of the bucket so it covers all of them.
+    """
+    bucket_start, bucket_time = _get_report_bucket(rep_time)
+
+    async def fetch(candidate: int) -> ReportT:
+        return await _stream_station_report(
+            session, _get_station_url(candidate, report_type), bucket_time, parse=parse
         )
-    report_to_extension_map = {
-        NDBCDataTypes.weather.value: "txt",
-        NDBCDataTypes.waves.value: "spec",
-    }
+
+    return await SINGLE_FLIGHT.do(
+        ("ndbc", report_type.value, station_id, fallback_station_id, bucket_start),
+        lambda: _fetch_with_fallback(
+            fetch, station_id, fallback_station_id, report_type
+        ),
+    )
+
+
+async def _get_station_report(
+    session: ClientSession,
+    station_id: int,
+    fallback_station_id: int,
+    report_type: Literal[NDBCDataTypes.waves, NDBCDataTypes.weather],
+    rep_time: datetime,
+) -> ColumnarReport:
+    """
+    The station's report, covering rep_time.
+    Times older than realtime2 goes back get the month of records
+    around them from the historical archives instead, unless NDBC
+    hasn't archived the month yet, in which case we read what realtime2 has.
+    Weather close to now comes from the latest observation of every station,
+    which is one download for all of them.
+    """
+    archived = is_archived(rep_time)
+    if archived:
+        # the archive reader imports this module, so it can't be imported up front
+        from surf_data.lib.ndbc_archive import get_archive_report
+
+        try:
+            return await get_archive_report(
+                session, station_id, fallback_station_id, report_type, rep_time
+            )
+        except ValueError:
+            if not _in_realtime_boundary_month(rep_time):
+                raise
+            logging.info(
+                f"No archived {report_type.value} data for {rep_time} yet, "
+                f"reading realtime2 instead"
+            )
+    if (
+        not archived
+        and report_type == NDBCDataTypes.weather
+        and FetchConfig.USE_LATEST_OBS
+    ):
+        # this imports the buoys module too
+        from surf_data.lib.latest_obs import get_latest_report
+
+        latest_report = await get_latest_report(
+            session, station_id, fallback_station_id, rep_time
+        )
+        if latest_report is not None:
+            return latest_report
+    return await _get_realtime_report(
+        session,
+        station_id,
+        fallback_station_id,
+        report_type,
+        rep_time,
+        ColumnarReport.from_raw_report,
+    )
+
+
+async def _get_spectral_report(
+    session: ClientSession, station: SurfSpotDetails, rep_time: datetime
+) -> Optional[SpectralReport]:
+    """
+    The station's spectral densities with their directions attached.
+    Both come from the same station, so if either is missing we fall back
+    to the other station for the pair.
+    Times older than realtime2 goes back get the archived densities,
+    which have no directions, or realtime2's if NDBC hasn't archived the month yet.
+    Swell partitions are a nice to have, so if anything goes wrong we just go without.
+    """
+    if not FetchConfig.FETCH_SPECTRA:
+        return None
+    if is_archived(rep_time):
+        # the archive reader imports this module, so it can't be imported up front
+        from surf_data.lib.ndbc_archive import get_archive_spectral_report
+
+        try:
+            return await get_archive_spectral_report(
+                session, station.nbdc_buoy_id, station.fallback_buoy_id, rep_time
+            )
+        except ValueError as e:
+            if not _in_realtime_boundary_month(rep_time):
+                logging.error(
+                    f"Couldn't get archived spectra for {station.nbdc_buoy_id}: {e!r}"
+                )
+                return None
+        except (ClientError, asyncio.TimeoutError, zlib.error) as e:
+            logging.error(
+                f"Couldn't get archived spectra for {station.nbdc_buoy_id}: {e!r}"
+            )
+            return None
+    bucket_start, bucket_time = _get_report_bucket(rep_time)
+
+    async def fetch(candidate: int) -> SpectralReport:
+        density_report, direction_report = await gather(
+            *(
+                _stream_station_report(
+                    session,
+                    _get_station_url(candidate, report_type),
+                    bucket_time,
+                    parse=SpectralReport.from_raw_report,
+                )
+                for report_type in (
+                    NDBCDataTypes.spectral_density,
+                    NDBCDataTypes.spectral_direction,
+                )
+            )
+        )
+        return density_report.with_directions(direction_report)
+
     try:
-        station_url = (
-            f"{NDBC_BASE_URL}{station_id}.{report_to_extension_map[report_type.value]}"
+        return await SINGLE_FLIGHT.do(
+            (
+                "ndbc",
+                "spectra",
+                station.nbdc_buoy_id,
+                station.fallback_buoy_id,
+                bucket_start,
+            ),
+            lambda: _fetch_with_fallback(
+                fetch,
+                station.nbdc_buoy_id,
+                station.fallback_buoy_id,
+                NDBCDataTypes.spectral_density,
+            ),
         )
-        logging.info(f"Hitting: {station_url}")
-        async with session.get(station_url) as resp:
-            return await resp.text()
-    except ClientResponseError:
-        logging.error(
-            f"Error getting data from station {station_id}. Falling back to station {fallback_station_id}."
+    except (ClientError, asyncio.TimeoutError, ValueError) as e:
+        logging.error(f"Couldn't get spectra for {station.nbdc_buoy_id}: {e!r}")
+        return None
+
+
+def _get_swell_partitions(
+    spectral_report: Optional[SpectralReport], rep_times: Sequence[datetime]
+) -> List[Tuple[SwellPartition, ...]]:
+    """
+    The swell partitions of the spectral record closest to each time,
+    or none for times without a spectral record close enough.
+    """
+    if spectral_report is None or len(spectral_report) == 0:
+        return [()] * len(rep_times)
+    closest = get_closest_records(spectral_report, rep_times)
+    partitions = spectral_report.get_partitions([record.row for record in closest])
+    return [
+        row_partitions
+        if abs(record.offset_seconds) <= FetchConfig.MAX_RECORD_OFFSET_SECONDS
+        else ()
+        for record, row_partitions in zip(closest, partitions)
+    ]
+
+
+def _read_conditions(
+    condition_reports: Sequence[ConditionReport],
+    report: ColumnarReport,
+    rep_times: Sequence[datetime],
+) -> List[ClosestRecord]:
+    """
+    Fills in each condition report from the report's records at its time,
+    the way FetchConfig.RECORD_SELECTION says to.
+    Returns the closest record to each time, for its offset.
+    """
+    if FetchConfig.RECORD_SELECTION == "interpolate":
+        interpolated = interpolate_records(report, rep_times)
+        for condition_report, values, record in zip(
+            condition_reports, interpolated.values, interpolated.closest_records
+        ):
+            condition_report.parse_interpolated_values(report, values, record)
+        return interpolated.closest_records
+    if FetchConfig.RECORD_SELECTION != "closest":
+        raise ValueError(
+            f"Unknown record selection {FetchConfig.RECORD_SELECTION!r}, "
+            f"expected 'interpolate' or 'closest'"
         )
-        station_url = f"{NDBC_BASE_URL}{fallback_station_id}.{report_to_extension_map[report_type.value]}"
-        logging.info(f"Hitting: {station_url}")
-        async with session.get(station_url) as resp:
-            return await resp.text()
+    closest_records = get_closest_records(report, rep_times)
+    for condition_report, record in zip(condition_reports, closest_records):
+        condition_report.parse_columnar_row(report, record.row)
+    return closest_records
 
 
 async def get_station_data(
@@ -280,24 +1099,95 @@ async def get_station_data(
     station: SurfSpotDetails,
     rep_time: Optional[datetime] = None,
 ) -> ConditionReport:
-    raw_weather, raw_waves = await gather(
-        _get_raw_station_data(
+    if rep_time is None:
+        rep_time = get_current_time()
+    weather_report, wave_report, spectral_report = await gather(
+        _get_station_report(
             session,
             station.nbdc_buoy_id,
             station.fallback_buoy_id,
             NDBCDataTypes.weather,
+            rep_time,
         ),
-        _get_raw_station_data(
-            session, station.nbdc_buoy_id, station.fallback_buoy_id, NDBCDataTypes.waves
+        _get_station_report(
+            session,
+            station.nbdc_buoy_id,
+            station.fallback_buoy_id,
+            NDBCDataTypes.waves,
+            rep_time,
         ),
+        _get_spectral_report(session, station, rep_time),
     )
-    if rep_time is None:
-        rep_time = get_current_time()
     condition_report = ConditionReport(station_id=station.nbdc_buoy_id)
-    weather_report = RawReport.from_raw_report(raw_weather, RawWeatherRecord)
-    wave_report = RawReport.from_raw_report(raw_waves, RawWaveRecord)
-    weather_record = get_closest_record(weather_report, rep_time)
-    wave_record = get_closest_record(wave_report, rep_time)
-    condition_report.parse_raw_record_data(weather_record)
-    condition_report.parse_raw_record_data(wave_record)
+    (weather_record,) = _read_conditions([condition_report], weather_report, [rep_time])
+    (wave_record,) = _read_conditions([condition_report], wave_report, [rep_time])
+    condition_report.record_offset_seconds = max(
+        abs(weather_record.offset_seconds), abs(wave_record.offset_seconds)
+    )
+    (condition_report.swell_partitions,) = _get_swell_partitions(
+        spectral_report, [rep_time]
+    )
     return condition_report
+
+
+async def get_station_data_for_times(
+    session: ClientSession,
+    station: SurfSpotDetails,
+    rep_times: Sequence[datetime],
+) -> List[Optional[ConditionReport]]:
+    """
+    Conditions for a batch of times from one download of each report.
+    Times with no record within FetchConfig.MAX_RECORD_OFFSET_SECONDS
+    (older than the report goes back, say) come back as None.
+    Archived times are read a (UTC) month at a time,
+    so batches of old times should stay within one UTC month.
+    A batch that reaches across realtime2's edge gets split there,
+    so the newer times still come from realtime2.
+    """
+    archived = [is_archived(rep_time) for rep_time in rep_times]
+    if any(archived) and not all(archived):
+        old_times = [t for t, old in zip(rep_times, archived) if old]
+        new_times = [t for t, old in zip(rep_times, archived) if not old]
+        old_results, new_results = await gather(
+            get_station_data_for_times(session, station, old_times),
+            get_station_data_for_times(session, station, new_times),
+        )
+        old_iter, new_iter = iter(old_results), iter(new_results)
+        return [next(old_iter) if old else next(new_iter) for old in archived]
+    oldest_time = min(rep_times)
+    weather_report, wave_report, spectral_report = await gather(
+        _get_station_report(
+            session,
+            station.nbdc_buoy_id,
+            station.fallback_buoy_id,
+            NDBCDataTypes.weather,
+            oldest_time,
+        ),
+        _get_station_report(
+            session,
+            station.nbdc_buoy_id,
+            station.fallback_buoy_id,
+            NDBCDataTypes.waves,
+            oldest_time,
+        ),
+        _get_spectral_report(session, station, oldest_time),
+    )
+    condition_reports = [
+        ConditionReport(station_id=station.nbdc_buoy_id) for _ in rep_times
+    ]
+    results: List[Optional[ConditionReport]] = []
+    for condition_report, weather_record, wave_record, swell_partitions in zip(
+        condition_reports,
+        _read_conditions(condition_reports, weather_report, rep_times),
+        _read_conditions(condition_reports, wave_report, rep_times),
+        _get_swell_partitions(spectral_report, rep_times),
+    ):
+        condition_report.record_offset_seconds = max(
+            abs(weather_record.offset_seconds), abs(wave_record.offset_seconds)
+        )
+        if condition_report.record_offset_seconds > FetchConfig.MAX_RECORD_OFFSET_SECONDS:
+            results.append(None)
+            continue
+        condition_report.swell_partitions = swell_partitions
+        results.append(condition_report)
+    return results
@@ -0,0 +1,203 @@
+"""
+How diary entries' conditions get stored in DynamoDB.
+
+Items used to hold asdict(ConditionReport) and asdict(TideData) as is,
+so every field was a {measure, unit} map with a string measure, None or not.
+Now each measure is a plain Decimal attribute named after its NDBC column,
+in that column's canonical unit. The units live here in ITEM_SCHEMAS,
+once per schema version, and missing values are left out of the item.
+Every item records the schema version it was written with in "v".
+
+Items without a "v" are the old style, and we can still read those.
+"""
+
+from dataclasses import dataclass, fields
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, List, Optional, Tuple
+from surf_data.lib.buoys import NDBC_COL_TO_ATTRIBUTE_MAP, ConditionReport
+from surf_data.lib.record_helpers import DataPoint
+from surf_data.lib.spectra import SwellPartition
+from surf_data.lib.tides import TideData
+
+
+SCHEMA_VERSION_ATTRIBUTE = "v"
+BUOY_ATTRIBUTE = "buoy"
+TIDE_HEIGHT_ATTRIBUTE = "tide_ft"
+TIDE_RATE_ATTRIBUTE = "tide_ft_hr"
+# A list of [height, period, direction] lists, one per swell partition
+SWELLS_ATTRIBUTE = "swells"
+# Seconds between the entry and the nearest buoy record its conditions came from
+RECORD_OFFSET_ATTRIBUTE = "offset_s"
+# How many decimal places we keep after converting to the canonical unit
+STORED_DECIMALS = 2
+
+
+@dataclass(frozen=True)
+class ItemSchema:
+    # NDBC column -> the unit its measure is stored in
+    units: Dict[str, str]
+    # columns that hold labels like "WNW", stored as strings
+    labels: Tuple[str, ...]
+    # units of each swell partition's height, period and direction
+    partition_units: Tuple[str, str, str] = ("m", "sec", "degT")
+
+
+ITEM_SCHEMAS: Dict[int, ItemSchema] = {
+    1: ItemSchema(
+        units={
+            "WDIR": "degT",
+            "WSPD": "m/s",
+            "GST": "m/s",
+            "PRES": "hPa",
+            "ATMP": "degC",
+            "WSPD10M": "m/s",
+            "WSPD20M": "m/s",
+            "WVHT": "m",
+            "SwH": "m",
+            "SwP": "sec",
+            "SwD": "-",
+            "WWH": "m",
+            "WWP": "sec",
+            "WWD": "-",
+            "STEEPNESS": "-",
+            "APD": "sec",
+        },
+        labels=("SwD", "WWD", "STEEPNESS"),
+    ),
+}
+ITEM_SCHEMA_VERSION = max(ITEM_SCHEMAS)
+
+# (from unit, to unit) -> multiplier, for measures that didn't come from realtime2
+UNIT_CONVERSIONS = {
+    ("kts", "m/s"): Decimal("0.514444"),
+    ("mph", "m/s"): Decimal("0.44704"),
+    ("ft", "m"): Decimal("0.3048"),
+}
+
+CONDITION_FIELDS = {field.name for field in fields(ConditionReport)}
+ATTRIBUTE_TO_NDBC_COL = {
+    attribute: column
+    for column, attribute in NDBC_COL_TO_ATTRIBUTE_MAP.items()
+    if attribute in CONDITION_FIELDS
+}
+# Old style items had asdict(ConditionReport) and asdict(TideData) spread across them
+LEGACY_ATTRIBUTES = tuple(sorted(CONDITION_FIELDS)) + (
+    "tide_height",
+    "tide_rate_of_change",
+)
+
+
+def _to_canonical(column: str, data_point: DataPoint, schema: ItemSchema) -> Any:
+    if column in schema.labels:
+        return str(data_point.measure)
+    try:
+        measure = Decimal(str(data_point.measure))
+    except InvalidOperation:
+        raise ValueError(f"{column} measure {data_point.measure!r} isn't a number")
+    unit = schema.units[column]
+    if data_point.unit != unit:
+        if (data_point.unit, unit) not in UNIT_CONVERSIONS:
+            raise ValueError(f"Can't convert {column} from {data_point.unit} to {unit}")
+        measure *= UNIT_CONVERSIONS[(data_point.unit, unit)]
+        measure = round(measure, STORED_DECIMALS)
+    return measure
+
+
+def encode_conditions(
+    conditions: Optional[ConditionReport], tide: Optional[TideData]
+) -> Dict[str, Any]:
+    """
+    The condition attributes of a diary item, in the current schema.
+    """
+    schema = ITEM_SCHEMAS[ITEM_SCHEMA_VERSION]
+    item: Dict[str, Any] = {SCHEMA_VERSION_ATTRIBUTE: ITEM_SCHEMA_VERSION}
+    if conditions is not None:
+        item[BUOY_ATTRIBUTE] = conditions.station_id
+        for attribute, column in ATTRIBUTE_TO_NDBC_COL.items():
+            data_point = getattr(conditions, attribute)
+            if data_point is not None:
+                item[column] = _to_canonical(column, data_point, schema)
+        if conditions.swell_partitions:
+            item[SWELLS_ATTRIBUTE] = [
+                [
+                    Decimal(str(data_point.measure))
+                    for data_point in (
+                        partition.height,
+                        partition.period,
+                        partition.direction,
+                    )
+                    if data_point is not None
+                ]
+                for partition in conditions.swell_partitions
+            ]
+        if conditions.record_offset_seconds is not None:
+            item[RECORD_OFFSET_ATTRIBUTE] = int(round(conditions.record_offset_seconds))
+    if tide is not None:
+        item[TIDE_HEIGHT_ATTRIBUTE] = Decimal(tide.tide_height)
+        item[TIDE_RATE_ATTRIBUTE] = Decimal(tide.tide_rate_of_change)
+    return item
+
+
+def get_legacy_attributes(item: Dict[str, Any]) -> List[str]:
+    """
+    The old style condition attributes on an item, which re-encoding leaves behind.
+    """
+    if SCHEMA_VERSION_ATTRIBUTE in item:
+        return []
+    return [name for name in LEGACY_ATTRIBUTES if name in item]
+
+
+def _decode_legacy(
+    item: Dict[str, Any]
+) -> Tuple[Optional[ConditionReport], Optional[TideData]]:
+    conditions = None
+    if "station_id" in item:
+        conditions = ConditionReport(station_id=int(item["station_id"]))
+        for attribute in ATTRIBUTE_TO_NDBC_COL:
+            value = item.get(attribute)
+            if value is not None:
+                setattr(conditions, attribute, DataPoint(value["measure"], value["unit"]))
+    tide = None
+    if "tide_height" in item:
+        tide = TideData(str(item["tide_height"]), str(item["tide_rate_of_change"]))
+    return conditions, tide
+
+
+def decode_conditions(
+    item: Dict[str, Any]
+) -> Tuple[Optional[ConditionReport], Optional[TideData]]:
+    """
+    Rebuilds the ConditionReport and TideData from an item of any schema version.
+    """
+    if SCHEMA_VERSION_ATTRIBUTE not in item:
+        return _decode_legacy(item)
+    version = int(item[SCHEMA_VERSION_ATTRIBUTE])
+    if version not in ITEM_SCHEMAS:
+        raise ValueError(f"Unknown diary item schema version {version}")
+    schema = ITEM_SCHEMAS[version]
+    conditions = None
+    if BUOY_ATTRIBUTE in item:
+        conditions = ConditionReport(station_id=int(item[BUOY_ATTRIBUTE]))
+        for attribute, column in ATTRIBUTE_TO_NDBC_COL.items():
+            if column in item:
+                measure = item[column]
+                if column not in schema.labels:
+                    measure = str(measure)
+                setattr(conditions, attribute, DataPoint(measure, schema.units[column]))
+        conditions.swell_partitions = tuple(
+            SwellPartition(
+                *(
+                    DataPoint(str(measure), unit)
+                    for measure, unit in zip(partition, schema.partition_units)
+                )
+            )
+            for partition in item.get(SWELLS_ATTRIBUTE, [])
+        )
+        if RECORD_OFFSET_ATTRIBUTE in item:
+            conditions.record_offset_seconds = float(item[RECORD_OFFSET_ATTRIBUTE])
+    tide = None
+    if TIDE_HEIGHT_ATTRIBUTE in item:
+        tide = TideData(
+            str(item[TIDE_HEIGHT_ATTRIBUTE]), str(item[TIDE_RATE_ATTRIBUTE])
+        )
+    return conditions, tide
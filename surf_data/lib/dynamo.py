@@ -1,31 +1,135 @@
-import boto3
-from boto3.dynamodb.conditions import Key
-from typing import Any, Dict, Union
+"""
+One DynamoDB resource for the whole process.
+
+Making a boto3 resource resolves credentials, sets up the endpoint and opens
+a new connection pool, so we only do that once per warm lambda.
+Table handles are cached too. Everything that talks to DynamoDB
+(the diary, station health, snapshots) should get its table from get_table.
+boto3 is slow to import, so it only gets imported once something
+actually asks for the resource, and importing this module stays cheap.
+
+AsyncSurfDiaryDB has the diary operations as coroutines, so they can run
+on the same loop as the NDBC and NOAA fetches. boto3 blocks, so the calls
+go to a small thread pool. They share the resource's low level client,
+which unlike the resource is safe to use from several threads.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import logging
+import random
+import threading
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    TYPE_CHECKING,
+    TypeVar,
+    Union,
+)
 from surf_data import DynamoDBConfig
 
+if TYPE_CHECKING:
+    from botocore.config import Config
+
 
 DDB_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+# BatchWriteItem takes at most this many items per call
+BATCH_WRITE_LIMIT = 25
+MIN_THROTTLE_DELAY_SECONDS = 0.05
+MAX_THROTTLE_DELAY_SECONDS = 5.0
+
+R = TypeVar("R")
+
+_resource = None
+_tables: Dict[str, Any] = {}
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def get_botocore_config() -> "Config":
+    from botocore.config import Config
+
+    return Config(
+        region_name=DynamoDBConfig.REGION,
+        max_pool_connections=DynamoDBConfig.MAX_POOL_CONNECTIONS,
+        connect_timeout=DynamoDBConfig.CONNECT_TIMEOUT_SECONDS,
+        read_timeout=DynamoDBConfig.READ_TIMEOUT_SECONDS,
+        tcp_keepalive=True,
+        retries={
+            "max_attempts": DynamoDBConfig.MAX_RETRY_ATTEMPTS,
+            "mode": DynamoDBConfig.RETRY_MODE,
+        },
+    )
+
+
+def get_dynamodb_resource():
+    """
+    Built the first time it's asked for, then shared.
+    """
+    global _resource
+    with _lock:
+        if _resource is None:
+            import boto3
+
+            _resource = boto3.session.Session().resource(
+                "dynamodb",
+                endpoint_url=DynamoDBConfig.ENDPOINT_URL,
+                config=get_botocore_config(),
+            )
+        return _resource
+
+
+def get_table(table_name: str):
+    if table_name not in _tables:
+        _tables[table_name] = get_dynamodb_resource().Table(table_name)
+    return _tables[table_name]
+
+
+def get_dynamodb_executor() -> ThreadPoolExecutor:
+    """
+    One thread per pooled connection, so we never wait on the pool itself.
+    """
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=DynamoDBConfig.MAX_POOL_CONNECTIONS,
+                thread_name_prefix="dynamodb",
+            )
+        return _executor
 
 
+def reset_dynamodb_resource() -> None:
+    """
+    Forget the shared resource, say after changing DynamoDBConfig.
+    """
+    global _resource
+    with _lock:
+        _resource = None
+        _tables.clear()
+
 
 class SurfDiaryDB():
     def __init__(self):
         self.TABLE_NAME = DynamoDBConfig.TABLE_NAME
-        self.ddb = boto3.resource(
-            'dynamodb',
-            region_name=DynamoDBConfig.REGION
-        )
+        self.table = get_table(self.TABLE_NAME)
 
     def persist_entry(self, args: Dict[str, Union[str, float]]):
-        tb = self.ddb.Table(self.TABLE_NAME)
-        return tb.put_item(**args)
+        return self.table.put_item(**args)
     
     def get_latest_entry(self, surf_spot: str) -> Dict[str, Any]:
         """
         Returns the latest entry rocorded for the given spot.
         """
-        tb = self.ddb.Table(self.TABLE_NAME)
-        resp = tb.query(
+        from boto3.dynamodb.conditions import Key
+
+        resp = self.table.query(
             Select='ALL_ATTRIBUTES',
             Limit=1,
             ConsistentRead=False,
@@ -33,3 +137,188 @@ class SurfDiaryDB():
             KeyConditionExpression=Key(DynamoDBConfig.PARTITION_KEY).eq(surf_spot)
         )
         return resp["Items"][0]
+
+
+_serializer = None
+_deserializer = None
+
+
+def serialize_value(value: Any) -> Dict[str, Any]:
+    global _serializer
+    if _serializer is None:
+        from boto3.dynamodb.types import TypeSerializer
+
+        _serializer = TypeSerializer()
+    return _serializer.serialize(value)
+
+
+def deserialize_value(value: Dict[str, Any]) -> Any:
+    global _deserializer
+    if _deserializer is None:
+        from boto3.dynamodb.types import TypeDeserializer
+
+        _deserializer = TypeDeserializer()
+    return _deserializer.deserialize(value)
+
+
+def serialize_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    return {name: serialize_value(value) for name, value in item.items()}
+
+
+def deserialize_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    return {name: deserialize_value(value) for name, value in item.items()}
+
+
+def chunk(items: Sequence[R], size: int) -> List[Sequence[R]]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+class AsyncSurfDiaryDB:
+    def __init__(
+        self,
+        table_name: Optional[str] = None,
+        client: Any = None,
+        executor: Optional[ThreadPoolExecutor] = None,
+    ):
+        self.TABLE_NAME = table_name or DynamoDBConfig.TABLE_NAME
+        self.client = client or get_dynamodb_resource().meta.client
+        self.executor = executor or get_dynamodb_executor()
+        # Shared by every batch in flight. It doubles each time DynamoDB
+        # hands items back unprocessed and halves after each clean batch,
+        # so a throttled table slows all the writers down at once.
+        self._throttle_delay = 0.0
+
+    async def _call(self, func: Callable[..., R], **kwargs: Any) -> R:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, **kwargs))
+
+    async def persist_entry(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Takes the same {"Item": ...} args as SurfDiaryDB.persist_entry.
+        """
+        return await self._call(
+            self.client.put_item,
+            TableName=self.TABLE_NAME,
+            **{**args, "Item": serialize_item(args["Item"])},
+        )
+
+    async def get_entry(self, key: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        resp = await self._call(
+            self.client.get_item, TableName=self.TABLE_NAME, Key=serialize_item(key)
+        )
+        if "Item" not in resp:
+            return None
+        return deserialize_item(resp["Item"])
+
+    async def get_latest_entry(self, surf_spot: str) -> Optional[Dict[str, Any]]:
+        resp = await self._call(
+            self.client.query,
+            TableName=self.TABLE_NAME,
+            Limit=1,
+            ScanIndexForward=False,
+            KeyConditionExpression="#spot = :spot",
+            ExpressionAttributeNames={"#spot": DynamoDBConfig.PARTITION_KEY},
+            ExpressionAttributeValues={":spot": serialize_value(surf_spot)},
+        )
+        if not resp["Items"]:
+            return None
+        return deserialize_item(resp["Items"][0])
+
+    async def query_spot(
+        self, surf_spot: str, page_size: Optional[int] = None
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Every entry for the spot, oldest first, a page at a time.
+        """
+        query_kwargs: Dict[str, Any] = {
+            "TableName": self.TABLE_NAME,
+            "KeyConditionExpression": "#spot = :spot",
+            "ExpressionAttributeNames": {"#spot": DynamoDBConfig.PARTITION_KEY},
+            "ExpressionAttributeValues": {":spot": serialize_value(surf_spot)},
+        }
+        if page_size is not None:
+            query_kwargs["Limit"] = page_size
+        while True:
+            resp = await self._call(self.client.query, **query_kwargs)
+            yield [deserialize_item(item) for item in resp["Items"]]
+            if "LastEvaluatedKey" not in resp:
+                return
+            query_kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+    async def update_entry(
+        self,
+        key: Dict[str, str],
+        attributes: Dict[str, Any],
+        remove: Sequence[str] = (),
+    ) -> Dict[str, Any]:
+        """
+        Sets the attributes on an existing entry, and removes the ones in remove.
+        Fails rather than bring back an entry that got deleted in the meantime.
+        """
+        names = {f"#a{i}": name for i, name in enumerate(attributes)}
+        values = {
+            f":v{i}": serialize_value(value)
+            for i, value in enumerate(attributes.values())
+        }
+        update_expression = "SET " + ", ".join(
+            f"#a{i} = :v{i}" for i in range(len(attributes))
+        )
+        if remove:
+            names.update({f"#r{i}": name for i, name in enumerate(remove)})
+            update_expression += " REMOVE " + ", ".join(
+                f"#r{i}" for i in range(len(remove))
+            )
+        names["#spot"] = DynamoDBConfig.PARTITION_KEY
+        return await self._call(
+            self.client.update_item,
+            TableName=self.TABLE_NAME,
+            Key=serialize_item(key),
+            UpdateExpression=update_expression,
+            ConditionExpression="attribute_exists(#spot)",
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+        )
+
+    async def _write_batch(self, items: Sequence[Dict[str, Any]]) -> None:
+        """
+        Writes up to BATCH_WRITE_LIMIT items, retrying whatever DynamoDB
+        sends back unprocessed after a jittered, adaptive delay.
+        """
+        requests = [{"PutRequest": {"Item": serialize_item(item)}} for item in items]
+        for _ in range(DynamoDBConfig.MAX_RETRY_ATTEMPTS + 1):
+            if self._throttle_delay > 0:
+                await asyncio.sleep(random.uniform(0, self._throttle_delay))
+            resp = await self._call(
+                self.client.batch_write_item,
+                RequestItems={self.TABLE_NAME: requests},
+            )
+            requests = resp.get("UnprocessedItems", {}).get(self.TABLE_NAME, [])
+            if not requests:
+                self._throttle_delay /= 2
+                return
+            self._throttle_delay = min(
+                max(self._throttle_delay * 2, MIN_THROTTLE_DELAY_SECONDS),
+                MAX_THROTTLE_DELAY_SECONDS,
+            )
+            logging.info(f"{len(requests)} items came back unprocessed. Retrying.")
+        raise RuntimeError(f"{len(requests)} items were still unprocessed")
+
+    async def batch_put(
+        self,
+        items: Sequence[Dict[str, Any]],
+        on_batch_written: Optional[Callable[[int], None]] = None,
+    ) -> None:
+        """
+        Writes the items in batches, all of them in flight at once.
+        The thread pool caps how many calls actually run at the same time.
+        on_batch_written gets called with the size of each batch once it's all in.
+        """
+
+        async def write(batch: Sequence[Dict[str, Any]]) -> None:
+            await self._write_batch(batch)
+            if on_batch_written is not None:
+                on_batch_written(len(batch))
+
+        await asyncio.gather(
+            *(write(batch) for batch in chunk(items, BATCH_WRITE_LIMIT))
+        )
@@ -0,0 +1,247 @@
+"""
+A small HTTP response cache for the NDBC and NOAA fetchers.
+
+Responses live in memory for as long as the lambda stays warm, and get
+written to /tmp so they survive the runtime process being restarted
+in the same execution environment.
+Each entry remembers the ETag/Last-Modified headers we got, so once the
+entry is older than its source's TTL we can revalidate with a conditional GET
+and usually just get back a 304.
+
+The cache is capped by the number of body bytes it holds.
+The least recently used entries get evicted first.
+
+Cache hits and 304s come back much faster than the upstream really answers,
+so anything timing upstreams (like the station health latencies) should only
+count fetches that got a full response. track_full_responses tells them apart.
+"""
+
+from collections import OrderedDict
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, replace
+from hashlib import sha1
+from http import HTTPStatus
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Mapping, Optional
+from aiohttp import ClientResponse, ClientSession
+from yarl import URL
+from surf_data import HTTPCacheConfig
+
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    fetched_at: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    # False when we stopped reading the response early and only hold the start of it
+    complete: bool = True
+
+    @classmethod
+    def from_response(
+        cls, resp: ClientResponse, body: bytes, complete: bool = True
+    ) -> "CachedResponse":
+        return cls(
+            body=body,
+            fetched_at=time.time(),
+            etag=resp.headers.get("ETag"),
+            last_modified=resp.headers.get("Last-Modified"),
+            complete=complete,
+        )
+
+    def is_fresh(self, ttl_seconds: float) -> bool:
+        return time.time() - self.fetched_at < ttl_seconds
+
+    def conditional_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag is not None:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified is not None:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def revalidated(self) -> "CachedResponse":
+        """
+        The server told us our copy is still good, so it's fresh again.
+        """
+        return replace(self, fetched_at=time.time())
+
+
+def cache_key(url: str, params: Optional[Mapping[str, Any]] = None) -> str:
+    if not params:
+        return url
+    return str(URL(url).with_query(sorted((k, str(v)) for k, v in params.items())))
+
+
+class ResponseCache:
+    def __init__(self, cache_dir: Optional[str], max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._size = 0
+        self._prune_disk()
+
+    def _path(self, key: str) -> str:
+        assert self.cache_dir is not None
+        return os.path.join(self.cache_dir, sha1(key.encode()).hexdigest())
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            return entry
+        entry = self._read_from_disk(key)
+        if entry is not None:
+            self._remember(key, entry)
+        return entry
+
+    def put(self, key: str, entry: CachedResponse) -> None:
+        if len(entry.body) > self.max_bytes:
+            logging.info(f"Response for {key} is too big to cache")
+            return
+        self._remember(key, entry)
+        self._write_to_disk(key, entry)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._size = 0
+
+    def _remember(self, key: str, entry: CachedResponse) -> None:
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._size -= len(previous.body)
+        self._entries[key] = entry
+        self._size += len(entry.body)
+        while self._size > self.max_bytes:
+            evicted_key, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted.body)
+            self._remove_from_disk(evicted_key)
+
+    def _read_from_disk(self, key: str) -> Optional[CachedResponse]:
+        if self.cache_dir is None:
+            return None
+        path = self._path(key)
+        try:
+            with open(f"{path}.json") as meta_file:
+                meta = json.load(meta_file)
+            with open(f"{path}.body", "rb") as body_file:
+                body = body_file.read()
+        except (OSError, ValueError):
+            return None
+        if meta.pop("key", None) != key:
+            return None
+        return CachedResponse(body=body, **meta)
+
+    def _write_to_disk(self, key: str, entry: CachedResponse) -> None:
+        """
+        Writes to temp files and renames them into place,
+        so a frozen or killed lambda never leaves half an entry behind.
+        """
+        if self.cache_dir is None:
+            return
+        path = self._path(key)
+        meta = asdict(entry)
+        del meta["body"]
+        meta["key"] = key
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(f"{path}.body.tmp", "wb") as body_file:
+                body_file.write(entry.body)
+            with open(f"{path}.json.tmp", "w") as meta_file:
+                json.dump(meta, meta_file)
+            os.replace(f"{path}.body.tmp", f"{path}.body")
+            os.replace(f"{path}.json.tmp", f"{path}.json")
+        except OSError:
+            logging.exception(f"Couldn't write cache entry for {key} to disk")
+
+    def _prune_disk(self) -> None:
+        """
+        Entries left on disk by a previous process aren't in memory yet,
+        so trim the oldest ones until the directory fits in max_bytes.
+        """
+        if self.cache_dir is None or not os.path.isdir(self.cache_dir):
+            return
+        bodies = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".body"):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                bodies.append((stat.st_mtime, stat.st_size, name[: -len(".body")]))
+        total_size = sum(size for _, size, _ in bodies)
+        for _, size, name in sorted(bodies):
+            if total_size <= self.max_bytes:
+                break
+            for suffix in (".json", ".body"):
+                try:
+                    os.remove(os.path.join(self.cache_dir, f"{name}{suffix}"))
+                except OSError:
+                    pass
+            total_size -= size
+
+    def _remove_from_disk(self, key: str) -> None:
+        if self.cache_dir is None:
+            return
+        path = self._path(key)
+        for suffix in (".json", ".body"):
+            try:
+                os.remove(f"{path}{suffix}")
+            except OSError:
+                pass
+
+
+RESPONSE_CACHE = ResponseCache(HTTPCacheConfig.CACHE_DIR, HTTPCacheConfig.MAX_BYTES)
+
+_full_responses: ContextVar[Optional[List[str]]] = ContextVar(
+    "full_responses", default=None
+)
+
+
+def track_full_responses() -> List[str]:
+    """
+    Returns a list that collects the URLs fetched in full (not from the cache,
+    and not a 304) by the current task from here on.
+    Tasks copy the context they're created in, so give each fetch its own task.
+    """
+    urls: List[str] = []
+    _full_responses.set(urls)
+    return urls
+
+
+def note_full_response(url: str) -> None:
+    urls = _full_responses.get()
+    if urls is not None:
+        urls.append(url)
+
+
+async def cached_get(
+    session: ClientSession,
+    url: str,
+    source: str,
+    params: Optional[Mapping[str, Any]] = None,
+    cache: Optional[ResponseCache] = None,
+) -> bytes:
+    """
+    GETs the url and returns the response body, going through the cache.
+    source picks the TTL from HTTPCacheConfig.TTL_SECONDS.
+    """
+    if cache is None:
+        cache = RESPONSE_CACHE
+    key = cache_key(url, params)
+    cached = cache.get(key)
+    if cached is not None and not cached.complete:
+        cached = None
+    if cached is not None and cached.is_fresh(HTTPCacheConfig.TTL_SECONDS[source]):
+        logging.info(f"Using cached response for {key}")
+        return cached.body
+    headers = cached.conditional_headers() if cached is not None else {}
+    async with session.get(url, params=params, headers=headers) as resp:
+        if resp.status == HTTPStatus.NOT_MODIFIED and cached is not None:
+            logging.info(f"Cached response for {key} is still valid")
+            cache.put(key, cached.revalidated())
+            return cached.body
+        body = await resp.read()
+    note_full_response(key)
+    cache.put(key, CachedResponse.from_response(resp, body))
+    return body
@@ -0,0 +1,100 @@
+"""
+A small static k-d tree, for finding the stations nearest a spot.
+
+We build it once over a few thousand points. Each node splits its points at
+the median of whichever dimension they're most spread out in, and leaves hold
+up to LEAF_SIZE points that we check all at once with NumPy.
+The points get reordered so every node's points are one contiguous slice.
+
+A query walks down to the leaf holding the point, then only backs up into
+nodes whose side of the split could still hold something closer than the
+k-th best so far. That's a handful of leaves, however many points there are.
+"""
+
+import heapq
+from typing import List, Sequence, Tuple
+import numpy as np
+
+
+LEAF_SIZE = 16
+
+
+class KDTree:
+    def __init__(self, points: np.ndarray, leaf_size: int = LEAF_SIZE):
+        points = np.asarray(points, dtype=np.float64)
+        if points.ndim != 2:
+            raise ValueError(f"Expected an (n x d) array of points, got {points.shape}")
+        self.leaf_size = max(leaf_size, 1)
+        # indices[i] is the original index of the i-th point in tree order
+        self.indices = np.arange(len(points))
+        # one entry per node. Leaves have a split dimension of -1 and no children.
+        self._starts: List[int] = []
+        self._ends: List[int] = []
+        self._dims: List[int] = []
+        self._splits: List[float] = []
+        self._children: List[Tuple[int, int]] = []
+        if len(points) > 0:
+            self._build(points, 0, len(points))
+        self.points = points[self.indices]
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def _build(self, points: np.ndarray, start: int, end: int) -> int:
+        node = len(self._starts)
+        self._starts.append(start)
+        self._ends.append(end)
+        self._dims.append(-1)
+        self._splits.append(0.0)
+        self._children.append((-1, -1))
+        if end - start <= self.leaf_size:
+            return node
+        segment = self.indices[start:end]
+        dim = int(np.argmax(np.ptp(points[segment], axis=0)))
+        middle = (end - start) // 2
+        self.indices[start:end] = segment[
+            np.argpartition(points[segment, dim], middle)
+        ]
+        self._dims[node] = dim
+        self._splits[node] = float(points[self.indices[start + middle], dim])
+        left = self._build(points, start, start + middle)
+        right = self._build(points, start + middle, end)
+        self._children[node] = (left, right)
+        return node
+
+    def query(self, point: Sequence[float], k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        The euclidean distances to the k points nearest to point,
+        and their indices in the points the tree was built from. Nearest first.
+        """
+        target = np.asarray(point, dtype=np.float64)
+        coordinates = target.tolist()
+        k = min(k, len(self))
+        # a max heap (by negated squared distance) of the k best so far
+        best: List[Tuple[float, int]] = []
+
+        def visit(node: int) -> None:
+            dim = self._dims[node]
+            if dim < 0:
+                start = self._starts[node]
+                block = self.points[start:self._ends[node]]
+                distances = np.einsum("ij,ij->i", block - target, block - target)
+                for offset, distance in enumerate(distances.tolist()):
+                    if len(best) < k:
+                        heapq.heappush(best, (-distance, start + offset))
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, (-distance, start + offset))
+                return
+            difference = coordinates[dim] - self._splits[node]
+            left, right = self._children[node]
+            near, far = (left, right) if difference < 0 else (right, left)
+            visit(near)
+            if len(best) < k or difference * difference < -best[0][0]:
+                visit(far)
+
+        if k > 0:
+            visit(0)
+        best.sort(reverse=True)
+        distances = np.sqrt([-distance for distance, _ in best])
+        positions = np.array([position for _, position in best], dtype=np.int64)
+        return distances, self.indices[positions]
@@ -0,0 +1,153 @@
+"""
+NDBC's latest_obs.txt has the newest observation from every active station
+in one file, so the current conditions for every spot cost one download
+instead of a realtime2 .txt per buoy.
+
+It looks like a realtime2 report with the station and its position up front,
+and a four digit year:
+#STN       LAT      LON  YYYY MM DD hh mm WDIR WSPD   GST WVHT  DPD APD MWD   PRES ...
+#text      deg      deg   yr mo day hr mn degT  m/s   m/s   m   sec sec degT   hPa ...
+46026    37.754 -122.839 2022 09 04 19 10 300   4.0   5.0  1.8  12  8.1 290 1021.0 ...
+
+We parse it into one ColumnarReport with a row per station.
+It only has the weather columns (plus WVHT, DPD, APD and MWD),
+so the swell and wind wave split still comes from each buoy's .spec.
+
+For more about the file see:
+https://www.ndbc.noaa.gov/docs/ndbc_web_data_guide.pdf
+"""
+
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime
+import logging
+import time
+from typing import Dict, List, Optional
+from aiohttp import ClientSession
+from aiohttp.client_exceptions import ClientError
+from surf_data import FetchConfig, HTTPCacheConfig
+from surf_data.lib.buoys import ColumnarReport, parse_report_header
+from surf_data.lib.http_cache import cached_get
+from surf_data.lib.single_flight import SINGLE_FLIGHT
+
+
+LATEST_OBS_URL = "https://www.ndbc.noaa.gov/data/latest_obs/latest_obs.txt"
+LATEST_OBS_CACHE_SOURCE = "ndbc_latest_obs"
+# the columns in front of the time columns, which we keep out of the report
+STATION_COLUMN = "STN"
+POSITION_COLUMNS = ("LAT", "LON")
+
+
+@dataclass
+class LatestObservations:
+    """
+    The latest observation from every station, as one row per station.
+    """
+
+    report: ColumnarReport
+    # station id -> its row in the report
+    rows: Dict[str, int]
+
+    @classmethod
+    def from_raw_report(cls, raw_report: str) -> "LatestObservations":
+        header, units, body = (raw_report.split("\n", 2) + ["", ""])[:3]
+        header_columns = parse_report_header(header)
+        if header_columns[: 1 + len(POSITION_COLUMNS)] != [
+            STATION_COLUMN,
+            *POSITION_COLUMNS,
+        ]:
+            raise ValueError(f"Unexpected latest_obs header {header_columns}")
+        n_leading = 1 + len(POSITION_COLUMNS)
+        stations: List[str] = []
+        record_lines: List[str] = []
+        for line in body.splitlines():
+            cells = line.split(None, n_leading)
+            if len(cells) <= n_leading:
+                continue
+            stations.append(cells[0])
+            record_lines.append(cells[-1])
+        columns = ["YY" if col == "YYYY" else col for col in header_columns[n_leading:]]
+        report = ColumnarReport.from_lines(
+            columns, parse_report_header(units)[n_leading:], record_lines
+        )
+        return cls(
+            report=report,
+            rows={station: row for row, station in enumerate(stations)},
+        )
+
+    def get_station_report(
+        self, station_id: int, rep_time: datetime
+    ) -> Optional[ColumnarReport]:
+        """
+        The station's latest observation as a one row report.
+        None if it doesn't have one, or rep_time isn't shortly after it.
+        Times before it are better answered by the records either side in realtime2.
+        """
+        row = self.rows.get(str(station_id))
+        if row is None:
+            return None
+        station_report = self.report.take([row])
+        age = rep_time.timestamp() - station_report.sorted_epochs[0]
+        if not 0 <= age <= FetchConfig.LATEST_OBS_MAX_AGE_SECONDS:
+            logging.info(
+                f"Latest observation from {station_id} is {age:.0f}s before {rep_time}"
+            )
+            return None
+        return station_report
+
+
+class LatestObservationsCache:
+    """
+    Keeps the parsed file around for as long as the HTTP cache would,
+    so we only parse it again once there might be a new one.
+    """
+
+    def __init__(self) -> None:
+        self._latest: Optional[LatestObservations] = None
+        self._fetched_at = 0.0
+
+    async def _fetch(self, session: ClientSession) -> LatestObservations:
+        body = await cached_get(session, LATEST_OBS_URL, LATEST_OBS_CACHE_SOURCE)
+        self._latest = LatestObservations.from_raw_report(body.decode())
+        self._fetched_at = time.monotonic()
+        logging.info(f"Read the latest observations of {len(self._latest.rows)} stations")
+        return self._latest
+
+    async def get(self, session: ClientSession) -> LatestObservations:
+        ttl_seconds = HTTPCacheConfig.TTL_SECONDS[LATEST_OBS_CACHE_SOURCE]
+        if self._latest is not None and time.monotonic() - self._fetched_at < ttl_seconds:
+            return self._latest
+        return await SINGLE_FLIGHT.do(
+            (LATEST_OBS_CACHE_SOURCE,), lambda: self._fetch(session)
+        )
+
+    def clear(self) -> None:
+        self._latest = None
+        self._fetched_at = 0.0
+
+
+LATEST_OBSERVATIONS = LatestObservationsCache()
+
+
+async def get_latest_report(
+    session: ClientSession,
+    station_id: int,
+    fallback_station_id: int,
+    rep_time: datetime,
+) -> Optional[ColumnarReport]:
+    """
+    The latest weather observation from the station, or the fallback station
+    if the station's is missing or too far from rep_time.
+    None if neither has one, or we couldn't get the file,
+    in which case the caller should read realtime2 instead.
+    """
+    try:
+        latest = await LATEST_OBSERVATIONS.get(session)
+    except (ClientError, asyncio.TimeoutError, ValueError) as e:
+        logging.error(f"Couldn't get the latest observations: {e!r}")
+        return None
+    for candidate in (station_id, fallback_station_id):
+        station_report = latest.get_station_report(candidate, rep_time)
+        if station_report is not None:
+            return station_report
+    return None
@@ -0,0 +1,632 @@
+"""
+Reads NDBC's historical archives, for times realtime2 doesn't cover any more.
+
+realtime2 only keeps the last 45 days. Older data lives in gzipped text files,
+one per station per year:
+https://www.ndbc.noaa.gov/data/historical/stdmet/46026h2023.txt.gz
+and, until the year's file comes out, one per station per month:
+https://www.ndbc.noaa.gov/data/stdmet/Mar/4602632024.txt.gz
+The month code is 1-9 and then a, b, c for October to December.
+
+stdmet has the same columns as the realtime .txt report, except missing values
+are written as 99.0, 999 or 9999.0 instead of "MM".
+swden holds the spectral wave density, one column per frequency,
+which is where archived entries get their swell partitions from.
+
+The files are big, so we decompress them as they download and cut them up
+into months as we go. Each month gets written to the local cache as an npz,
+and each station keeps an index of which months we have (including months
+the station recorded nothing), so asking about the same month again never
+goes back to NDBC.
+
+For a guide to the archive formats see:
+https://www.ndbc.noaa.gov/docs/ndbc_web_data_guide.pdf
+"""
+
+import asyncio
+import calendar
+from collections import OrderedDict
+from datetime import datetime
+from enum import Enum
+from http import HTTPStatus
+import json
+import logging
+import os
+import time
+from typing import AsyncIterator, Dict, List, Literal, Optional, Tuple
+import zlib
+from aiohttp import ClientSession, ClientTimeout
+from aiohttp.client_exceptions import ClientError, ClientResponseError
+import numpy as np
+from surf_data import NDBCArchiveConfig
+from surf_data.lib.buoys import (
+    CATEGORICAL_COLUMNS,
+    TIME_COLUMNS,
+    ColumnarReport,
+    NDBCDataTypes,
+    parse_report_header,
+)
+from surf_data.lib.single_flight import SINGLE_FLIGHT
+from surf_data.lib.spectra import SpectralReport
+from surf_data.lib.time_helpers import UTC_TIME_ZONE
+
+
+NDBC_DATA_URL = "https://www.ndbc.noaa.gov/data/"
+MONTH_CODES = "123456789abc"
+# zlib wants to be told to expect a gzip header
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+META_KEY = "__meta__"
+
+
+class ArchiveProduct(Enum):
+    stdmet = "stdmet"
+    swden = "swden"
+
+
+ARCHIVE_FILE_CODES = {ArchiveProduct.stdmet: "h", ArchiveProduct.swden: "w"}
+
+# The archives have nothing like the realtime .spec report,
+# but stdmet has the wave height, average period and direction.
+REPORT_TYPE_PRODUCTS = {
+    NDBCDataTypes.weather: ArchiveProduct.stdmet,
+    NDBCDataTypes.waves: ArchiveProduct.stdmet,
+}
+# .spec splits the waves into swell and wind waves at a separation frequency
+# NDBC works out in realtime and doesn't archive, so there's no honest way
+# to get these back. Archived wave reports carry them as missing, and the
+# swells come from swden's partitions instead.
+UNAVAILABLE_WAVE_COLUMNS = {
+    "SwH": "m",
+    "SwP": "sec",
+    "SwD": "-",
+    "WWH": "m",
+    "WWP": "sec",
+    "WWD": "-",
+    "STEEPNESS": "-",
+}
+
+STDMET_MISSING_VALUES = {
+    "WDIR": 999.0,
+    "WSPD": 99.0,
+    "GST": 99.0,
+    "WVHT": 99.0,
+    "DPD": 99.0,
+    "APD": 99.0,
+    "MWD": 999.0,
+    "PRES": 9999.0,
+    "ATMP": 999.0,
+    "WTMP": 999.0,
+    "DEWP": 999.0,
+    "VIS": 99.0,
+    "PTDY": 99.0,
+    "TIDE": 99.0,
+}
+SWDEN_MISSING_VALUE = 999.0
+# stdmet files from before 2007 have no units row, and call some columns
+# by older names. Their units have always been these.
+STDMET_UNITS = {
+    "YY": "yr",
+    "MM": "mo",
+    "DD": "dy",
+    "hh": "hr",
+    "mm": "mn",
+    "WDIR": "degT",
+    "WSPD": "m/s",
+    "GST": "m/s",
+    "WVHT": "m",
+    "DPD": "sec",
+    "APD": "sec",
+    "MWD": "degT",
+    "PRES": "hPa",
+    "ATMP": "degC",
+    "WTMP": "degC",
+    "DEWP": "degC",
+    "VIS": "mi",
+    "PTDY": "hPa",
+    "TIDE": "ft",
+}
+OLD_STDMET_COLUMNS = {"YYYY": "YY", "WD": "WDIR", "BAR": "PRES"}
+
+Month = Tuple[int, int]
+
+
+def get_yearly_url(station_id: int, product: ArchiveProduct, year: int) -> str:
+    return (
+        f"{NDBC_DATA_URL}historical/{product.value}/"
+        f"{station_id}{ARCHIVE_FILE_CODES[product]}{year}.txt.gz"
+    )
+
+
+def get_monthly_url(
+    station_id: int, product: ArchiveProduct, year: int, month: int
+) -> str:
+    return (
+        f"{NDBC_DATA_URL}{product.value}/{calendar.month_abbr[month]}/"
+        f"{station_id}{MONTH_CODES[month - 1]}{year}.txt.gz"
+    )
+
+
+def _empty_report() -> ColumnarReport:
+    return ColumnarReport.from_lines(list(TIME_COLUMNS), [""] * len(TIME_COLUMNS), [])
+
+
+def _mask_missing_values(report: ColumnarReport, product: ArchiveProduct) -> None:
+    for col, values in report.columns.items():
+        if col in TIME_COLUMNS:
+            continue
+        if product == ArchiveProduct.stdmet:
+            missing_value = STDMET_MISSING_VALUES.get(col)
+        else:
+            missing_value = SWDEN_MISSING_VALUE
+        if missing_value is not None:
+            values[values == missing_value] = np.nan
+
+
+def _with_unavailable_wave_columns(report: ColumnarReport) -> ColumnarReport:
+    """
+    A copy of the report with the .spec columns the archives don't have,
+    all missing.
+    """
+    columns = dict(report.columns)
+    units = dict(report.units)
+    categories = dict(report.categories)
+    for col, unit in UNAVAILABLE_WAVE_COLUMNS.items():
+        if col in CATEGORICAL_COLUMNS:
+            columns[col] = np.full(len(report), -1, dtype=np.int8)
+            categories[col] = CATEGORICAL_COLUMNS[col]
+        else:
+            columns[col] = np.full(len(report), np.nan)
+        units[col] = unit
+    return ColumnarReport(
+        columns=columns,
+        units=units,
+        decimals=report.decimals,
+        categories=categories,
+    )
+
+
+def _to_spectral_report(report: ColumnarReport) -> SpectralReport:
+    """
+    swden's columns are named after their band's frequency, like ".0325".
+    """
+    bands = [col for col in report.columns if col not in TIME_COLUMNS]
+    return SpectralReport(
+        epochs=report.record_epochs(),
+        frequencies=np.array([float(col) for col in bands]),
+        values=(
+            np.column_stack([report.columns[col] for col in bands])
+            if bands
+            else np.zeros((len(report), 0))
+        ),
+    )
+
+
+def _concat_reports(first: ColumnarReport, second: ColumnarReport) -> ColumnarReport:
+    return ColumnarReport(
+        columns={
+            col: np.concatenate([values, second.columns[col]])
+            for col, values in first.columns.items()
+        },
+        units=first.units,
+        decimals={**second.decimals, **first.decimals},
+        categories=first.categories,
+    )
+
+
+async def _stream_lines(session: ClientSession, url: str) -> AsyncIterator[str]:
+    """
+    Decompresses the file as it downloads and hands back one line at a time,
+    so we never hold the whole file, compressed or not.
+    """
+    decompressor = zlib.decompressobj(GZIP_WBITS)
+    pending = b""
+    timeout = ClientTimeout(total=NDBCArchiveConfig.DOWNLOAD_TIMEOUT_SECONDS)
+    async with session.get(url, timeout=timeout) as resp:
+        async for chunk in resp.content.iter_chunked(
+            NDBCArchiveConfig.DOWNLOAD_CHUNK_BYTES
+        ):
+            lines = (pending + decompressor.decompress(chunk)).split(b"\n")
+            pending = lines.pop()
+            for line in lines:
+                yield line.decode()
+    for line in (pending + decompressor.flush()).split(b"\n"):
+        yield line.decode()
+
+
+class _MonthSplitter:
+    """
+    Cuts an archive file into one ColumnarReport per month as the lines come in.
+    The archives are in time order, so once a new month starts we parse
+    the last one and let go of its lines.
+    """
+
+    def __init__(self, product: ArchiveProduct):
+        self.product = product
+        self.header: Optional[List[str]] = None
+        self.units: Optional[List[str]] = None
+        # files from before 2005 don't have a minute column
+        self.add_minutes = False
+        self.reports: Dict[Month, ColumnarReport] = {}
+        self._month: Optional[Month] = None
+        self._lines: List[str] = []
+
+    def _read_header(self, line: str) -> None:
+        header = [
+            OLD_STDMET_COLUMNS.get(col, col) for col in parse_report_header(line)
+        ]
+        if "mm" not in header:
+            header.insert(TIME_COLUMNS.index("mm"), "mm")
+            self.add_minutes = True
+        self.header = header
+
+    def add_line(self, line: str) -> None:
+        if not line.strip():
+            return
+        if self.header is None:
+            self._read_header(line)
+            return
+        if line.startswith("#"):
+            units = parse_report_header(line)
+            if self.add_minutes:
+                units.insert(TIME_COLUMNS.index("mm"), "mn")
+            self.units = units
+            return
+        if self.add_minutes:
+            cells = line.split()
+            # files from before 2000 have two digit years
+            if len(cells[0]) == 2:
+                cells[0] = f"19{cells[0]}"
+            line = " ".join(cells[:4] + ["00"] + cells[4:])
+        year, month = line.split(None, 2)[:2]
+        line_month = (int(year), int(month))
+        if line_month != self._month:
+            self._finish_month()
+            self._month = line_month
+        self._lines.append(line)
+
+    def _default_units(self) -> List[str]:
+        assert self.header is not None
+        if self.product == ArchiveProduct.stdmet:
+            return [STDMET_UNITS.get(col, "") for col in self.header]
+        return [""] * len(self.header)
+
+    def _finish_month(self) -> None:
+        if self._month is None or not self._lines:
+            return
+        assert self.header is not None
+        units = self.units or self._default_units()
+        report = ColumnarReport.from_lines(self.header, units, self._lines)
+        _mask_missing_values(report, self.product)
+        if self._month in self.reports:
+            logging.warning(f"Archive rows for {self._month} are out of order")
+            report = _concat_reports(self.reports[self._month], report)
+        self.reports[self._month] = report
+        self._lines = []
+
+    def finish(self) -> Dict[Month, ColumnarReport]:
+        self._finish_month()
+        return self.reports
+
+
+async def download_archive(
+    session: ClientSession, url: str, product: ArchiveProduct
+) -> Dict[Month, ColumnarReport]:
+    logging.info(f"Hitting: {url}")
+    started = time.monotonic()
+    splitter = _MonthSplitter(product)
+    async for line in _stream_lines(session, url):
+        splitter.add_line(line)
+    reports = splitter.finish()
+    logging.info(
+        f"Read {sum(len(report) for report in reports.values())} records "
+        f"for {len(reports)} months from {url} in {time.monotonic() - started:.1f}s"
+    )
+    return reports
+
+
+class NDBCArchive:
+    """
+    Months of archived reports, in memory and on disk.
+
+    Each station and product has an index file that maps "YYYY-MM" to the number
+    of records we have for that month and the first and last record times.
+    A month with 0 records is one the archive file didn't have anything for.
+    """
+
+    def __init__(self, cache_dir: Optional[str], max_months: int):
+        self.cache_dir = cache_dir
+        self.max_months = max_months
+        self._months: "OrderedDict[Tuple[int, ArchiveProduct, Month], ColumnarReport]"
+        self._months = OrderedDict()
+        self._indexes: Dict[Tuple[int, ArchiveProduct], Dict[str, List[float]]] = {}
+
+    def _path(self, name: str) -> str:
+        assert self.cache_dir is not None
+        return os.path.join(self.cache_dir, name)
+
+    def _month_file(self, station_id: int, product: ArchiveProduct, month: Month) -> str:
+        return self._path(f"{station_id}_{product.value}_{month[0]}_{month[1]:02d}.npz")
+
+    def _index_file(self, station_id: int, product: ArchiveProduct) -> str:
+        return self._path(f"{station_id}_{product.value}_index.json")
+
+    def get_index(
+        self, station_id: int, product: ArchiveProduct
+    ) -> Dict[str, List[float]]:
+        key = (station_id, product)
+        if key not in self._indexes:
+            index: Dict[str, List[float]] = {}
+            if self.cache_dir is not None:
+                try:
+                    with open(self._index_file(station_id, product)) as index_file:
+                        index = json.load(index_file)
+                except (OSError, ValueError):
+                    pass
+            self._indexes[key] = index
+        return self._indexes[key]
+
+    def _remember(
+        self,
+        station_id: int,
+        product: ArchiveProduct,
+        month: Month,
+        report: ColumnarReport,
+    ) -> None:
+        key = (station_id, product, month)
+        self._months[key] = report
+        self._months.move_to_end(key)
+        while len(self._months) > self.max_months:
+            self._months.popitem(last=False)
+
+    def _read_month_file(self, path: str) -> Optional[ColumnarReport]:
+        try:
+            with np.load(path) as data:
+                meta = json.loads(str(data[META_KEY]))
+                columns = {col: data[col] for col in meta["columns"]}
+        except (OSError, ValueError, KeyError):
+            logging.exception(f"Couldn't read archived month {path}")
+            return None
+        return ColumnarReport(
+            columns=columns,
+            units=meta["units"],
+            decimals=meta["decimals"],
+            categories={col: tuple(labels) for col, labels in meta["categories"].items()},
+        )
+
+    def _write_month_file(self, path: str, report: ColumnarReport) -> None:
+        """
+        Writes to a temp file and renames it into place,
+        so a frozen or killed lambda never leaves half a month behind.
+        """
+        meta = {
+            "columns": list(report.columns),
+            "units": report.units,
+            "decimals": report.decimals,
+            "categories": report.categories,
+        }
+        with open(f"{path}.tmp", "wb") as month_file:
+            np.savez_compressed(
+                month_file, **report.columns, **{META_KEY: np.array(json.dumps(meta))}
+            )
+        os.replace(f"{path}.tmp", path)
+
+    def get_cached_month(
+        self, station_id: int, product: ArchiveProduct, month: Month
+    ) -> Optional[ColumnarReport]:
+        key = (station_id, product, month)
+        if key in self._months:
+            self._months.move_to_end(key)
+            return self._months[key]
+        entry = self.get_index(station_id, product).get(f"{month[0]}-{month[1]:02d}")
+        if entry is None:
+            return None
+        if entry[0] == 0:
+            report = _empty_report()
+        elif self.cache_dir is None:
+            return None
+        else:
+            report = self._read_month_file(self._month_file(station_id, product, month))
+            if report is None:
+                return None
+        self._remember(station_id, product, month, report)
+        return report
+
+    def save_months(
+        self,
+        station_id: int,
+        product: ArchiveProduct,
+        reports: Dict[Month, ColumnarReport],
+        covered_months: List[Month],
+    ) -> None:
+        """
+        Stores every month the file covered. Months it had no records for
+        get saved as empty so we don't go looking for them again.
+        """
+        index = self.get_index(station_id, product)
+        for month in covered_months:
+            report = reports.get(month, _empty_report())
+            self._remember(station_id, product, month, report)
+            if len(report) > 0 and self.cache_dir is not None:
+                try:
+                    os.makedirs(self.cache_dir, exist_ok=True)
+                    self._write_month_file(
+                        self._month_file(station_id, product, month), report
+                    )
+                except OSError:
+                    logging.exception(f"Couldn't write {station_id} {month} to disk")
+                    continue
+            epochs = report.sorted_epochs
+            index[f"{month[0]}-{month[1]:02d}"] = (
+                [len(report), float(epochs[0]), float(epochs[-1])]
+                if len(report) > 0
+                else [0, 0.0, 0.0]
+            )
+        self._write_index(station_id, product, index)
+
+    def _write_index(
+        self, station_id: int, product: ArchiveProduct, index: Dict[str, List[float]]
+    ) -> None:
+        if self.cache_dir is None:
+            return
+        path = self._index_file(station_id, product)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(f"{path}.tmp", "w") as index_file:
+                json.dump(index, index_file, sort_keys=True)
+            os.replace(f"{path}.tmp", path)
+        except OSError:
+            logging.exception(f"Couldn't write the archive index for {station_id}")
+
+    async def _download_year(
+        self, session: ClientSession, station_id: int, product: ArchiveProduct, year: int
+    ) -> bool:
+        """
+        Returns False if NDBC hasn't published the year's file (yet).
+        """
+        try:
+            reports = await download_archive(
+                session, get_yearly_url(station_id, product, year), product
+            )
+        except ClientResponseError as e:
+            if e.status != HTTPStatus.NOT_FOUND:
+                raise
+            logging.info(f"No {year} {product.value} file for station {station_id}")
+            return False
+        self.save_months(
+            station_id, product, reports, [(year, month) for month in range(1, 13)]
+        )
+        return True
+
+    async def _download_month(
+        self,
+        session: ClientSession,
+        station_id: int,
+        product: ArchiveProduct,
+        month: Month,
+    ) -> bool:
+        """
+        Returns False if NDBC hasn't published the month's file yet.
+        We don't save anything then, so we look again next time.
+        """
+        try:
+            reports = await download_archive(
+                session, get_monthly_url(station_id, product, *month), product
+            )
+        except ClientResponseError as e:
+            if e.status != HTTPStatus.NOT_FOUND:
+                raise
+            logging.info(f"No {month} {product.value} file for station {station_id}")
+            return False
+        self.save_months(station_id, product, reports, [month])
+        return True
+
+    async def get_month(
+        self,
+        session: ClientSession,
+        station_id: int,
+        product: ArchiveProduct,
+        month: Month,
+    ) -> ColumnarReport:
+        """
+        Every record the station archived for the month, newest last.
+        Past years come from the yearly file, which fills in the whole year at once.
+        The current year, and past years NDBC hasn't finished with,
+        come from the monthly files.
+        Empty if NDBC hasn't published the month yet.
+        """
+        report = self.get_cached_month(station_id, product, month)
+        if report is not None:
+            return report
+        year = month[0]
+        if year < datetime.now(UTC_TIME_ZONE).year:
+            await SINGLE_FLIGHT.do(
+                ("ndbc_archive", product.value, station_id, year),
+                lambda: self._download_year(session, station_id, product, year),
+            )
+            report = self.get_cached_month(station_id, product, month)
+            if report is not None:
+                return report
+        await SINGLE_FLIGHT.do(
+            ("ndbc_archive", product.value, station_id, *month),
+            lambda: self._download_month(session, station_id, product, month),
+        )
+        report = self.get_cached_month(station_id, product, month)
+        return report if report is not None else _empty_report()
+
+    def clear(self) -> None:
+        self._months.clear()
+        self._indexes.clear()
+
+
+NDBC_ARCHIVE = NDBCArchive(
+    NDBCArchiveConfig.CACHE_DIR, NDBCArchiveConfig.MAX_CACHED_MONTHS
+)
+
+
+async def _get_archived_month(
+    session: ClientSession,
+    station_id: int,
+    fallback_station_id: int,
+    product: ArchiveProduct,
+    rep_time: datetime,
+) -> ColumnarReport:
+    """
+    The archived month of records around rep_time, from the station
+    or the fallback station if the station has nothing for that month.
+    Archive misses say nothing about whether a station works today,
+    so these don't go through the station health registry.
+    """
+    utc_time = rep_time.astimezone(UTC_TIME_ZONE)
+    month = (utc_time.year, utc_time.month)
+    last_error: Optional[BaseException] = None
+    for candidate in dict.fromkeys([station_id, fallback_station_id]):
+        try:
+            report = await NDBC_ARCHIVE.get_month(session, candidate, product, month)
+        except (ClientError, asyncio.TimeoutError, zlib.error) as e:
+            logging.error(f"Error getting archived {product.value} data: {e!r}")
+            last_error = e
+            continue
+        if len(report) > 0:
+            return report
+        logging.info(f"Station {candidate} has no {product.value} records for {month}")
+    if last_error is not None:
+        raise last_error
+    raise ValueError(
+        f"No archived {product.value} data for stations "
+        f"{station_id} or {fallback_station_id} in {month}"
+    )
+
+
+async def get_archive_report(
+    session: ClientSession,
+    station_id: int,
+    fallback_station_id: int,
+    report_type: Literal[NDBCDataTypes.waves, NDBCDataTypes.weather],
+    rep_time: datetime,
+) -> ColumnarReport:
+    report = await _get_archived_month(
+        session,
+        station_id,
+        fallback_station_id,
+        REPORT_TYPE_PRODUCTS[report_type],
+        rep_time,
+    )
+    if report_type == NDBCDataTypes.waves:
+        return _with_unavailable_wave_columns(report)
+    return report
+
+
+async def get_archive_spectral_report(
+    session: ClientSession,
+    station_id: int,
+    fallback_station_id: int,
+    rep_time: datetime,
+) -> SpectralReport:
+    """
+    The archived month of spectral densities around rep_time.
+    swden has no directions, so the swells it gives us don't either.
+    """
+    report = await _get_archived_month(
+        session, station_id, fallback_station_id, ArchiveProduct.swden, rep_time
+    )
+    return _to_spectral_report(report)
@@ -0,0 +1,86 @@
+"""
+Keeps one event loop and one aiohttp session alive between warm lambda invocations.
+
+asyncio.run builds and tears down a loop each time, and a fresh ClientSession
+means a fresh TCP + TLS handshake to NDBC and NOAA on every request.
+Module level state survives between warm invocations, so we hold on to both here.
+
+Lambda can freeze the process between invocations for as long as it likes.
+Sockets that sat idle through that are probably closed on the other end,
+so after a long idle gap we throw the session away and build a new one.
+If a GET still trips over a dead connection, aiohttp sends that one request
+again on a new connection, so there's nothing to retry here.
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+from aiohttp import ClientSession, ClientTimeout, TCPConnector
+from surf_data import RuntimeConfig
+
+
+R = TypeVar("R")
+
+
+class SurfDataRuntime:
+    def __init__(self) -> None:
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._session: Optional[ClientSession] = None
+        self._last_used = 0.0
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None or self._loop.is_closed():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+        return self._loop
+
+    def _session_is_stale(self) -> bool:
+        return time.time() - self._last_used > RuntimeConfig.IDLE_RESET_SECONDS
+
+    async def get_session(self) -> ClientSession:
+        if self._session is not None and (
+            self._session.closed or self._session_is_stale()
+        ):
+            await self.close_session()
+        if self._session is None:
+            connector = TCPConnector(
+                limit_per_host=RuntimeConfig.CONNECTIONS_PER_HOST,
+                keepalive_timeout=RuntimeConfig.KEEPALIVE_SECONDS,
+                ttl_dns_cache=RuntimeConfig.DNS_CACHE_SECONDS,
+            )
+            self._session = ClientSession(
+                connector=connector,
+                raise_for_status=True,
+                timeout=ClientTimeout(total=RuntimeConfig.REQUEST_TIMEOUT_SECONDS),
+            )
+        return self._session
+
+    async def close_session(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _run_with_session(
+        self, func: Callable[[ClientSession], Awaitable[R]]
+    ) -> R:
+        return await func(await self.get_session())
+
+    def run(self, func: Callable[[ClientSession], Awaitable[R]]) -> R:
+        """
+        Runs func(session) to completion on the persistent loop.
+        Use this instead of asyncio.run from lambda handlers.
+        """
+        try:
+            return self.loop.run_until_complete(self._run_with_session(func))
+        finally:
+            self._last_used = time.time()
+
+    def close(self) -> None:
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.run_until_complete(self.close_session())
+            self._loop.close()
+        self._loop = None
+
+
+RUNTIME = SurfDataRuntime()
@@ -0,0 +1,79 @@
+"""
+Lets callers that want the same thing at the same time share one fetch.
+
+Several spots in SPOT_MAPPING share a buoy and a tide station, so a report
+for more than one of them would otherwise download and parse the same
+data once per spot. Callers describe what they want with a key like
+(product, station, time bucket). If a call for that key is already running
+everyone waits on it, and the result is handed out for a little while after
+it finishes so back to back requests get it too.
+
+Failures aren't remembered, so the next caller tries again.
+"""
+
+import asyncio
+from collections import OrderedDict
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+from surf_data import FetchConfig
+
+
+R = TypeVar("R")
+
+
+class SingleFlight:
+    def __init__(self, result_ttl_seconds: float, max_results: int):
+        self.result_ttl_seconds = result_ttl_seconds
+        self.max_results = max_results
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self._results: "OrderedDict[Hashable, Tuple[float, object]]" = OrderedDict()
+
+    def _get_result(self, key: Hashable) -> Tuple[bool, object]:
+        if key not in self._results:
+            return False, None
+        finished_at, result = self._results[key]
+        if time.monotonic() - finished_at > self.result_ttl_seconds:
+            del self._results[key]
+            return False, None
+        self._results.move_to_end(key)
+        return True, result
+
+    def _remember(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if task.cancelled() or task.exception() is not None:
+            return
+        self._results[key] = (time.monotonic(), task.result())
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_results:
+            self._results.popitem(last=False)
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[R]]) -> R:
+        """
+        Returns func()'s result, or the result of the call already made for key.
+        The call runs as its own task, so one caller timing out
+        doesn't cancel it for everyone else waiting on it.
+        """
+        found, result = self._get_result(key)
+        if found:
+            logging.info(f"Sharing the result we just got for {key}")
+            return result  # type: ignore[return-value]
+        task = self._in_flight.get(key)
+        # tasks from a loop that's since been closed are no use to us
+        if task is not None and task.get_loop() is asyncio.get_running_loop():
+            logging.info(f"Waiting on the fetch already running for {key}")
+        else:
+            task = asyncio.ensure_future(func())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._remember(key, done))
+        return await asyncio.shield(task)
+
+    def clear(self) -> None:
+        self._in_flight.clear()
+        self._results.clear()
+
+
+SINGLE_FLIGHT = SingleFlight(
+    FetchConfig.SHARED_RESULT_SECONDS, FetchConfig.SHARED_RESULT_MAX_ENTRIES
+)
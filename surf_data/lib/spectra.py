@@ -0,0 +1,281 @@
+"""
+Splits NDBC wave spectra into separate swells.
+
+The .spec summary boils each record down to one swell and one wind wave,
+so a long period south swell under a local northwest windswell just disappears.
+The raw spectra keep them apart:
+ - .data_spec has the energy density (m^2/Hz) in each frequency band,
+   after the separation frequency NDBC uses to split swell from wind waves.
+ - .swdir has the mean direction the waves in each band come from (alpha1).
+   .swdir2 (alpha2, the principal direction) has the same layout.
+
+Every value is followed by its band's frequency in brackets, like this:
+#YY  MM DD hh mm Sep_Freq  < spec_1 (freq_1) spec_2 (freq_2) ... >
+2022 09 04 22 40  0.110  0.000 (0.033) 0.120 (0.038) ...
+
+We parse a whole file into one (record x frequency) array and split every
+record at the troughs of its (lightly smoothed) spectrum. The height, peak
+period and direction of each piece come from spectral moments summed over
+all the records at once with np.bincount.
+
+For the spectral file formats see:
+https://www.ndbc.noaa.gov/measdes.shtml#swden
+"""
+
+from dataclasses import dataclass, field, replace
+import logging
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from surf_data.lib.record_helpers import DataPoint
+
+
+SEPARATION_FREQUENCY_COLUMN = "Sep_Freq"
+N_TIME_COLUMNS = 5
+# NDBC writes these for bands and separation frequencies it doesn't have
+MISSING_VALUE = 999.0
+MISSING_SEPARATION_FREQUENCY = 9.999
+# Pieces of the spectrum smaller than this are ripples between real swells
+MIN_PARTITION_HEIGHT_METERS = 0.1
+MAX_SWELL_PARTITIONS = 3
+# units of a partition's height, period and direction
+PARTITION_UNITS = ("m", "sec", "degT")
+HEIGHT_UNIT, PERIOD_UNIT, DIRECTION_UNIT = PARTITION_UNITS
+
+
+@dataclass
+class SwellPartition:
+    height: DataPoint
+    period: DataPoint
+    direction: Optional[DataPoint] = None
+
+    def serialize_for_alexa(self) -> str:
+        description = f"{self.height} at {self.period}"
+        if self.direction is not None:
+            description += f" from {self.direction}"
+        return description
+
+
+@dataclass
+class SpectralReport:
+    """
+    One of NDBC's spectral files as a (record x frequency) array.
+    directions holds the matching .swdir values once they're attached.
+    """
+
+    epochs: np.ndarray
+    frequencies: np.ndarray
+    values: np.ndarray
+    separation_frequencies: Optional[np.ndarray] = None
+    directions: Optional[np.ndarray] = None
+    sorted_epochs: np.ndarray = field(init=False, repr=False)
+    sorted_rows: np.ndarray = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self.sorted_rows = np.argsort(self.epochs, kind="stable")
+        self.sorted_epochs = self.epochs[self.sorted_rows]
+
+    def __len__(self) -> int:
+        return len(self.epochs)
+
+    @classmethod
+    def from_raw_report(cls, raw_report: str) -> "SpectralReport":
+        """
+        Every record has the same bands, so once the brackets are gone
+        the whole body parses as one flat array of floats.
+        Records with a different number of bands than the newest one are dropped.
+        """
+        header, _, body = raw_report.partition("\n")
+        has_separation = SEPARATION_FREQUENCY_COLUMN in header
+        lines = [line for line in body.splitlines() if line.strip()]
+        if not lines:
+            empty = np.zeros((0, 0))
+            return cls(np.zeros(0, dtype=np.int64), np.zeros(0), empty)
+        n_bands = lines[0].count("(")
+        kept = [line for line in lines if line.count("(") == n_bands]
+        if len(kept) < len(lines):
+            logging.warning(
+                f"Dropped {len(lines) - len(kept)} spectral records "
+                f"that don't have {n_bands} bands"
+            )
+        text = "\n".join(kept)
+        for token in ("(", ")"):
+            text = text.replace(token, " ")
+        grid = np.fromstring(text.replace("MM", "nan"), dtype=np.float64, sep=" ")
+        grid = grid.reshape(len(kept), -1)
+        first_band = N_TIME_COLUMNS + int(has_separation)
+        values = grid[:, first_band::2]
+        values[values == MISSING_VALUE] = np.nan
+        separation_frequencies = None
+        if has_separation:
+            separation_frequencies = grid[:, N_TIME_COLUMNS]
+            separation_frequencies[
+                separation_frequencies == MISSING_SEPARATION_FREQUENCY
+            ] = np.nan
+        return cls(
+            epochs=_grid_epochs(grid),
+            frequencies=grid[0, first_band + 1::2],
+            values=values,
+            separation_frequencies=separation_frequencies,
+        )
+
+    def with_directions(self, direction_report: "SpectralReport") -> "SpectralReport":
+        """
+        Lines the .swdir records up with ours by time.
+        Records without a matching direction record get NaN directions.
+        """
+        directions = np.full(self.values.shape, np.nan)
+        if direction_report.frequencies.shape != self.frequencies.shape or not (
+            np.allclose(direction_report.frequencies, self.frequencies)
+        ):
+            logging.warning("Spectral direction bands don't match the density bands")
+            return replace(self, directions=directions)
+        if len(direction_report) > 0:
+            position = np.clip(
+                np.searchsorted(direction_report.sorted_epochs, self.epochs),
+                0,
+                len(direction_report) - 1,
+            )
+            matched = direction_report.sorted_epochs[position] == self.epochs
+            rows = direction_report.sorted_rows[position[matched]]
+            directions[matched] = direction_report.values[rows]
+        return replace(self, directions=directions)
+
+    def get_partitions(self, rows: Sequence[int]) -> List[Tuple[SwellPartition, ...]]:
+        """
+        The biggest MAX_SWELL_PARTITIONS swells in each of the rows, biggest first.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        directions = None if self.directions is None else self.directions[rows]
+        heights, periods, mean_directions = partition_spectra(
+            self.values[rows], self.frequencies, directions
+        )
+        partitions = []
+        for row_heights, row_periods, row_directions in zip(
+            heights.tolist(), periods.tolist(), mean_directions.tolist()
+        ):
+            partitions.append(
+                tuple(
+                    SwellPartition(
+                        height=DataPoint(f"{height:.1f}", HEIGHT_UNIT),
+                        period=DataPoint(f"{period:.1f}", PERIOD_UNIT),
+                        direction=(
+                            None
+                            if np.isnan(direction)
+                            else DataPoint(f"{direction:.0f}", DIRECTION_UNIT)
+                        ),
+                    )
+                    for height, period, direction in zip(
+                        row_heights, row_periods, row_directions
+                    )
+                    if not np.isnan(height)
+                )
+            )
+        return partitions
+
+
+def _grid_epochs(grid: np.ndarray) -> np.ndarray:
+    years = (grid[:, 0].astype(np.int64) - 1970).astype("datetime64[Y]")
+    months = years.astype("datetime64[M]") + (grid[:, 1].astype(np.int64) - 1)
+    days = months.astype("datetime64[D]") + (grid[:, 2].astype(np.int64) - 1)
+    return (
+        days.astype(np.int64) * 86400
+        + grid[:, 3].astype(np.int64) * 3600
+        + grid[:, 4].astype(np.int64) * 60
+    )
+
+
+def _band_widths(frequencies: np.ndarray) -> np.ndarray:
+    """
+    NDBC's bands get wider at higher frequencies,
+    so each band's width is half the distance to its neighbours on either side.
+    """
+    if len(frequencies) < 2:
+        return np.ones_like(frequencies)
+    return np.gradient(frequencies)
+
+
+def _label_partitions(density: np.ndarray) -> np.ndarray:
+    """
+    Numbers the bands of each record by which piece of the spectrum they're in.
+    A new piece starts at each trough of the smoothed spectrum.
+    """
+    padded = np.pad(density, ((0, 0), (1, 1)), mode="edge")
+    smoothed = (padded[:, :-2] + padded[:, 1:-1] + padded[:, 2:]) / 3
+    troughs = np.zeros(density.shape, dtype=bool)
+    troughs[:, 1:-1] = (smoothed[:, 1:-1] < smoothed[:, :-2]) & (
+        smoothed[:, 1:-1] <= smoothed[:, 2:]
+    )
+    return np.cumsum(troughs, axis=1)
+
+
+def partition_spectra(
+    density: np.ndarray,
+    frequencies: np.ndarray,
+    directions: Optional[np.ndarray] = None,
+    max_partitions: int = MAX_SWELL_PARTITIONS,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Splits each record's spectrum into swells and returns (record x max_partitions)
+    arrays of their significant heights (m), peak periods (s) and mean directions
+    (degrees true), biggest first. Unused slots are NaN.
+
+    Height is 4 * sqrt(m0), where m0 is the energy in the piece.
+    Direction is the energy weighted circular mean of the band directions.
+    """
+    n_records, n_bands = density.shape
+    empty = np.full((n_records, max_partitions), np.nan)
+    if n_records == 0 or n_bands == 0:
+        return empty, empty.copy(), empty.copy()
+    density = np.nan_to_num(density)
+    energy = density * _band_widths(frequencies)
+    # one bin per (record, piece), so every sum below is a single bincount
+    groups = (
+        np.arange(n_records)[:, None] * n_bands + _label_partitions(density)
+    ).ravel()
+    n_groups = n_records * n_bands
+    m0 = np.bincount(groups, weights=energy.ravel(), minlength=n_groups)
+
+    # the peak of each piece is the last band once we sort by (piece, density)
+    order = np.lexsort((density.ravel(), groups))
+    sorted_groups = groups[order]
+    is_peak = np.append(sorted_groups[1:] != sorted_groups[:-1], True)
+    peak_frequencies = np.full(n_groups, np.nan)
+    peak_frequencies[sorted_groups[is_peak]] = np.tile(frequencies, n_records)[
+        order[is_peak]
+    ]
+
+    mean_directions = np.full(n_groups, np.nan)
+    if directions is not None:
+        radians = np.deg2rad(directions)
+        has_direction = ~np.isnan(radians)
+        weights = np.where(has_direction, energy, 0.0).ravel()
+        sin_sum = np.bincount(
+            groups, weights=weights * np.sin(np.nan_to_num(radians)).ravel(),
+            minlength=n_groups,
+        )
+        cos_sum = np.bincount(
+            groups, weights=weights * np.cos(np.nan_to_num(radians)).ravel(),
+            minlength=n_groups,
+        )
+        directional = np.bincount(groups, weights=weights, minlength=n_groups) > 0
+        mean_directions[directional] = (
+            np.rad2deg(np.arctan2(sin_sum, cos_sum))[directional] % 360
+        )
+
+    heights = (4 * np.sqrt(m0)).reshape(n_records, n_bands)
+    heights[heights < MIN_PARTITION_HEIGHT_METERS] = np.nan
+    biggest = np.argsort(-np.nan_to_num(heights, nan=-1.0), axis=1)[:, :max_partitions]
+    record_index = np.arange(n_records)[:, None]
+    top_heights = heights[record_index, biggest]
+    top_periods = 1 / peak_frequencies.reshape(n_records, n_bands)[record_index, biggest]
+    top_directions = mean_directions.reshape(n_records, n_bands)[record_index, biggest]
+    unused = np.isnan(top_heights)
+    top_periods[unused] = np.nan
+    top_directions[unused] = np.nan
+    if top_heights.shape[1] < max_partitions:
+        padding = ((0, 0), (0, max_partitions - top_heights.shape[1]))
+        top_heights, top_periods, top_directions = (
+            np.pad(values, padding, constant_values=np.nan)
+            for values in (top_heights, top_periods, top_directions)
+        )
+    return top_heights, top_periods, top_directions
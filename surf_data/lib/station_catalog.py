@@ -0,0 +1,260 @@
+"""
+Every live NDBC buoy and NOAA tide station, indexed by position,
+so a spot can be defined by where it is rather than which stations it uses.
+
+The buoys come from NDBC's list of active stations:
+https://www.ndbc.noaa.gov/activestations.xml
+<station id="46026" lat="37.754" lon="-122.839" name="SAN FRANCISCO - 18NM West ..."
+    owner="NDBC" pgm="NDBC Meteorological/Ocean" type="buoy" met="y" .../>
+It doesn't say which stations measure waves. met="y" isn't it: CDIP wave buoys
+like 46237 only send waves, so they're met="n". We keep moored buoys
+(type="buoy") with numeric IDs that aren't DART buoys, which leaves out
+tsunami buoys and fixed stations like FTPC1 that never have a .spec.
+
+The tide stations come from CO-OPS, and we only keep ones with harmonic
+constituents, since that's what we predict tides from:
+https://api.tidesandcurrents.noaa.gov/mdapi/prod/webapi/stations.json?type=harcon
+
+Positions go into a k-d tree as points on the unit sphere, where the straight
+line distance between two points goes up with the great circle distance.
+So the nearest points in the tree are the nearest stations, and lookups
+don't need to look at every station.
+"""
+
+import asyncio
+from dataclasses import dataclass
+import json
+import logging
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+from xml.etree import ElementTree
+from aiohttp import ClientSession
+from aiohttp.client_exceptions import ClientError
+import numpy as np
+from surf_data import SPOT_MAPPING, StationCatalogConfig, SurfSpotDetails
+from surf_data.lib.http_cache import cached_get
+from surf_data.lib.kd_tree import KDTree
+from surf_data.lib.runtime import RUNTIME
+from surf_data.lib.single_flight import SINGLE_FLIGHT
+
+
+NDBC_STATIONS_URL = "https://www.ndbc.noaa.gov/activestations.xml"
+NOAA_STATIONS_URL = (
+    "https://api.tidesandcurrents.noaa.gov/mdapi/prod/webapi/stations.json"
+)
+STATION_LIST_CACHE_SOURCE = "station_lists"
+EARTH_RADIUS_KM = 6371.0
+
+
+@dataclass(frozen=True)
+class Station:
+    station_id: str
+    name: str
+    lat: float
+    lon: float
+
+
+@dataclass
+class SpotLocation:
+    lat: float
+    lon: float
+    surfline_spot_id: Optional[str] = None
+
+
+def _to_unit_vectors(lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    lats, lons = np.radians(lats), np.radians(lons)
+    return np.column_stack(
+        (np.cos(lats) * np.cos(lons), np.cos(lats) * np.sin(lons), np.sin(lats))
+    )
+
+
+class StationIndex:
+    def __init__(self, stations: Sequence[Station]):
+        self.stations = list(stations)
+        self._tree = KDTree(
+            _to_unit_vectors(
+                np.array([station.lat for station in self.stations]),
+                np.array([station.lon for station in self.stations]),
+            ).reshape(-1, 3)
+        )
+
+    def __len__(self) -> int:
+        return len(self.stations)
+
+    def nearest(self, lat: float, lon: float, k: int = 1) -> List[Tuple[Station, float]]:
+        """
+        The k stations nearest to (lat, lon), nearest first,
+        along with how far away they are in km.
+        """
+        (point,) = _to_unit_vectors(np.array([lat]), np.array([lon]))
+        chords, indices = self._tree.query(point, k)
+        distances = 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(chords / 2, 1.0))
+        return [
+            (self.stations[index], distance)
+            for index, distance in zip(indices.tolist(), distances.tolist())
+        ]
+
+
+def parse_ndbc_stations(raw_xml: bytes) -> List[Station]:
+    stations = []
+    for element in ElementTree.fromstring(raw_xml).iter("station"):
+        attributes = element.attrib
+        station_id = attributes.get("id", "")
+        if (
+            not station_id.isdigit()
+            or attributes.get("type") != "buoy"
+            or attributes.get("dart") == "y"
+        ):
+            continue
+        stations.append(
+            Station(
+                station_id=station_id,
+                name=attributes.get("name", ""),
+                lat=float(attributes["lat"]),
+                lon=float(attributes["lon"]),
+            )
+        )
+    return stations
+
+
+def parse_noaa_stations(raw_json: bytes) -> List[Station]:
+    return [
+        Station(
+            station_id=str(station["id"]),
+            name=station.get("name", ""),
+            lat=float(station["lat"]),
+            lon=float(station["lng"]),
+        )
+        for station in json.loads(raw_json)["stations"]
+    ]
+
+
+@dataclass
+class StationCatalog:
+    buoys: StationIndex
+    tide_stations: StationIndex
+
+    def resolve_spot(
+        self, lat: float, lon: float, surfline_spot_id: Optional[str] = None
+    ) -> SurfSpotDetails:
+        """
+        Stations for a spot at (lat, lon): the nearest buoy,
+        the next nearest as its fallback, and the nearest tide station.
+        """
+        if len(self.buoys) < 2 or len(self.tide_stations) < 1:
+            raise ValueError("Need at least two buoys and a tide station to pick from")
+        (buoy, buoy_km), (fallback, fallback_km) = self.buoys.nearest(lat, lon, k=2)
+        ((tide_station, tide_km),) = self.tide_stations.nearest(lat, lon)
+        logging.info(
+            f"Picked buoys {buoy.station_id} ({buoy_km:.0f}km), "
+            f"{fallback.station_id} ({fallback_km:.0f}km) and tide station "
+            f"{tide_station.station_id} ({tide_km:.0f}km) for ({lat}, {lon})"
+        )
+        return SurfSpotDetails(
+            nbdc_buoy_id=int(buoy.station_id),
+            fallback_buoy_id=int(fallback.station_id),
+            noaa_tide_station_id=int(tide_station.station_id),
+            surfline_spot_id=surfline_spot_id,
+        )
+
+
+_catalog: Optional[StationCatalog] = None
+
+
+async def _fetch_station_catalog(session: ClientSession) -> StationCatalog:
+    raw_ndbc, raw_noaa = await asyncio.gather(
+        cached_get(session, NDBC_STATIONS_URL, STATION_LIST_CACHE_SOURCE),
+        cached_get(
+            session,
+            NOAA_STATIONS_URL,
+            STATION_LIST_CACHE_SOURCE,
+            params={"type": "harcon"},
+        ),
+    )
+    catalog = StationCatalog(
+        buoys=StationIndex(parse_ndbc_stations(raw_ndbc)),
+        tide_stations=StationIndex(parse_noaa_stations(raw_noaa)),
+    )
+    logging.info(
+        f"Station catalog has {len(catalog.buoys)} buoys "
+        f"and {len(catalog.tide_stations)} tide stations"
+    )
+    return catalog
+
+
+async def get_station_catalog(session: ClientSession) -> StationCatalog:
+    """
+    Downloads the station lists once, then keeps the catalog in memory.
+    The lists also go through the HTTP cache, so a restarted process
+    doesn't download them again.
+    """
+    global _catalog
+    if _catalog is None:
+        _catalog = await SINGLE_FLIGHT.do(
+            ("station_catalog",), lambda: _fetch_station_catalog(session)
+        )
+    return _catalog
+
+
+def load_spot_locations(path: str) -> Dict[str, SpotLocation]:
+    """
+    Reads a JSON file like
+    {"Linda Mar": {"lat": 37.594, "lon": -122.504, "surfline_spot_id": "5842..."}}
+    """
+    with open(path) as f:
+        return {
+            spot_name: SpotLocation(**location)
+            for spot_name, location in json.load(f).items()
+        }
+
+
+async def add_located_spots(
+    session: ClientSession, locations: Dict[str, SpotLocation]
+) -> Dict[str, SurfSpotDetails]:
+    """
+    Picks stations for each location and adds the spots to SPOT_MAPPING.
+    Spots that are already in SPOT_MAPPING keep their hand picked stations.
+    """
+    catalog = await get_station_catalog(session)
+    added = {
+        spot_name: catalog.resolve_spot(
+            location.lat, location.lon, location.surfline_spot_id
+        )
+        for spot_name, location in locations.items()
+        if spot_name not in SPOT_MAPPING
+    }
+    SPOT_MAPPING.update(added)
+    return added
+
+
+_located_spots_added = False
+_located_spots_failed_at: Optional[float] = None
+
+
+def ensure_located_spots() -> None:
+    """
+    Adds the spots in StationCatalogConfig.SPOT_LOCATIONS_FILE, once per process.
+    Every entry point calls this before it looks anything up in SPOT_MAPPING.
+
+    If we can't get the station lists we log it and carry on with the
+    hand picked spots, then try again after RETRY_AFTER_SECONDS.
+    """
+    global _located_spots_added, _located_spots_failed_at
+    path = StationCatalogConfig.SPOT_LOCATIONS_FILE
+    if _located_spots_added or path is None:
+        return
+    if (
+        _located_spots_failed_at is not None
+        and time.monotonic() - _located_spots_failed_at
+        < StationCatalogConfig.RETRY_AFTER_SECONDS
+    ):
+        return
+    locations = load_spot_locations(path)
+    try:
+        added = RUNTIME.run(lambda session: add_located_spots(session, locations))
+    except (ClientError, asyncio.TimeoutError, ElementTree.ParseError, ValueError):
+        logging.exception(f"Couldn't add the spots in {path}, carrying on without them")
+        _located_spots_failed_at = time.monotonic()
+        return
+    logging.info(f"Added {len(added)} spots from {path}")
+    _located_spots_added = True
@@ -0,0 +1,228 @@
+"""
+Keeps track of which NDBC stations are actually working.
+
+Some buoys go dark for months (46012 for example), and asking them for data
+on every request just burns a round trip before we get to the fallback.
+For each station we record failures, how stale its newest record is
+and how long it takes to answer each kind of report.
+
+After enough failures in a row we open the station's circuit and skip
+straight to the fallback. Every so often we let one request through
+as a probe, and a good answer closes the circuit again.
+
+The registry is module level, so it lives as long as the warm lambda does.
+Set StationHealthConfig.TABLE_NAME to also share it between lambdas via DynamoDB.
+"""
+
+from collections import deque
+from dataclasses import dataclass, field
+from decimal import Decimal
+from enum import Enum
+import logging
+import time
+from typing import Any, Deque, Dict, List, Optional
+import numpy as np
+from surf_data import StationHealthConfig
+from surf_data.lib.dynamo import get_table
+
+
+OPTIONAL_FLOAT_ATTRIBUTES = (
+    "opened_at",
+    "last_probe_at",
+    "last_success_at",
+    "newest_record_age",
+)
+
+
+class CircuitState(Enum):
+    closed = "closed"
+    open = "open"
+
+
+@dataclass
+class StationHealth:
+    station_id: int
+    consecutive_failures: int = 0
+    opened_at: Optional[float] = None
+    last_probe_at: Optional[float] = None
+    last_success_at: Optional[float] = None
+    newest_record_age: Optional[float] = None
+    # report type -> how long its recent network responses took
+    latencies: Dict[str, Deque[float]] = field(default_factory=dict)
+
+    @property
+    def state(self) -> CircuitState:
+        if self.opened_at is None:
+            return CircuitState.closed
+        return CircuitState.open
+
+    def add_latency(self, report_type: str, latency: float) -> None:
+        if report_type not in self.latencies:
+            self.latencies[report_type] = deque(
+                maxlen=StationHealthConfig.LATENCY_SAMPLES
+            )
+        self.latencies[report_type].append(latency)
+
+    def latency_percentile(self, report_type: str, percentile: float) -> Optional[float]:
+        latencies = self.latencies.get(report_type)
+        if not latencies:
+            return None
+        return float(np.percentile(latencies, percentile))
+
+    def serialize_for_database(self) -> Dict[str, Any]:
+        item: Dict[str, Any] = {
+            "station_id": self.station_id,
+            "consecutive_failures": self.consecutive_failures,
+            "latencies": {
+                report_type: [Decimal(str(round(lat, 3))) for lat in latencies]
+                for report_type, latencies in self.latencies.items()
+            },
+        }
+        for attr in OPTIONAL_FLOAT_ATTRIBUTES:
+            value = getattr(self, attr)
+            if value is not None:
+                item[attr] = Decimal(str(round(value, 3)))
+        return item
+
+    @classmethod
+    def from_database_item(cls, item: Dict[str, Any]) -> "StationHealth":
+        health = cls(
+            station_id=int(item["station_id"]),
+            consecutive_failures=int(item.get("consecutive_failures", 0)),
+        )
+        latencies = item.get("latencies", {})
+        # items saved before latencies were split up by report type have a list
+        if isinstance(latencies, dict):
+            for report_type, samples in latencies.items():
+                for lat in samples:
+                    health.add_latency(report_type, float(lat))
+        for attr in OPTIONAL_FLOAT_ATTRIBUTES:
+            if attr in item:
+                setattr(health, attr, float(item[attr]))
+        return health
+
+
+class DynamoStationHealthStore:
+    def __init__(self, table_name: str):
+        self.table = get_table(table_name)
+
+    def load_all(self) -> List[StationHealth]:
+        resp = self.table.scan()
+        return [StationHealth.from_database_item(item) for item in resp["Items"]]
+
+    def save(self, health: StationHealth) -> None:
+        self.table.put_item(Item=health.serialize_for_database())
+
+
+class StationHealthRegistry:
+    def __init__(self, store: Optional[DynamoStationHealthStore] = None):
+        self.store = store
+        self._stations: Dict[int, StationHealth] = {}
+        self._loaded = store is None
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            for health in self.store.load_all():
+                self._stations[health.station_id] = health
+        except Exception:
+            logging.exception("Couldn't load station health from DynamoDB")
+
+    def _save(self, health: StationHealth) -> None:
+        if self.store is None:
+            return
+        try:
+            self.store.save(health)
+        except Exception:
+            logging.exception(f"Couldn't save health for station {health.station_id}")
+
+    def get(self, station_id: int) -> StationHealth:
+        self._load()
+        if station_id not in self._stations:
+            self._stations[station_id] = StationHealth(station_id=station_id)
+        return self._stations[station_id]
+
+    def should_try(self, station_id: int) -> bool:
+        """
+        Closed circuits always get tried. Open ones get a probe request
+        once every PROBE_INTERVAL_SECONDS.
+        """
+        health = self.get(station_id)
+        if health.state == CircuitState.closed:
+            return True
+        last_attempt = max(health.opened_at or 0, health.last_probe_at or 0)
+        if time.time() - last_attempt >= StationHealthConfig.PROBE_INTERVAL_SECONDS:
+            logging.info(f"Probing station {station_id} to see if it's back")
+            health.last_probe_at = time.time()
+            return True
+        return False
+
+    def order_stations(self, station_ids: List[int], probe: bool = True) -> List[int]:
+        """
+        Drops stations with an open circuit, keeping the preferred order.
+        If every circuit is open we try them all anyway rather than give up.
+        Without probe, open circuits are just skipped, so a request that
+        doesn't report back to the breaker doesn't use up the next probe.
+        """
+        healthy = [
+            station_id
+            for station_id in station_ids
+            if (
+                self.should_try(station_id)
+                if probe
+                else self.get(station_id).state == CircuitState.closed
+            )
+        ]
+        return healthy or list(station_ids)
+
+    def record_success(
+        self, station_id: int, newest_record_age: Optional[float]
+    ) -> bool:
+        """
+        Records a good response. Returns False if the data turned out to be too stale,
+        in which case it counts as a failure instead.
+        """
+        health = self.get(station_id)
+        health.newest_record_age = newest_record_age
+        if (
+            newest_record_age is not None
+            and newest_record_age > StationHealthConfig.STALE_AFTER_SECONDS
+        ):
+            logging.warning(
+                f"Newest record from station {station_id} is "
+                f"{newest_record_age / 3600:.1f} hours old"
+            )
+            self.record_failure(station_id)
+            return False
+        was_open = health.state == CircuitState.open
+        health.consecutive_failures = 0
+        health.opened_at = None
+        health.last_success_at = time.time()
+        if was_open:
+            logging.info(f"Station {station_id} is back. Closing its circuit.")
+            self._save(health)
+        return True
+
+    def record_latency(self, station_id: int, report_type: str, latency: float) -> None:
+        self.get(station_id).add_latency(report_type, latency)
+
+    def record_failure(self, station_id: int) -> None:
+        health = self.get(station_id)
+        health.consecutive_failures += 1
+        if health.state == CircuitState.open:
+            # a failed probe, so wait another interval before trying again
+            health.last_probe_at = time.time()
+            return
+        if health.consecutive_failures >= StationHealthConfig.FAILURE_THRESHOLD:
+            logging.warning(f"Opening the circuit for station {station_id}")
+            health.opened_at = time.time()
+            self._save(health)
+
+
+STATION_HEALTH = StationHealthRegistry(
+    DynamoStationHealthStore(StationHealthConfig.TABLE_NAME)
+    if StationHealthConfig.TABLE_NAME is not None
+    else None
+)
@@ -0,0 +1,287 @@
+"""
+Predicts tides locally from a station's harmonic constituents,
+so we don't have to ask NOAA for predictions on every request.
+
+NOAA publishes the constituents for each station here:
+https://api.tidesandcurrents.noaa.gov/mdapi/prod/webapi/stations/9414290/harcon.json
+and the datums (we need MSL relative to MLLW) here:
+https://api.tidesandcurrents.noaa.gov/mdapi/prod/webapi/stations/9414290/datums.json
+
+The water level above MLLW at time t is
+    (MSL - MLLW) + sum(f * A * cos(V(t) + u - G))
+where A and G are the amplitude and Greenwich phase of each constituent,
+V is its equilibrium argument built from the astronomical arguments below
+and f, u are the nodal corrections for the 18.6 year lunar node cycle.
+
+The constituent arguments and nodal corrections follow Schureman's
+"Manual of Harmonic Analysis and Prediction of Tides".
+The nodal corrections are the usual simplified series, which is good to
+well under a tenth of a foot for our purposes.
+"""
+
+import asyncio
+from dataclasses import dataclass
+import json
+import logging
+from typing import Any, Dict, Iterable, Tuple
+from aiohttp import ClientSession
+import numpy as np
+from surf_data.lib.http_cache import cached_get
+from surf_data.lib.single_flight import SINGLE_FLIGHT
+
+
+NOAA_STATIONS_URL = "https://api.tidesandcurrents.noaa.gov/mdapi/prod/webapi/stations/"
+NOAA_HARMONICS_CACHE_SOURCE = "noaa_harmonics"
+
+# 2000-01-01 12:00 UTC, the epoch the astronomical arguments are measured from
+J2000_EPOCH = 946728000
+SECONDS_PER_CENTURY = 36525 * 86400
+
+# Equilibrium arguments as multiples of (T, s, h, p, N, p1, 90 degrees), where
+#   T  is the hour angle of the mean sun
+#   s  is the mean longitude of the moon
+#   h  is the mean longitude of the sun
+#   p  is the longitude of the lunar perigee
+#   N  is the longitude of the moon's ascending node
+#   p1 is the longitude of the solar perigee
+CONSTITUENT_ARGUMENTS: Dict[str, Tuple[int, ...]] = {
+    "M2": (2, -2, 2, 0, 0, 0, 0),
+    "S2": (2, 0, 0, 0, 0, 0, 0),
+    "N2": (2, -3, 2, 1, 0, 0, 0),
+    "K1": (1, 0, 1, 0, 0, 0, -1),
+    "M4": (4, -4, 4, 0, 0, 0, 0),
+    "O1": (1, -2, 1, 0, 0, 0, 1),
+    "M6": (6, -6, 6, 0, 0, 0, 0),
+    "MK3": (3, -2, 3, 0, 0, 0, -1),
+    "S4": (4, 0, 0, 0, 0, 0, 0),
+    "MN4": (4, -5, 4, 1, 0, 0, 0),
+    "NU2": (2, -3, 4, -1, 0, 0, 0),
+    "S6": (6, 0, 0, 0, 0, 0, 0),
+    "MU2": (2, -4, 4, 0, 0, 0, 0),
+    "2N2": (2, -4, 2, 2, 0, 0, 0),
+    "OO1": (1, 2, 1, 0, 0, 0, -1),
+    "LAM2": (2, -1, 0, 1, 0, 0, 2),
+    "S1": (1, 0, 0, 0, 0, 0, 0),
+    "M1": (1, -1, 1, 1, 0, 0, -1),
+    "J1": (1, 1, 1, -1, 0, 0, -1),
+    "MM": (0, 1, 0, -1, 0, 0, 0),
+    "SSA": (0, 0, 2, 0, 0, 0, 0),
+    "SA": (0, 0, 1, 0, 0, 0, 0),
+    "MSF": (0, 2, -2, 0, 0, 0, 0),
+    "MF": (0, 2, 0, 0, 0, 0, 0),
+    "RHO": (1, -3, 3, -1, 0, 0, 1),
+    "Q1": (1, -3, 1, 1, 0, 0, 1),
+    "T2": (2, 0, -1, 0, 0, 1, 0),
+    "R2": (2, 0, 1, 0, 0, -1, 2),
+    "2Q1": (1, -4, 1, 2, 0, 0, 1),
+    "P1": (1, 0, -1, 0, 0, 0, 1),
+    "2SM2": (2, 2, -2, 0, 0, 0, 0),
+    "M3": (3, -3, 3, 0, 0, 0, 0),
+    "L2": (2, -1, 2, -1, 0, 0, 2),
+    "2MK3": (3, -4, 3, 0, 0, 0, 1),
+    "K2": (2, 0, 2, 0, 0, 0, 0),
+    "M8": (8, -8, 8, 0, 0, 0, 0),
+    "MS4": (4, -2, 2, 0, 0, 0, 0),
+}
+
+# Nodal corrections of each constituent, as multiples of these base corrections.
+# f multiplies as f_base ** abs(multiple), u adds as u_base * multiple.
+# Purely solar constituents don't need any correction.
+NODAL_BASES = ("M2", "K1", "O1", "K2", "J1", "OO1", "MM", "MF")
+CONSTITUENT_NODAL_FACTORS: Dict[str, Dict[str, float]] = {
+    "M2": {"M2": 1},
+    "N2": {"M2": 1},
+    "2N2": {"M2": 1},
+    "MU2": {"M2": 1},
+    "NU2": {"M2": 1},
+    "LAM2": {"M2": 1},
+    "L2": {"M2": 1},
+    "M3": {"M2": 1.5},
+    "M4": {"M2": 2},
+    "MN4": {"M2": 2},
+    "M6": {"M2": 3},
+    "M8": {"M2": 4},
+    "MS4": {"M2": 1},
+    "2SM2": {"M2": -1},
+    "MSF": {"M2": -1},
+    "MK3": {"M2": 1, "K1": 1},
+    "2MK3": {"M2": 2, "K1": -1},
+    "K1": {"K1": 1},
+    "O1": {"O1": 1},
+    "Q1": {"O1": 1},
+    "2Q1": {"O1": 1},
+    "RHO": {"O1": 1},
+    "M1": {"O1": 1},
+    "K2": {"K2": 1},
+    "J1": {"J1": 1},
+    "OO1": {"OO1": 1},
+    "MM": {"MM": 1},
+    "MF": {"MF": 1},
+}
+
+
+def _astronomical_arguments(epochs: np.ndarray) -> np.ndarray:
+    """
+    Returns (T, s, h, p, N, p1, 90) in degrees for each time, shape (n, 7).
+    """
+    centuries = (epochs - J2000_EPOCH) / SECONDS_PER_CENTURY
+    hours = (epochs % 86400) / 3600
+    return np.stack(
+        [
+            180.0 + 15.0 * hours,
+            218.3164477 + 481267.88123421 * centuries,
+            280.4664567 + 36000.76983 * centuries,
+            83.3532465 + 4069.0137287 * centuries,
+            125.0445479 - 1934.1362891 * centuries,
+            282.9373 + 1.71946 * centuries,
+            np.full_like(centuries, 90.0),
+        ],
+        axis=1,
+    )
+
+
+def _base_nodal_corrections(node: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    f and u (degrees) of the base constituents for the given lunar node longitudes.
+    Returns two arrays of shape (n, len(NODAL_BASES)).
+    """
+    n = np.radians(node)
+    cos_n, cos_2n, cos_3n = np.cos(n), np.cos(2 * n), np.cos(3 * n)
+    sin_n, sin_2n, sin_3n = np.sin(n), np.sin(2 * n), np.sin(3 * n)
+    f = np.stack(
+        [
+            1.0 - 0.037 * cos_n,
+            1.006 + 0.115 * cos_n - 0.009 * cos_2n,
+            1.009 + 0.187 * cos_n - 0.015 * cos_2n,
+            1.024 + 0.286 * cos_n + 0.008 * cos_2n,
+            1.1029 + 0.1676 * cos_n - 0.0170 * cos_2n + 0.0016 * cos_3n,
+            1.1027 + 0.6504 * cos_n + 0.0317 * cos_2n - 0.0014 * cos_3n,
+            1.0 - 0.130 * cos_n,
+            1.043 + 0.414 * cos_n,
+        ],
+        axis=1,
+    )
+    u = np.stack(
+        [
+            -2.1 * sin_n,
+            -8.9 * sin_n + 0.7 * sin_2n,
+            10.8 * sin_n - 1.3 * sin_2n + 0.2 * sin_3n,
+            -17.7 * sin_n + 0.7 * sin_2n,
+            -12.94 * sin_n + 1.34 * sin_2n - 0.19 * sin_3n,
+            -36.68 * sin_n + 4.02 * sin_2n - 0.57 * sin_3n,
+            np.zeros_like(n),
+            -23.7 * sin_n + 2.7 * sin_2n - 0.4 * sin_3n,
+        ],
+        axis=1,
+    )
+    return f, u
+
+
+@dataclass
+class TideHarmonics:
+    station_id: int
+    # height of mean sea level above MLLW, in feet
+    msl_above_mllw: float
+    names: Tuple[str, ...]
+    amplitudes: np.ndarray
+    # Greenwich phase lags, in degrees
+    phases: np.ndarray
+    # degrees per hour
+    speeds: np.ndarray
+
+    def __post_init__(self) -> None:
+        self._arguments = np.array(
+            [CONSTITUENT_ARGUMENTS[name] for name in self.names], dtype=np.float64
+        ).reshape(-1, 7)
+        self._nodal_multiples = np.array(
+            [
+                [
+                    CONSTITUENT_NODAL_FACTORS.get(name, {}).get(base, 0)
+                    for base in NODAL_BASES
+                ]
+                for name in self.names
+            ],
+            dtype=np.float64,
+        ).reshape(-1, len(NODAL_BASES))
+
+    @classmethod
+    def from_noaa(
+        cls, station_id: int, harcon: Dict[str, Any], datums: Dict[str, Any]
+    ) -> "TideHarmonics":
+        constituents = [
+            c
+            for c in harcon["HarmonicConstituents"]
+            if c["amplitude"] and c["name"].upper() in CONSTITUENT_ARGUMENTS
+        ]
+        skipped = {c["name"] for c in harcon["HarmonicConstituents"]} - {
+            c["name"] for c in constituents
+        }
+        if skipped:
+            logging.info(f"Skipping constituents {sorted(skipped)} for {station_id}")
+        if not constituents:
+            raise ValueError(f"Station {station_id} has no harmonic constituents")
+        datum_values = {d["name"]: d["value"] for d in datums["datums"]}
+        return cls(
+            station_id=station_id,
+            msl_above_mllw=float(datum_values["MSL"]) - float(datum_values["MLLW"]),
+            names=tuple(c["name"].upper() for c in constituents),
+            amplitudes=np.array([c["amplitude"] for c in constituents], dtype=np.float64),
+            phases=np.array([c["phase_GMT"] for c in constituents], dtype=np.float64),
+            speeds=np.array([c["speed"] for c in constituents], dtype=np.float64),
+        )
+
+    def predict(self, epochs: Iterable[float]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Water level above MLLW (feet) and its rate of change (feet per hour)
+        at each of the given times, in seconds since the epoch.
+        Everything is computed as one (times x constituents) matrix.
+        """
+        epochs = np.asarray(epochs, dtype=np.float64).reshape(-1)
+        arguments = _astronomical_arguments(epochs)
+        base_f, base_u = _base_nodal_corrections(arguments[:, 4])
+        f = np.exp(np.log(base_f) @ np.abs(self._nodal_multiples).T)
+        u = base_u @ self._nodal_multiples.T
+        phase = np.radians(arguments @ self._arguments.T + u - self.phases)
+        amplitude = f * self.amplitudes
+        levels = self.msl_above_mllw + np.sum(amplitude * np.cos(phase), axis=1)
+        rates = -np.sum(amplitude * np.radians(self.speeds) * np.sin(phase), axis=1)
+        return levels, rates
+
+
+_HARMONICS: Dict[int, TideHarmonics] = {}
+
+
+async def _fetch_tide_harmonics(session: ClientSession, station_id: int) -> TideHarmonics:
+    params = {"units": "english"}
+    raw_harcon, raw_datums = await asyncio.gather(
+        cached_get(
+            session,
+            f"{NOAA_STATIONS_URL}{station_id}/harcon.json",
+            NOAA_HARMONICS_CACHE_SOURCE,
+            params=params,
+        ),
+        cached_get(
+            session,
+            f"{NOAA_STATIONS_URL}{station_id}/datums.json",
+            NOAA_HARMONICS_CACHE_SOURCE,
+            params=params,
+        ),
+    )
+    return TideHarmonics.from_noaa(
+        station_id, json.loads(raw_harcon), json.loads(raw_datums)
+    )
+
+
+async def get_tide_harmonics(session: ClientSession, station_id: int) -> TideHarmonics:
+    """
+    Downloads the station's constituents and datums once, then keeps them in memory.
+    They also go through the HTTP cache so a restarted process doesn't refetch them.
+    """
+    if station_id in _HARMONICS:
+        return _HARMONICS[station_id]
+    harmonics = await SINGLE_FLIGHT.do(
+        ("noaa_harmonics", station_id),
+        lambda: _fetch_tide_harmonics(session, station_id),
+    )
+    _HARMONICS[station_id] = harmonics
+    return harmonics
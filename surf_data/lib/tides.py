@@ -15,6 +15,11 @@ example args:
     interval=hilo
     format=json
 
+We ask for hourly predictions in GMT a calendar month at a time
+(the API allows up to a year of hourly data per request) and keep each month
+as a compact array per station. Lookups binary search the month and do
+cubic Hermite interpolation, so any time in the month costs nothing extra.
+
 The API returns a json blob like this:
 { "predictions" : [
     {"t":"2022-08-06 00:21", "v":"0.804", "type":"L"},
@@ -24,40 +29,67 @@ The API returns a json blob like this:
 ]}
 """
 
-from typing import Any, Dict, List
-from decimal import Decimal
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 from aiohttp import ClientSession
+from aiohttp.client_exceptions import ClientError
+import asyncio
+import calendar
 from dataclasses import dataclass
 from datetime import datetime, timedelta
+from functools import cached_property
+import json
 import logging
-from surf_data import SurfSpotDetails
+import time
+import numpy as np
+from surf_data import SurfSpotDetails, TideConfig
+from surf_data.lib.http_cache import cached_get
+from surf_data.lib.single_flight import SINGLE_FLIGHT
+from surf_data.lib.tide_harmonics import get_tide_harmonics
+from surf_data.lib.token_bucket import TokenBucket
+from surf_data.lib.time_helpers import PST_TIME_ZONE, UTC_TIME_ZONE, ensure_timezone
 
 
 DT_FORMAT = "%Y-%m-%d %H:%M"
 DT_SHORT_FORMAT = "%Y%m%d"
 NOAA_URL = "https://api.tidesandcurrents.noaa.gov/api/prod/datagetter"
+NOAA_CACHE_SOURCE = "noaa_tides"
 
 STATIC_NOAA_PARAMS = {
     "product": "predictions",
     "application": "NOS.COOPS.TAC.WL",
     "datum": "MLLW",
-    "time_zone": "lst_ldt",
+    "time_zone": "gmt",
     "units": "english",
     "interval": "h",
     "format": "json",
 }
+# Each month's block reaches this far into the months on either side,
+# so we can interpolate right up to the edge of the month.
+MONTH_PADDING = timedelta(days=1)
+# We compute local harmonic predictions every 6 minutes
+HARMONIC_STEP_SECONDS = 6 * 60
+HIGH = "high"
+LOW = "low"
 
 
 @dataclass
-class TidePrediction:
+class TideEvent:
+    kind: str
     time: datetime
-    level: Decimal
+    height: float
+
+    def serialize_for_alexa(self) -> str:
+        local_time = self.time.astimezone(PST_TIME_ZONE).strftime("%-I:%M %p")
+        return f"{self.kind} tide is {round(self.height, 1)} feet at {local_time}"
 
 
 @dataclass
 class TideData:
     tide_height: str
     tide_rate_of_change: str
+    next_high: Optional[TideEvent] = None
+    next_low: Optional[TideEvent] = None
 
     def serialize_for_alexa(self) -> str:
         tide_change = float(self.tide_rate_of_change)
@@ -65,66 +97,377 @@ class TideData:
             tide_diff_expression = "going out"
         else:
             tide_diff_expression = "coming in"
+        upcoming = sorted(
+            (event for event in (self.next_high, self.next_low) if event is not None),
+            key=lambda event: event.time,
+        )
+        upcoming_expression = "".join(
+            f"The next {event.serialize_for_alexa()}. " for event in upcoming
+        )
         return (
             f"The tide is currently {self.tide_height} feet and is {tide_diff_expression} at "
             f"{abs(tide_change)} feet per hour. "
+            f"{upcoming_expression}"
         )
 
+    @classmethod
+    def from_prediction(cls, level: float, rate: float) -> "TideData":
+        return cls(str(round(float(level), 1)), str(round(float(rate), 1)))
+
 
-def parse_tide_prediction(prediction: Dict[str, str]) -> "TidePrediction":
-    dt = datetime.strptime(prediction["t"], DT_FORMAT)
-    level = Decimal(prediction["v"])
-    return TidePrediction(dt, level)
+@dataclass
+class TideSeries:
+    """
+    Tide predictions for one station as sorted arrays.
+    epochs are seconds since the epoch, levels are feet above MLLW
+    and slopes are feet per second.
+    """
 
+    station_id: int
+    epochs: np.ndarray
+    levels: np.ndarray
+    slopes: np.ndarray
 
-def find_tide_change(
-    current_minute: int, start: TidePrediction, end: TidePrediction
-) -> TideData:
-    tide_interval = end.level - start.level
-    level = float(start.level) + (float(tide_interval) * (current_minute / 60))
-    return TideData(str(round(level, 1)), str(round(tide_interval, 1)))
+    @classmethod
+    def from_samples(
+        cls, station_id: int, epochs: np.ndarray, levels: np.ndarray
+    ) -> "TideSeries":
+        """
+        When we only have levels we estimate the slopes with central differences.
+        """
+        return cls(
+            station_id=station_id,
+            epochs=epochs.astype(np.int64),
+            levels=levels.astype(np.float32),
+            slopes=np.gradient(levels, epochs).astype(np.float32),
+        )
+
+    @classmethod
+    def from_noaa_predictions(
+        cls, station_id: int, noaa_resp: Dict[str, Any]
+    ) -> "TideSeries":
+        predictions = noaa_resp["predictions"]
+        epochs = np.array(
+            [calendar.timegm(time.strptime(p["t"], DT_FORMAT)) for p in predictions],
+            dtype=np.float64,
+        )
+        levels = np.array([p["v"] for p in predictions], dtype=np.float64)
+        return cls.from_samples(station_id, epochs, levels)
+
+    def _hermite(
+        self, i: np.ndarray, x: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Evaluates the cubic for interval i at fraction x of the way through it.
+        """
+        step = (self.epochs[i + 1] - self.epochs[i]).astype(np.float64)
+        y0, y1 = self.levels[i], self.levels[i + 1]
+        m0, m1 = self.slopes[i] * step, self.slopes[i + 1] * step
+        levels = (
+            (2 * x**3 - 3 * x**2 + 1) * y0
+            + (x**3 - 2 * x**2 + x) * m0
+            + (-2 * x**3 + 3 * x**2) * y1
+            + (x**3 - x**2) * m1
+        )
+        rates = (
+            (6 * x**2 - 6 * x) * y0
+            + (3 * x**2 - 4 * x + 1) * m0
+            + (-6 * x**2 + 6 * x) * y1
+            + (3 * x**2 - 2 * x) * m1
+        ) / step
+        return levels, rates * 3600
+
+    def interpolate(self, epochs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Cubic Hermite interpolation between the bracketing samples.
+        Returns levels in feet and rates of change in feet per hour.
+        """
+        epochs = np.asarray(epochs, dtype=np.float64)
+        if np.any(epochs < self.epochs[0]) or np.any(epochs > self.epochs[-1]):
+            raise ValueError(
+                f"Tide predictions for {self.station_id} don't cover all requested times"
+            )
+        i = np.searchsorted(self.epochs, epochs, side="right") - 1
+        i = np.clip(i, 0, len(self.epochs) - 2)
+        x = (epochs - self.epochs[i]) / (self.epochs[i + 1] - self.epochs[i])
+        return self._hermite(i, x)
+
+    @cached_property
+    def extrema(self) -> "TideExtrema":
+        """
+        Highs and lows are where the slope changes sign.
+        We find those intervals in one pass, then solve the cubic's derivative
+        (a quadratic) to place each turn inside its interval.
+        """
+        before, after = self.slopes[:-1], self.slopes[1:]
+        is_high = (before > 0) & (after <= 0)
+        is_low = (before < 0) & (after >= 0)
+        i = np.flatnonzero(is_high | is_low)
+        step = (self.epochs[i + 1] - self.epochs[i]).astype(np.float64)
+        y0, y1 = self.levels[i].astype(np.float64), self.levels[i + 1]
+        m0, m1 = self.slopes[i] * step, self.slopes[i + 1] * step
+        a = 6 * y0 + 3 * m0 - 6 * y1 + 3 * m1
+        b = -6 * y0 - 4 * m0 + 6 * y1 - 2 * m1
+        c = m0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            root = np.sqrt(np.maximum(b**2 - 4 * a * c, 0))
+            # the numerically stable form of the quadratic formula,
+            # which also covers a == 0 where the derivative is linear
+            q = -0.5 * (b + np.copysign(root, b))
+            candidates = np.stack([q / a, c / q])
+        inside = (candidates >= 0) & (candidates <= 1)
+        x = np.where(inside[0], candidates[0], candidates[1])
+        x = np.clip(np.nan_to_num(x, nan=0.5), 0, 1)
+        levels, _ = self._hermite(i, x)
+        return TideExtrema(
+            epochs=self.epochs[i] + x * step,
+            levels=levels,
+            is_high=is_high[i],
+        )
 
 
 @dataclass
-class TidePredictions:
-    predictions: List[TidePrediction]
+class TideExtrema:
+    """
+    The highs and lows in a TideSeries, in time order.
+    """
 
-    @classmethod
-    def parse_noaa_data(cls, noaa_resp: Dict[str, Any]) -> "TidePredictions":
-        return TidePredictions(
-            predictions=[parse_tide_prediction(p) for p in noaa_resp["predictions"]]
+    epochs: np.ndarray
+    levels: np.ndarray
+    is_high: np.ndarray
+
+    def _event(self, index: int) -> TideEvent:
+        return TideEvent(
+            kind=HIGH if self.is_high[index] else LOW,
+            time=datetime.fromtimestamp(float(self.epochs[index]), UTC_TIME_ZONE),
+            height=float(self.levels[index]),
         )
 
-    def compute_tide_data(self, compute_time: datetime) -> TideData:
+    def _indexes(self, kind: Optional[str]) -> np.ndarray:
+        if kind is None:
+            return np.arange(len(self.epochs))
+        if kind not in (HIGH, LOW):
+            raise ValueError(f"Tide events are either {HIGH} or {LOW}, not {kind}")
+        return np.flatnonzero(self.is_high == (kind == HIGH))
+
+    def next_event(self, epoch: float, kind: Optional[str] = None) -> Optional[TideEvent]:
         """
-        Find the hour before and after and then compute the "slope", as well as interpolate
-        current level.
+        The first high or low (or either, if kind is None) after epoch.
         """
-        rounded_time = compute_time.replace(
-            minute=0, second=0, microsecond=0, tzinfo=None
+        indexes = self._indexes(kind)
+        position = np.searchsorted(self.epochs[indexes], epoch, side="right")
+        if position == len(indexes):
+            return None
+        return self._event(indexes[position])
+
+    def previous_event(
+        self, epoch: float, kind: Optional[str] = None
+    ) -> Optional[TideEvent]:
+        indexes = self._indexes(kind)
+        position = np.searchsorted(self.epochs[indexes], epoch, side="left")
+        if position == 0:
+            return None
+        return self._event(indexes[position - 1])
+
+
+def _month_bounds(month_index: int) -> Tuple[datetime, datetime]:
+    """
+    month_index counts months since January 1970, the way numpy's datetime64[M] does.
+    """
+    year, month = divmod(month_index, 12)
+    start = datetime(1970 + year, month + 1, 1, tzinfo=UTC_TIME_ZONE)
+    year, month = divmod(month_index + 1, 12)
+    return start, datetime(1970 + year, month + 1, 1, tzinfo=UTC_TIME_ZONE)
+
+
+async def _fetch_noaa_month(
+    session: ClientSession, station_id: int, start: datetime, end: datetime
+) -> TideSeries:
+    params = dict(
+        **STATIC_NOAA_PARAMS,
+        station=station_id,
+        begin_date=start.strftime(DT_SHORT_FORMAT),
+        end_date=end.strftime(DT_SHORT_FORMAT),
+    )
+    logging.info(f"Sending request to NOAA for tide data from {start} to {end}")
+    tide_data = json.loads(
+        await cached_get(session, NOAA_URL, NOAA_CACHE_SOURCE, params=params)
+    )
+    return TideSeries.from_noaa_predictions(station_id, tide_data)
+
+
+async def _fetch_harmonic_month(
+    session: ClientSession, station_id: int, start: datetime, end: datetime
+) -> TideSeries:
+    harmonics = await get_tide_harmonics(session, station_id)
+    epochs = np.arange(
+        start.timestamp(), end.timestamp() + HARMONIC_STEP_SECONDS, HARMONIC_STEP_SECONDS
+    )
+    levels, rates = harmonics.predict(epochs)
+    return TideSeries(
+        station_id=station_id,
+        epochs=epochs.astype(np.int64),
+        levels=levels.astype(np.float32),
+        slopes=(rates / 3600).astype(np.float32),
+    )
+
+
+async def _fetch_month(
+    session: ClientSession,
+    station_id: int,
+    month_index: int,
+    rate_limit: Optional[TokenBucket] = None,
+) -> TideSeries:
+    """
+    With a rate_limit, asking NOAA for the month waits for a token first.
+    Harmonic predictions are local, once the station's constituents are in.
+    """
+    month_start, month_end = _month_bounds(month_index)
+    start, end = month_start - MONTH_PADDING, month_end + MONTH_PADDING
+    if TideConfig.PREDICTION_SOURCE == "harmonic":
+        try:
+            return await _fetch_harmonic_month(session, station_id, start, end)
+        except (ClientError, KeyError, ValueError):
+            logging.exception(
+                f"Couldn't predict tides for {station_id} locally. "
+                "Asking NOAA for predictions instead."
+            )
+    if rate_limit is not None:
+        await rate_limit.acquire()
+    return await _fetch_noaa_month(session, station_id, start, end)
+
+
+class TideSeriesStore:
+    """
+    Keeps a TideSeries per (station, month), fetched the first time it's needed.
+    The least recently used months get dropped past TideConfig.MAX_CACHED_MONTHS.
+    """
+
+    def __init__(self) -> None:
+        self._months: "OrderedDict[Tuple[int, int], TideSeries]" = OrderedDict()
+
+    async def get_month(
+        self,
+        session: ClientSession,
+        station_id: int,
+        month_index: int,
+        rate_limit: Optional[TokenBucket] = None,
+    ) -> TideSeries:
+        key = (station_id, month_index)
+        if key in self._months:
+            self._months.move_to_end(key)
+            return self._months[key]
+        series = await SINGLE_FLIGHT.do(
+            ("tide_month", station_id, month_index),
+            lambda: _fetch_month(session, station_id, month_index, rate_limit),
         )
-        for i, prediction in enumerate(self.predictions):
-            if prediction.time == rounded_time:
-                return find_tide_change(
-                    compute_time.minute, prediction, self.predictions[i + 1]
-                )
-        raise ValueError(
-            f"There was no hourly interval containing your time of: {compute_time}"
+        self._months[key] = series
+        while len(self._months) > TideConfig.MAX_CACHED_MONTHS:
+            self._months.popitem(last=False)
+        return series
+
+    async def predict(
+        self,
+        session: ClientSession,
+        station_id: int,
+        epochs: Sequence[float],
+        rate_limit: Optional[TokenBucket] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Levels and rates for a batch of times.
+        Each distinct month gets fetched once, all at the same time.
+        With a rate_limit, every month we have to ask NOAA for takes a token,
+        so years of entries don't all go out at once.
+        """
+        epochs = np.asarray(epochs, dtype=np.float64)
+        month_indexes = (
+            epochs.astype("datetime64[s]").astype("datetime64[M]").astype(np.int64)
+        )
+        unique_months = np.unique(month_indexes)
+        month_series = await asyncio.gather(
+            *(
+                self.get_month(session, station_id, int(m), rate_limit)
+                for m in unique_months
+            )
+        )
+        levels = np.empty_like(epochs)
+        rates = np.empty_like(epochs)
+        for month_index, series in zip(unique_months, month_series):
+            in_month = month_indexes == month_index
+            levels[in_month], rates[in_month] = series.interpolate(epochs[in_month])
+        return levels, rates
+
+    async def _find_event(
+        self,
+        session: ClientSession,
+        station_id: int,
+        epoch: float,
+        kind: Optional[str],
+        direction: int,
+    ) -> TideEvent:
+        month_index = int(
+            np.datetime64(int(epoch), "s").astype("datetime64[M]").astype(np.int64)
         )
+        # a diurnal station can go more than a day between highs,
+        # so the event might be past the padding and in the neighbouring month
+        for month in (month_index, month_index + direction):
+            extrema = (await self.get_month(session, station_id, month)).extrema
+            if direction > 0:
+                event = extrema.next_event(epoch, kind)
+            else:
+                event = extrema.previous_event(epoch, kind)
+            if event is not None:
+                return event
+        raise ValueError(f"Couldn't find a {kind or 'turn in the'} tide for {station_id}")
+
+    async def next_event(
+        self,
+        session: ClientSession,
+        station_id: int,
+        epoch: float,
+        kind: Optional[str] = None,
+    ) -> TideEvent:
+        """
+        The next high or low tide (or either, if kind is None) after epoch.
+        """
+        return await self._find_event(session, station_id, epoch, kind, 1)
+
+    async def previous_event(
+        self,
+        session: ClientSession,
+        station_id: int,
+        epoch: float,
+        kind: Optional[str] = None,
+    ) -> TideEvent:
+        return await self._find_event(session, station_id, epoch, kind, -1)
+
+
+TIDE_SERIES = TideSeriesStore()
+
+
+async def get_tide_data_for_times(
+    session: ClientSession,
+    spot: SurfSpotDetails,
+    times: Sequence[datetime],
+    rate_limit: Optional[TokenBucket] = None,
+) -> List[TideData]:
+    epochs = [ensure_timezone(t).timestamp() for t in times]
+    levels, rates = await TIDE_SERIES.predict(
+        session, spot.noaa_tide_station_id, epochs, rate_limit
+    )
+    return [TideData.from_prediction(level, rate) for level, rate in zip(levels, rates)]
 
 
 async def get_tide_data(
     session: ClientSession, spot: SurfSpotDetails, start_date: datetime
 ) -> TideData:
-    begin_date = start_date - timedelta(days=1)
-    end_date = start_date + timedelta(days=1)
-    params = dict(
-        **STATIC_NOAA_PARAMS,
-        station=spot.noaa_tide_station_id,
-        begin_date=begin_date.strftime(DT_SHORT_FORMAT),
-        end_date=end_date.strftime(DT_SHORT_FORMAT),
-    )
-    logging.info("Sending request to NOAA for tide data")
-    async with session.get(NOAA_URL, params=params) as resp:
-        tide_data = await resp.json()
-    return TidePredictions.parse_noaa_data(tide_data).compute_tide_data(start_date)
+    """
+    The tide at start_date, plus the next high and low.
+    Those come out of the same cached month, so they don't cost another request.
+    """
+    tide = (await get_tide_data_for_times(session, spot, [start_date]))[0]
+    epoch = ensure_timezone(start_date).timestamp()
+    station_id = spot.noaa_tide_station_id
+    tide.next_high = await TIDE_SERIES.next_event(session, station_id, epoch, HIGH)
+    tide.next_low = await TIDE_SERIES.next_event(session, station_id, epoch, LOW)
+    return tide
@@ -18,6 +18,15 @@ def get_current_time(timezone: str = None) -> datetime:
     return datetime.now(tz)
 
 
+def ensure_timezone(dt: datetime) -> datetime:
+    """
+    Times without a time zone are assumed to be pacific time, like the entries.
+    """
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=PST_TIME_ZONE)
+    return dt
+
+
 def parse_absolute_time(time_string: str) -> datetime:
     """
     Alexa might pass something like '06:33' for the entry time.
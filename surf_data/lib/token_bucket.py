@@ -0,0 +1,41 @@
+"""
+A token bucket, for keeping batch jobs polite to NDBC and NOAA.
+
+The bucket fills at `rate` tokens a second up to `capacity`, and each request
+takes a token. So a job can make a short burst of `capacity` requests,
+but over any longer stretch it averages `rate` a second at most.
+"""
+
+import asyncio
+import time
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        if rate <= 0 or capacity < 1:
+            raise ValueError(
+                f"Need a positive rate and a capacity of at least 1, "
+                f"got {rate} and {capacity}"
+            )
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated_at) * self.rate
+        )
+        self._updated_at = now
+
+    async def acquire(self) -> None:
+        """
+        Waits until there's a token, and takes it.
+        """
+        while True:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
@@ -1,13 +1,17 @@
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass
+from decimal import Decimal
+from enum import Enum
 import logging
 import os
 from datetime import datetime
 from typing import Any, Dict, Optional
+from aiohttp import ClientSession
 from surf_data.lib.buoys import ConditionReport
 from surf_data.lib.tides import TideData
-from surf_data.lib.dynamo import SurfDiaryDB, DDB_DATE_FORMAT
+from surf_data.lib.diary_items import decode_conditions, encode_conditions
+from surf_data.lib.dynamo import AsyncSurfDiaryDB, SurfDiaryDB, DDB_DATE_FORMAT
 from surf_data.get_data import get_spot_data
-import asyncio
+from surf_data.lib.runtime import RUNTIME
 
 
 logging.basicConfig(
@@ -17,6 +21,14 @@ logging.basicConfig(
 )
 
 
+class EnrichmentStatus(Enum):
+    # saved without conditions, waiting on the enrichment worker
+    pending = "pending"
+    done = "done"
+    # we ran out of retries
+    failed = "failed"
+
+
 @dataclass
 class LogEntry:
     entry_date: datetime
@@ -25,35 +37,89 @@ class LogEntry:
     notes: str
     wind_and_waves: Optional[ConditionReport] = None
     tides: Optional[TideData] = None
+    # None for entries that got their conditions before they were saved
+    enrichment_status: Optional[EnrichmentStatus] = None
+    enrichment_attempts: int = 0
+    # epoch seconds before which the worker shouldn't retry
+    enrich_after: Optional[float] = None
+
+    @property
+    def key(self) -> Dict[str, str]:
+        return {
+            "spot_name": self.spot_name,
+            "entry_date": self.entry_date.strftime(DDB_DATE_FORMAT),
+        }
+
+    def serialize_enrichment_state(self) -> Dict[str, Any]:
+        if self.enrichment_status is None:
+            return {}
+        state: Dict[str, Any] = {
+            "enrichment_status": self.enrichment_status.value,
+            "enrichment_attempts": self.enrichment_attempts,
+        }
+        if self.enrich_after is not None:
+            state["enrich_after"] = Decimal(str(round(self.enrich_after)))
+        return state
 
     def serialize_for_database(self) -> Dict[str, Any]:
         return {
             "Item": dict(
-                entry_date=self.entry_date.strftime(DDB_DATE_FORMAT),
-                spot_name=self.spot_name,
+                **self.key,
                 rating=self.rating,
                 notes=self.notes,
-                **asdict(self.wind_and_waves),
-                **asdict(self.tides),
+                **encode_conditions(self.wind_and_waves, self.tides),
+                **self.serialize_enrichment_state(),
             )
         }
 
+    @classmethod
+    def from_database_item(cls, item: Dict[str, Any]) -> "LogEntry":
+        """
+        Reads back an entry written with any version of the item schema.
+        """
+        wind_and_waves, tides = decode_conditions(item)
+        return cls(
+            entry_date=datetime.strptime(item["entry_date"], DDB_DATE_FORMAT),
+            spot_name=item["spot_name"],
+            rating=item["rating"],
+            notes=item["notes"],
+            wind_and_waves=wind_and_waves,
+            tides=tides,
+            enrichment_status=(
+                EnrichmentStatus(item["enrichment_status"])
+                if "enrichment_status" in item
+                else None
+            ),
+            enrichment_attempts=int(item.get("enrichment_attempts", 0)),
+            enrich_after=(
+                float(item["enrich_after"]) if "enrich_after" in item else None
+            ),
+        )
 
-def prepare_and_submit_entry(entry_data: LogEntry) -> None:
+
+async def gather_and_persist_entry(
+    session: ClientSession, entry_data: LogEntry, db: Optional[AsyncSurfDiaryDB] = None
+) -> None:
     """
-    Takes a LogEntry object prepared by the Alexa handler.
-    Gathers tide and wave data and submits the log entry to the database.
+    Fetches the conditions and writes the entry without leaving the event loop.
     """
+    if db is None:
+        db = AsyncSurfDiaryDB()
     logging.info("Grabbing external data...")
-    conditions, tide = asyncio.run(
-        get_spot_data(entry_data.spot_name, entry_data.entry_date)
+    entry_data.wind_and_waves, entry_data.tides = await get_spot_data(
+        entry_data.spot_name, entry_data.entry_date, session
     )
-    entry_data.wind_and_waves = conditions
-    entry_data.tides = tide
-    db = SurfDiaryDB()
     logging.info("persisting entry to the DB...")
-    db.persist_entry(args=entry_data.serialize_for_database())
-    logging.info(f"All done!")
+    await db.persist_entry(entry_data.serialize_for_database())
+
+
+def prepare_and_submit_entry(entry_data: LogEntry) -> None:
+    """
+    Takes a LogEntry object prepared by the Alexa handler.
+    Gathers tide and wave data and submits the log entry to the database.
+    """
+    RUNTIME.run(lambda session: gather_and_persist_entry(session, entry_data))
+    logging.info("All done!")
 
 
 def get_latest_entry(spot):
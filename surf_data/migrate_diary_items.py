@@ -0,0 +1,58 @@
+"""
+Rewrites old style diary items in the compact schema from lib/diary_items.py.
+
+    python -m surf_data.migrate_diary_items --dry-run
+    python -m surf_data.migrate_diary_items
+
+Only items without a schema version get rewritten, so it's safe to run again
+if it gets interrupted. The put replaces the whole item, which drops the old
+{measure, unit} maps along with it.
+"""
+
+import argparse
+import logging
+from typing import Any, Dict, Iterator
+from boto3.dynamodb.conditions import Attr
+from surf_data import DynamoDBConfig
+from surf_data.lib.diary_items import SCHEMA_VERSION_ATTRIBUTE
+from surf_data.lib.dynamo import get_table
+from surf_data.log_entry import LogEntry
+
+
+def scan_legacy_items(table: Any) -> Iterator[Dict[str, Any]]:
+    scan_kwargs: Dict[str, Any] = {
+        "FilterExpression": Attr(SCHEMA_VERSION_ATTRIBUTE).not_exists()
+    }
+    while True:
+        resp = table.scan(**scan_kwargs)
+        yield from resp["Items"]
+        if "LastEvaluatedKey" not in resp:
+            return
+        scan_kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+
+def migrate_items(table: Any, dry_run: bool = False) -> int:
+    """
+    Returns how many items were (or with dry_run, would be) rewritten.
+    """
+    migrated = 0
+    with table.batch_writer(
+        overwrite_by_pkeys=[DynamoDBConfig.PARTITION_KEY, DynamoDBConfig.SORT_KEY]
+    ) as batch:
+        for item in scan_legacy_items(table):
+            new_item = LogEntry.from_database_item(item).serialize_for_database()
+            if not dry_run:
+                batch.put_item(Item=new_item["Item"])
+            migrated += 1
+            if migrated % 100 == 0:
+                logging.info(f"Migrated {migrated} items so far")
+    logging.info(f"{'Would have migrated' if dry_run else 'Migrated'} {migrated} items")
+    return migrated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--table", default=DynamoDBConfig.TABLE_NAME)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    migrate_items(get_table(args.table), dry_run=args.dry_run)
@@ -0,0 +1,220 @@
+"""
+Precomputed conditions for every spot, so a spot check doesn't have to wait
+on NDBC and NOAA.
+
+prewarm_handler is meant to run on a schedule (hourly on EventBridge, say).
+It fetches every spot at once and saves a snapshot of each spot's buoy conditions.
+Tides are predicted locally from a cached month, so those are always worked out
+at request time instead.
+Spot checks read the snapshot instead of fetching:
+ - fresher than MAX_AGE_SECONDS: served as is
+ - anything older, or missing: fetched live like before
+Refreshing is left to the prewarm job. Lambda freezes the process as soon as
+the handler returns, so there's no point starting anything in the background.
+
+Snapshots are kept in memory, and in DynamoDB too if SnapshotConfig.TABLE_NAME is set.
+The prewarm job runs in its own lambda, so it needs the table to share them.
+Each item is the spot name, when it was made and a small json payload.
+"""
+
+import asyncio
+from dataclasses import dataclass
+from decimal import Decimal
+import json
+import logging
+import time
+from typing import Any, Dict, Iterable, Optional
+from aiohttp import ClientSession
+from surf_data import SPOT_MAPPING, FetchConfig, SnapshotConfig
+from surf_data.get_data import get_all_spot_data, get_spot_data
+from surf_data.lib.buoys import ConditionReport
+from surf_data.lib.dynamo import get_table
+from surf_data.lib.record_helpers import DataPoint
+from surf_data.lib.runtime import RUNTIME
+from surf_data.lib.spectra import PARTITION_UNITS, SwellPartition
+from surf_data.lib.station_catalog import ensure_located_spots
+from surf_data.lib.tides import TideData, get_tide_data
+from surf_data.lib.time_helpers import get_current_time
+
+
+@dataclass
+class SpotSnapshot:
+    spot_name: str
+    generated_at: float
+    # Just the buoy conditions. The tide is worked out when it's asked for,
+    # so the current height and the next high and low are never stale.
+    conditions: Optional[ConditionReport] = None
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.generated_at
+
+    def serialize_for_database(self) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {}
+        if self.conditions is not None:
+            payload["conditions"] = {
+                attr: [str(value.measure), value.unit]
+                for attr, value in vars(self.conditions).items()
+                if isinstance(value, DataPoint)
+            }
+            payload["station_id"] = self.conditions.station_id
+            payload["record_offset"] = self.conditions.record_offset_seconds
+            payload["swells"] = [
+                [
+                    None if data_point is None else str(data_point.measure)
+                    for data_point in (
+                        partition.height,
+                        partition.period,
+                        partition.direction,
+                    )
+                ]
+                for partition in self.conditions.swell_partitions
+            ]
+        return {
+            "spot_name": self.spot_name,
+            "generated_at": Decimal(str(round(self.generated_at, 3))),
+            "payload": json.dumps(payload, separators=(",", ":")),
+        }
+
+    @classmethod
+    def from_database_item(cls, item: Dict[str, Any]) -> "SpotSnapshot":
+        payload = json.loads(item["payload"])
+        snapshot = cls(
+            spot_name=item["spot_name"], generated_at=float(item["generated_at"])
+        )
+        if "conditions" in payload:
+            snapshot.conditions = ConditionReport(
+                station_id=payload["station_id"],
+                **{
+                    attr: DataPoint(measure, unit)
+                    for attr, (measure, unit) in payload["conditions"].items()
+                },
+                swell_partitions=tuple(
+                    SwellPartition(
+                        *(
+                            None if measure is None else DataPoint(measure, unit)
+                            for measure, unit in zip(partition, PARTITION_UNITS)
+                        )
+                    )
+                    for partition in payload.get("swells", [])
+                ),
+                record_offset_seconds=payload.get("record_offset"),
+            )
+        return snapshot
+
+
+class DynamoSnapshotStore:
+    def __init__(self, table_name: str):
+        self.table = get_table(table_name)
+
+    def load(self, spot_name: str) -> Optional[SpotSnapshot]:
+        resp = self.table.get_item(Key={"spot_name": spot_name})
+        if "Item" not in resp:
+            return None
+        return SpotSnapshot.from_database_item(resp["Item"])
+
+    def save_all(self, snapshots: Iterable[SpotSnapshot]) -> None:
+        with self.table.batch_writer() as batch:
+            for snapshot in snapshots:
+                batch.put_item(Item=snapshot.serialize_for_database())
+
+
+class SnapshotRegistry:
+    def __init__(self, store: Optional[DynamoSnapshotStore] = None):
+        self.store = store
+        self._snapshots: Dict[str, SpotSnapshot] = {}
+
+    def get(self, spot_name: str) -> Optional[SpotSnapshot]:
+        """
+        The newest snapshot we have for the spot, from memory or the table.
+        We only go back to the table once the one in memory is a little old,
+        in case the prewarm job has written a newer one since.
+        """
+        snapshot = self._snapshots.get(spot_name)
+        if snapshot is not None and snapshot.age < SnapshotConfig.REFRESH_AFTER_SECONDS:
+            return snapshot
+        if self.store is not None:
+            try:
+                stored = self.store.load(spot_name)
+            except Exception:
+                logging.exception(f"Couldn't load the snapshot for {spot_name}")
+                stored = None
+            if stored is not None and (
+                snapshot is None or stored.generated_at > snapshot.generated_at
+            ):
+                snapshot = stored
+                self._snapshots[spot_name] = stored
+        return snapshot
+
+    def save_all(self, snapshots: Iterable[SpotSnapshot]) -> None:
+        snapshots = list(snapshots)
+        for snapshot in snapshots:
+            self._snapshots[snapshot.spot_name] = snapshot
+        if self.store is None:
+            return
+        try:
+            self.store.save_all(snapshots)
+        except Exception:
+            logging.exception("Couldn't save snapshots to DynamoDB")
+
+
+SNAPSHOTS = SnapshotRegistry(
+    DynamoSnapshotStore(SnapshotConfig.TABLE_NAME)
+    if SnapshotConfig.TABLE_NAME is not None
+    else None
+)
+
+
+async def _get_current_tide(session: ClientSession, spot_name: str) -> Optional[TideData]:
+    try:
+        return await asyncio.wait_for(
+            get_tide_data(session, SPOT_MAPPING[spot_name], get_current_time()),
+            FetchConfig.SPOT_DATA_DEADLINE_SECONDS,
+        )
+    except Exception:
+        logging.exception(f"Couldn't get the tide for {spot_name}")
+        return None
+
+
+def get_spot_snapshot(
+    spot_name: str,
+) -> tuple[Optional[ConditionReport], Optional[TideData]]:
+    """
+    Conditions for a spot, from its snapshot if it's recent enough.
+    Otherwise we fetch live and keep the conditions as the new snapshot.
+    The tide is always for right now. It comes out of the cached month
+    of predictions, so it doesn't cost a request.
+    """
+    snapshot = SNAPSHOTS.get(spot_name)
+    if snapshot is not None and snapshot.age < SnapshotConfig.MAX_AGE_SECONDS:
+        logging.info(f"Using the {snapshot.age:.0f}s old snapshot for {spot_name}")
+        tide = RUNTIME.run(lambda session: _get_current_tide(session, spot_name))
+        return snapshot.conditions, tide
+    generated_at = time.time()
+    conditions, tide = RUNTIME.run(
+        lambda session: get_spot_data(spot_name, session=session)
+    )
+    if conditions is not None:
+        SNAPSHOTS.save_all([SpotSnapshot(spot_name, generated_at, conditions)])
+    return conditions, tide
+
+
+def prewarm_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Entry point for the scheduled job. Snapshots every spot in one go.
+    """
+    if SNAPSHOTS.store is None:
+        raise ValueError(
+            "Set SnapshotConfig.TABLE_NAME to prewarm, "
+            "otherwise the snapshots never reach the skill"
+        )
+    ensure_located_spots()
+    generated_at = time.time()
+    all_spot_data = RUNTIME.run(lambda session: get_all_spot_data(session=session))
+    SNAPSHOTS.save_all(
+        SpotSnapshot(spot_name, generated_at, conditions)
+        for spot_name, (conditions, _) in all_spot_data.items()
+        if conditions is not None
+    )
+    logging.info(f"Saved snapshots for {len(all_spot_data)} spots")
+    return {"spots": sorted(all_spot_data)}
@@ -0,0 +1,78 @@
+from decimal import Decimal
+import pytest
+from surf_data.lib.buoys import ConditionReport
+from surf_data.lib.diary_items import decode_conditions, encode_conditions
+from surf_data.lib.record_helpers import DataPoint
+from surf_data.lib.spectra import SwellPartition
+from surf_data.lib.tides import TideData
+
+
+conditions = ConditionReport(
+    station_id=46237,
+    wind_direction=DataPoint("290", "degT"),
+    wind_speed=DataPoint("5.0", "m/s"),
+    swell_height=DataPoint("1.4", "m"),
+    swell_direction=DataPoint("WNW", "-"),
+    wave_steepness=DataPoint("AVERAGE", "-"),
+)
+tide = TideData("3.1", "-0.4")
+
+
+def test_encoding_is_flat_numeric_and_skips_missing_values():
+    item = encode_conditions(conditions, tide)
+    assert item == {
+        "v": 1,
+        "buoy": 46237,
+        "WDIR": Decimal("290"),
+        "WSPD": Decimal("5.0"),
+        "SwH": Decimal("1.4"),
+        "SwD": "WNW",
+        "STEEPNESS": "AVERAGE",
+        "tide_ft": Decimal("3.1"),
+        "tide_ft_hr": Decimal("-0.4"),
+    }
+    assert decode_conditions(item) == (conditions, tide)
+
+
+def test_encoding_converts_to_canonical_units():
+    report = ConditionReport(station_id=1, wind_gust=DataPoint("10", "kts"))
+    assert encode_conditions(report, None)["GST"] == Decimal("5.14")
+    report.wind_gust = DataPoint("10", "furlongs")
+    with pytest.raises(ValueError):
+        encode_conditions(report, None)
+
+
+def test_swell_partitions_round_trip():
+    report = ConditionReport(
+        station_id=46237,
+        swell_partitions=(
+            SwellPartition(
+                DataPoint("1.8", "m"), DataPoint("9.1", "sec"), DataPoint("298", "degT")
+            ),
+            SwellPartition(DataPoint("0.6", "m"), DataPoint("16.7", "sec")),
+        ),
+        record_offset_seconds=600.0,
+    )
+    item = encode_conditions(report, None)
+    assert item["swells"] == [
+        [Decimal("1.8"), Decimal("9.1"), Decimal("298")],
+        [Decimal("0.6"), Decimal("16.7")],
+    ]
+    assert item["offset_s"] == 600
+    assert decode_conditions(item) == (report, None)
+
+
+def test_old_style_items_still_decode():
+    legacy_item = {
+        "spot_name": "Ocean Beach",
+        "station_id": 46237,
+        "wind_direction": {"measure": "290", "unit": "degT"},
+        "wind_speed": {"measure": "5.0", "unit": "m/s"},
+        "wind_gust": None,
+        "swell_height": {"measure": "1.4", "unit": "m"},
+        "swell_direction": {"measure": "WNW", "unit": "-"},
+        "wave_steepness": {"measure": "AVERAGE", "unit": "-"},
+        "tide_height": "3.1",
+        "tide_rate_of_change": "-0.4",
+    }
+    assert decode_conditions(legacy_item) == (conditions, tide)
@@ -0,0 +1,99 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from surf_data import DynamoDBConfig
+from surf_data.lib import dynamo
+from surf_data.lib.dynamo import (
+    AsyncSurfDiaryDB,
+    SurfDiaryDB,
+    deserialize_item,
+    get_table,
+    reset_dynamodb_resource,
+)
+
+
+def test_diary_shares_one_resource_and_table(monkeypatch):
+    monkeypatch.setattr(DynamoDBConfig, "ENDPOINT_URL", "http://localhost:8000")
+    reset_dynamodb_resource()
+    try:
+        first, second = SurfDiaryDB(), SurfDiaryDB()
+        assert first.table is second.table is get_table(DynamoDBConfig.TABLE_NAME)
+        client = dynamo.get_dynamodb_resource().meta.client
+        assert client.meta.endpoint_url == "http://localhost:8000"
+        assert client.meta.config.max_pool_connections == (
+            DynamoDBConfig.MAX_POOL_CONNECTIONS
+        )
+        assert client.meta.config.retries["mode"] == DynamoDBConfig.RETRY_MODE
+    finally:
+        reset_dynamodb_resource()
+
+
+class FakeClient:
+    """
+    Leaves the last item of every batch unprocessed the first time around.
+    """
+
+    def __init__(self):
+        self.written = []
+        self.calls = 0
+
+    def batch_write_item(self, RequestItems):
+        self.calls += 1
+        (table_name, requests), = RequestItems.items()
+        if len(requests) > 1:
+            requests, unprocessed = requests[:-1], requests[-1:]
+        else:
+            unprocessed = []
+        self.written.extend(
+            deserialize_item(request["PutRequest"]["Item"]) for request in requests
+        )
+        return {"UnprocessedItems": {table_name: unprocessed} if unprocessed else {}}
+
+
+def test_batch_put_writes_in_chunks_and_retries_unprocessed_items():
+    client = FakeClient()
+    items = [{"spot_name": "Ocean Beach", "entry_date": str(i)} for i in range(60)]
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        db = AsyncSurfDiaryDB("SurfDiary", client=client, executor=executor)
+        asyncio.run(db.batch_put(items))
+    assert sorted(client.written, key=lambda item: int(item["entry_date"])) == items
+    # three batches of up to 25, each needing one retry
+    assert client.calls == 6
+
+
+class FakeQueryClient:
+    """
+    Pages through the items two at a time, and records updates.
+    """
+
+    def __init__(self, items):
+        self.items = items
+        self.update_kwargs = None
+
+    def query(self, ExclusiveStartKey=0, Limit=2, **kwargs):
+        page = self.items[ExclusiveStartKey:ExclusiveStartKey + Limit]
+        resp = {"Items": [dynamo.serialize_item(item) for item in page]}
+        if ExclusiveStartKey + Limit < len(self.items):
+            resp["LastEvaluatedKey"] = ExclusiveStartKey + Limit
+        return resp
+
+    def update_item(self, **kwargs):
+        self.update_kwargs = kwargs
+        return {}
+
+
+def test_query_spot_pages_and_update_removes_attributes():
+    items = [{"spot_name": "Ocean Beach", "entry_date": str(i)} for i in range(5)]
+    client = FakeQueryClient(items)
+
+    async def query_and_update():
+        pages = [page async for page in db.query_spot("Ocean Beach", 2)]
+        await db.update_entry(items[0], {"v": 1}, remove=["station_id"])
+        return pages
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        db = AsyncSurfDiaryDB("SurfDiary", client=client, executor=executor)
+        pages = asyncio.run(query_and_update())
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert [item for page in pages for item in page] == items
+    assert client.update_kwargs["UpdateExpression"] == "SET #a0 = :v0 REMOVE #r0"
+    assert client.update_kwargs["ExpressionAttributeNames"]["#r0"] == "station_id"
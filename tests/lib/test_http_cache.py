@@ -0,0 +1,57 @@
+import asyncio
+import time
+from aiohttp import ClientSession, web
+from aiohttp.test_utils import TestServer
+from surf_data import HTTPCacheConfig
+from surf_data.lib.http_cache import CachedResponse, ResponseCache, cache_key, cached_get
+
+
+def test_cache_evicts_least_recently_used():
+    cache = ResponseCache(None, max_bytes=10)
+    cache.put("a", CachedResponse(body=b"1234", fetched_at=time.time()))
+    cache.put("b", CachedResponse(body=b"1234", fetched_at=time.time()))
+    cache.get("a")
+    cache.put("c", CachedResponse(body=b"1234", fetched_at=time.time()))
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
+
+
+def test_cache_persists_to_disk(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=1024)
+    cache.put("a", CachedResponse(body=b"body", fetched_at=1.0, etag='"abc"'))
+    restarted_cache = ResponseCache(str(tmp_path), max_bytes=1024)
+    assert restarted_cache.get("a") == CachedResponse(
+        body=b"body", fetched_at=1.0, etag='"abc"'
+    )
+
+
+def test_cache_key_sorts_params():
+    assert cache_key("https://x.com/a", {"b": 1, "a": "z"}) == "https://x.com/a?a=z&b=1"
+
+
+def test_cached_get_revalidates(monkeypatch):
+    monkeypatch.setitem(HTTPCacheConfig.TTL_SECONDS, "test", 0)
+    statuses = []
+
+    async def handler(request):
+        if request.headers.get("If-None-Match") == '"v1"':
+            statuses.append(304)
+            return web.Response(status=304)
+        statuses.append(200)
+        return web.Response(body=b"tide data", headers={"ETag": '"v1"'})
+
+    async def fetch_twice():
+        app = web.Application()
+        app.router.add_get("/tides", handler)
+        cache = ResponseCache(None, 1024)
+        async with TestServer(app) as server:
+            async with ClientSession(raise_for_status=True) as session:
+                url = str(server.make_url("/tides"))
+                return [
+                    await cached_get(session, url, "test", cache=cache),
+                    await cached_get(session, url, "test", cache=cache),
+                ]
+
+    assert asyncio.run(fetch_twice()) == [b"tide data", b"tide data"]
+    assert statuses == [200, 304]
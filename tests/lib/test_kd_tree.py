@@ -0,0 +1,23 @@
+import numpy as np
+from surf_data.lib.kd_tree import KDTree
+
+
+def test_query_matches_brute_force():
+    rng = np.random.default_rng(7)
+    points = rng.normal(size=(2000, 3))
+    tree = KDTree(points)
+    for target in rng.normal(size=(50, 3)):
+        distances, indices = tree.query(target, k=3)
+        brute_force = np.linalg.norm(points - target, axis=1)
+        expected = np.argsort(brute_force)[:3]
+        assert indices.tolist() == expected.tolist()
+        assert np.allclose(distances, brute_force[expected])
+
+
+def test_query_small_and_empty_trees():
+    tree = KDTree(np.array([[0.0, 0.0], [1.0, 1.0]]))
+    distances, indices = tree.query([0.9, 0.9], k=5)
+    assert indices.tolist() == [1, 0]
+    assert len(distances) == 2
+    empty_distances, empty_indices = KDTree(np.zeros((0, 2))).query([0.0, 0.0])
+    assert len(empty_distances) == len(empty_indices) == 0
@@ -0,0 +1,97 @@
+import asyncio
+import time
+from datetime import datetime
+import pytest
+from aiohttp import ClientSession, web
+from aiohttp.test_utils import TestServer
+from surf_data.lib import buoys, http_cache, latest_obs
+from surf_data.lib.http_cache import ResponseCache
+from surf_data.lib.latest_obs import LATEST_OBSERVATIONS, LatestObservations
+from surf_data.lib.record_helpers import DataPoint
+from surf_data.lib.single_flight import SINGLE_FLIGHT
+from surf_data.lib.time_helpers import UTC_TIME_ZONE
+
+
+NOW = int(time.time()) // 600 * 600
+
+
+def make_latest_obs(*rows):
+    lines = [
+        "#STN       LAT      LON  YYYY MM DD hh mm WDIR WSPD   GST WVHT  PTDY",
+        "#text      deg      deg   yr mo day hr mn degT  m/s   m/s   m   hPa",
+    ]
+    for station, epoch, wdir, wspd in rows:
+        timestamp = time.strftime("%Y %m %d %H %M", time.gmtime(epoch))
+        lines.append(
+            f"{station}    37.754 -122.839 {timestamp} {wdir} {wspd}   5.0  MM  +0.6"
+        )
+    return "\n".join(lines) + "\n"
+
+
+@pytest.fixture(autouse=True)
+def clear_latest_obs(monkeypatch):
+    monkeypatch.setattr(http_cache, "RESPONSE_CACHE", ResponseCache(None, 1024 * 1024))
+    SINGLE_FLIGHT.clear()
+    LATEST_OBSERVATIONS.clear()
+    yield
+    SINGLE_FLIGHT.clear()
+    LATEST_OBSERVATIONS.clear()
+
+
+def test_parse_latest_obs():
+    latest = LatestObservations.from_raw_report(
+        make_latest_obs(("46026", NOW, 300, 4.0), ("ALSN6", NOW - 600, "MM", 9.5))
+    )
+    assert latest.rows == {"46026": 0, "ALSN6": 1}
+    rep_time = datetime.fromtimestamp(NOW + 1200, UTC_TIME_ZONE)
+    report = latest.get_station_report(46026, rep_time)
+    assert len(report) == 1
+    assert report.get_data_point("WSPD", 0) == DataPoint("4.0", "m/s")
+    assert report.get_data_point("PTDY", 0) == DataPoint("0.6", "hPa")
+    assert report.get_data_point("WVHT", 0) is None
+    # too long after the observation, or before it
+    late = datetime.fromtimestamp(NOW + 2 * 60 * 60, UTC_TIME_ZONE)
+    early = datetime.fromtimestamp(NOW - 600, UTC_TIME_ZONE)
+    assert latest.get_station_report(46026, late) is None
+    assert latest.get_station_report(46026, early) is None
+    assert latest.get_station_report(46012, rep_time) is None
+
+
+def test_weather_for_every_buoy_comes_from_one_download(monkeypatch):
+    requests = []
+    raw_latest_obs = make_latest_obs(
+        # 46012 has been quiet for hours, so its spots fall back to 46026
+        ("46012", NOW - 5 * 60 * 60, 180, 9.9),
+        ("46026", NOW, 300, 4.0),
+        ("46237", NOW - 600, 290, 6.5),
+    )
+
+    async def latest(request):
+        requests.append(request.path)
+        return web.Response(text=raw_latest_obs)
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/latest_obs.txt", latest)
+        async with TestServer(app) as server:
+            monkeypatch.setattr(
+                latest_obs, "LATEST_OBS_URL", str(server.make_url("/latest_obs.txt"))
+            )
+            async with ClientSession(raise_for_status=True) as session:
+                return await asyncio.gather(
+                    *(
+                        buoys._get_station_report(
+                            session,
+                            station_id,
+                            46026,
+                            buoys.NDBCDataTypes.weather,
+                            datetime.fromtimestamp(NOW + 900, UTC_TIME_ZONE),
+                        )
+                        for station_id in (46012, 46237)
+                    )
+                )
+
+    pacifica, ocean_beach = asyncio.run(run())
+    assert requests == ["/latest_obs.txt"]
+    assert pacifica.get_data_point("WSPD", 0) == DataPoint("4.0", "m/s")
+    assert ocean_beach.get_data_point("WSPD", 0) == DataPoint("6.5", "m/s")
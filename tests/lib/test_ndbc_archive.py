@@ -0,0 +1,238 @@
+import asyncio
+import gzip
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+from aiohttp import ClientSession, web
+from aiohttp.test_utils import TestServer
+from surf_data.lib import buoys, ndbc_archive
+from surf_data.lib.diary_items import encode_conditions
+from surf_data.lib.ndbc_archive import ArchiveProduct, NDBCArchive
+from surf_data.lib.record_helpers import DataPoint
+from surf_data.lib.single_flight import SINGLE_FLIGHT
+from surf_data.lib.time_helpers import UTC_TIME_ZONE
+
+
+mock_stdmet_archive = (
+    "#YY MM DD hh mm WDIR WSPD GST WVHT DPD APD MWD PRES ATMP WTMP DEWP VIS TIDE\n"
+    "#yr mo dy hr mn degT m/s m/s m sec sec degT hPa degC degC degC mi ft\n"
+    "2022 02 28 22 50 310 6.1 7.4 2.03 11.43 7.52 296 1019.8 11.9 12.1 9.0 99.0 99.00\n"
+    "2022 02 28 23 50 999 99.0 99.0 2.11 12.50 7.66 299 1019.6 11.7 12.1 8.8 99.0 99.00\n"
+    "2022 03 01 00 50 305 5.2 6.8 2.25 12.50 7.80 301 1019.5 11.6 12.0 8.6 99.0 99.00\n"
+    "2022 03 01 01 50 300 4.9 6.1 99.00 99.00 99.00 999 1019.3 11.4 12.0 8.5 99.0 99.00\n"
+    "2022 03 01 02 50 298 4.4 5.9 2.31 13.79 8.01 303 1019.1 11.2 12.0 8.3 99.0 99.00\n"
+)
+
+
+# a 14 second swell and a 6 second wind wave, with one band missing
+mock_swden_archive = (
+    "#YY  MM DD hh mm .0500 .0600 .0714 .0800 .1000 .1250 .1667 .2000 .2500\n"
+    "2022 03 01 01 40 0.10 1.50 6.00 1.50 0.10 0.05 0.80 0.30 999.00\n"
+    "2022 03 01 02 40 0.10 1.60 6.20 1.40 0.10 0.05 0.90 0.30 0.05\n"
+)
+
+
+# before 2007 there's no units row, and before 2005 no minutes
+mock_2004_stdmet_archive = (
+    "YYYY MM DD hh WD WSPD GST WVHT DPD APD MWD BAR ATMP WTMP DEWP VIS TIDE\n"
+    "2004 03 01 00 305 5.2 6.8 2.25 12.50 7.80 301 1019.5 11.6 12.0 8.6 99.0 99.00\n"
+    "2004 03 01 01 300 4.9 6.1 99.00 99.00 99.00 999 1019.3 11.4 12.0 8.5 99.0 99.00\n"
+)
+# and before 2000 the years have two digits
+mock_1998_stdmet_archive = (
+    "YY MM DD hh WD WSPD GST WVHT DPD APD MWD BAR ATMP WTMP DEWP VIS\n"
+    "98 03 01 00 305 5.2 6.8 2.25 12.50 7.80 301 1019.5 11.6 12.0 8.6 99.0\n"
+)
+
+
+@pytest.fixture(autouse=True)
+def clear_single_flight():
+    SINGLE_FLIGHT.clear()
+    yield
+    SINGLE_FLIGHT.clear()
+
+
+def serve_archive(monkeypatch, files):
+    """
+    Serves gzipped files in small chunks, and counts the requests for each.
+    """
+    requests = []
+
+    async def archive_file(request):
+        requests.append(request.path)
+        if request.path not in files:
+            raise web.HTTPNotFound()
+        resp = web.StreamResponse()
+        await resp.prepare(request)
+        body = gzip.compress(files[request.path].encode())
+        for start in range(0, len(body), 64):
+            await resp.write(body[start:start + 64])
+        return resp
+
+    async def run(func):
+        app = web.Application()
+        app.router.add_get("/{path:.*}", archive_file)
+        async with TestServer(app) as server:
+            monkeypatch.setattr(
+                ndbc_archive, "NDBC_DATA_URL", str(server.make_url("/data/"))
+            )
+            async with ClientSession(raise_for_status=True) as session:
+                return await func(session)
+
+    return run, requests
+
+
+def test_archive_urls():
+    assert ndbc_archive.get_yearly_url(46026, ArchiveProduct.swden, 2021) == (
+        "https://www.ndbc.noaa.gov/data/historical/swden/46026w2021.txt.gz"
+    )
+    assert ndbc_archive.get_monthly_url(46026, ArchiveProduct.stdmet, 2024, 11) == (
+        "https://www.ndbc.noaa.gov/data/stdmet/Nov/46026b2024.txt.gz"
+    )
+
+
+def test_get_month_splits_yearly_file_and_caches_it(monkeypatch, tmp_path):
+    run, requests = serve_archive(
+        monkeypatch, {"/data/historical/stdmet/46026h2022.txt.gz": mock_stdmet_archive}
+    )
+    archive = NDBCArchive(str(tmp_path), 4)
+
+    march = asyncio.run(
+        run(lambda session: archive.get_month(
+            session, 46026, ArchiveProduct.stdmet, (2022, 3)
+        ))
+    )
+    assert requests == ["/data/historical/stdmet/46026h2022.txt.gz"]
+    assert len(march) == 3
+    assert march.get_data_point("WSPD", 0) == DataPoint("5.2", "m/s")
+    # 99.00 and 999 mean missing in the archives
+    assert march.get_data_point("WVHT", 1) is None
+    assert march.get_data_point("MWD", 1) is None
+    assert np.isnan(march.columns["TIDE"]).all()
+
+    # a new process reads the months back off disk, and knows May was empty
+    archive = NDBCArchive(str(tmp_path), 4)
+    february, may = asyncio.run(
+        run(lambda session: asyncio.gather(
+            archive.get_month(session, 46026, ArchiveProduct.stdmet, (2022, 2)),
+            archive.get_month(session, 46026, ArchiveProduct.stdmet, (2022, 5)),
+        ))
+    )
+    assert len(requests) == 1
+    assert len(february) == 2
+    assert february.get_data_point("WDIR", 1) is None
+    assert len(may) == 0
+    assert archive.get_index(46026, ArchiveProduct.stdmet)["2022-03"][0] == 3
+
+
+def test_old_archives_get_standard_units(monkeypatch, tmp_path):
+    run, requests = serve_archive(
+        monkeypatch,
+        {
+            "/data/historical/stdmet/46026h2004.txt.gz": mock_2004_stdmet_archive,
+            "/data/historical/stdmet/46026h1998.txt.gz": mock_1998_stdmet_archive,
+        },
+    )
+    archive = NDBCArchive(str(tmp_path), 4)
+    march_2004, march_1998 = asyncio.run(
+        run(lambda session: asyncio.gather(
+            archive.get_month(session, 46026, ArchiveProduct.stdmet, (2004, 3)),
+            archive.get_month(session, 46026, ArchiveProduct.stdmet, (1998, 3)),
+        ))
+    )
+    assert len(march_2004) == 2
+    assert march_2004.get_data_point("WDIR", 0) == DataPoint("305", "degT")
+    assert march_2004.get_data_point("WSPD", 1) == DataPoint("4.9", "m/s")
+    assert march_2004.get_data_point("PRES", 0) == DataPoint("1019.5", "hPa")
+    assert march_2004.get_data_point("WVHT", 1) is None
+    assert march_2004.sorted_epochs[1] == datetime(
+        2004, 3, 1, 1, tzinfo=UTC_TIME_ZONE
+    ).timestamp()
+    assert len(march_1998) == 1
+    assert march_1998.get_data_point("WVHT", 0) == DataPoint("2.25", "m")
+    # and they can go in a diary item
+    conditions = buoys.ConditionReport(station_id=46026)
+    conditions.parse_columnar_row(march_2004, 0)
+    assert encode_conditions(conditions, None)["WDIR"] == 305
+
+
+def test_station_report_uses_archive_for_old_times(monkeypatch, tmp_path):
+    run, requests = serve_archive(
+        monkeypatch,
+        {
+            "/data/historical/stdmet/46026h2022.txt.gz": mock_stdmet_archive,
+            "/data/historical/swden/46026w2022.txt.gz": mock_swden_archive,
+        },
+    )
+    monkeypatch.setattr(ndbc_archive, "NDBC_ARCHIVE", NDBCArchive(str(tmp_path), 4))
+    spot = buoys.SurfSpotDetails(46012, 46026, 9413450, None)
+    rep_time = datetime(2022, 3, 1, 2, 30, tzinfo=UTC_TIME_ZONE)
+
+    conditions = asyncio.run(
+        run(lambda session: buoys.get_station_data(session, spot, rep_time))
+    )
+    # 46012 had nothing that year, so we fell back to 46026
+    assert [path for path in requests if "stdmet" in path] == [
+        "/data/historical/stdmet/46012h2022.txt.gz",
+        "/data/stdmet/Mar/4601232022.txt.gz",
+        "/data/historical/stdmet/46026h2022.txt.gz",
+    ]
+    assert [path for path in requests if "swden" in path] == [
+        "/data/historical/swden/46012w2022.txt.gz",
+        "/data/swden/Mar/4601232022.txt.gz",
+        "/data/historical/swden/46026w2022.txt.gz",
+    ]
+    # two thirds of the way from 01:50 to 02:50
+    assert conditions.wind_speed == DataPoint("4.6", "m/s")
+    # the 01:50 wave height is missing, so that comes from 02:50
+    assert conditions.significant_wave_height == DataPoint("2.31", "m")
+    # the archives can't split swell from wind waves, but swden has both swells
+    assert conditions.swell_height is None
+    assert conditions.wave_steepness is None
+    assert [partition.period for partition in conditions.swell_partitions] == [
+        DataPoint("14.0", "sec"), DataPoint("6.0", "sec"),
+    ]
+    assert conditions.swell_partitions[0].direction is None
+    assert buoys.is_archived(rep_time)
+    assert not buoys.is_archived(datetime.now(UTC_TIME_ZONE) - timedelta(days=2))
+
+
+def test_unpublished_month_near_realtime_falls_back_to_realtime2(
+    monkeypatch, tmp_path
+):
+    run, requests = serve_archive(monkeypatch, {})
+    archive = NDBCArchive(str(tmp_path), 4)
+    monkeypatch.setattr(ndbc_archive, "NDBC_ARCHIVE", archive)
+    now = datetime.now(UTC_TIME_ZONE)
+    month_start = (now - timedelta(days=60)).replace(day=1)
+    rep_time = month_start.replace(day=15, hour=12, minute=0, second=0, microsecond=0)
+    # realtime2 reaches back to an hour after rep_time, in the same month
+    realtime_days = ((now - rep_time).total_seconds() - 3600) / 86400
+    monkeypatch.setattr(buoys.NDBCArchiveConfig, "REALTIME_DAYS", realtime_days)
+    realtime_calls = []
+
+    async def get_realtime_report(session, station_id, fallback, report_type, *args):
+        realtime_calls.append((station_id, report_type))
+        return "realtime2"
+
+    monkeypatch.setattr(buoys, "_get_realtime_report", get_realtime_report)
+    report = asyncio.run(
+        run(lambda session: buoys._get_station_report(
+            session, 46026, 46026, buoys.NDBCDataTypes.waves, rep_time
+        ))
+    )
+    assert report == "realtime2"
+    assert realtime_calls == [(46026, buoys.NDBCDataTypes.waves)]
+    assert requests and all("46026" in path for path in requests)
+    # nothing was saved, so we look for the month again next time
+    assert archive.get_index(46026, ArchiveProduct.stdmet) == {}
+
+    # a month well before realtime2's reach doesn't fall back
+    old_time = rep_time - timedelta(days=90)
+    with pytest.raises(ValueError):
+        asyncio.run(
+            run(lambda session: buoys._get_station_report(
+                session, 46026, 46026, buoys.NDBCDataTypes.waves, old_time
+            ))
+        )
+    assert len(realtime_calls) == 1
@@ -1,4 +1,15 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from aiohttp import ClientSession, web
+from aiohttp.test_utils import TestServer
+from surf_data import FetchConfig
 from surf_data.lib import buoys
+from surf_data.lib.http_cache import ResponseCache
+from surf_data.lib.record_helpers import DataPoint
+from surf_data.lib.station_health import StationHealthRegistry
+from surf_data.lib.time_helpers import UTC_TIME_ZONE
 
 
 mock_ndbc_weather_report = (
@@ -78,53 +89,274 @@ def test_parse_report_header():
 
 
 def test_parse_raw_weather_report():
-    expected_report = buoys.RawWeatherReport(
+    header, units = mock_ndbc_weather_report.splitlines()[:2]
+    unit = dict(
+        zip(buoys.parse_report_header(header), buoys.parse_report_header(units))
+    )
+    expected_report = buoys.RawReport(
         report_records=[
             buoys.RawWeatherRecord(
-                YY="2022",
-                MM="09",
-                DD="04",
-                hh="19",
-                mm="00",
-                WDIR="175",
-                WSPD="3.5",
-                GST="4.5",
-                WVHT=None,
-                DPD=None,
-                APD=None,
-                MWD=None,
-                PRES="1013.5",
-                ATMP="24.9",
-                WTMP="26.5",
-                DEWP=None,
-                VIS=None,
-                PTDY=None,
-                TIDE=None,
+                YY=DataPoint("2022", unit["YY"]),
+                MM=DataPoint("09", unit["MM"]),
+                DD=DataPoint("04", unit["DD"]),
+                hh=DataPoint("19", unit["hh"]),
+                mm=DataPoint("00", unit["mm"]),
+                WDIR=DataPoint("175", unit["WDIR"]),
+                WSPD=DataPoint("3.5", unit["WSPD"]),
+                GST=DataPoint("4.5", unit["GST"]),
+                PRES=DataPoint("1013.5", unit["PRES"]),
+                ATMP=DataPoint("24.9", unit["ATMP"]),
+                WTMP=DataPoint("26.5", unit["WTMP"]),
             ),
             buoys.RawWeatherRecord(
-                YY="2022",
-                MM="09",
-                DD="04",
-                hh="18",
-                mm="00",
-                WDIR="183",
-                WSPD="3.6",
-                GST="4.9",
-                WVHT=None,
-                DPD=None,
-                APD=None,
-                MWD=None,
-                PRES="1013.6",
-                ATMP="25.3",
-                WTMP="26.5",
-                DEWP=None,
-                VIS=None,
-                PTDY=None,
-                TIDE=None,
+                YY=DataPoint("2022", unit["YY"]),
+                MM=DataPoint("09", unit["MM"]),
+                DD=DataPoint("04", unit["DD"]),
+                hh=DataPoint("18", unit["hh"]),
+                mm=DataPoint("00", unit["mm"]),
+                WDIR=DataPoint("183", unit["WDIR"]),
+                WSPD=DataPoint("3.6", unit["WSPD"]),
+                GST=DataPoint("4.9", unit["GST"]),
+                PRES=DataPoint("1013.6", unit["PRES"]),
+                ATMP=DataPoint("25.3", unit["ATMP"]),
+                WTMP=DataPoint("26.5", unit["WTMP"]),
             ),
         ]
     )
     input_weather_report = "\n".join(mock_ndbc_weather_report.splitlines()[:4])
     assert (
-        buoys.RawWeatherReport.from_raw_report(input_weather_report) == expected_report
+        buoys.RawReport.from_raw_report(input_weather_report, buoys.RawWeatherRecord)
+        == expected_report
     )
+
+
+def test_parse_columnar_report():
+    report = buoys.ColumnarReport.from_raw_report(mock_ndbc_wave_report)
+    assert len(report) == 10
+    assert report.columns["WVHT"].dtype == np.float64
+    assert report.columns["SwD"].dtype == np.int8
+    assert report.categories["SwD"][report.columns["SwD"][0]] == "WNW"
+    assert report.get_data_point("SwP", 0) == DataPoint("9.1", "sec")
+    assert report.get_data_point("MWD", 0) == DataPoint("292", "degT")
+    assert report.get_data_point("STEEPNESS", 2) == DataPoint("STEEP", "-")
+
+    weather = buoys.ColumnarReport.from_raw_report(mock_ndbc_weather_report)
+    assert np.isnan(weather.columns["WVHT"]).all()
+    assert weather.get_data_point("WVHT", 0) is None
+
+
+def test_columnar_row_matches_raw_record():
+    raw = buoys.RawReport.from_raw_report(mock_ndbc_wave_report, buoys.RawWaveRecord)
+    columnar = buoys.ColumnarReport.from_raw_report(mock_ndbc_wave_report)
+    from_raw = buoys.ConditionReport(station_id=1)
+    from_raw.parse_raw_record_data(raw.report_records[3])
+    from_columnar = buoys.ConditionReport(station_id=1)
+    from_columnar.parse_columnar_row(columnar, 3)
+    assert from_raw == from_columnar
+
+
+def test_get_closest_record():
+    report = buoys.ColumnarReport.from_raw_report(mock_ndbc_wave_report)
+    desired_time = datetime(2022, 9, 4, 16, 30, tzinfo=UTC_TIME_ZONE)
+    assert buoys.get_closest_record(report, desired_time) == buoys.ClosestRecord(
+        row=3, previous_row=4, next_row=2, offset_seconds=600.0
+    )
+
+
+def test_get_closest_records_batch():
+    report = buoys.ColumnarReport.from_raw_report(mock_ndbc_wave_report)
+    desired_times = [
+        datetime(2022, 9, 4, 0, 0, tzinfo=UTC_TIME_ZONE),
+        datetime(2022, 9, 4, 18, 41, tzinfo=UTC_TIME_ZONE),
+        datetime(2022, 9, 5, 6, 0, tzinfo=UTC_TIME_ZONE),
+    ]
+    closest = buoys.get_closest_records(report, desired_times)
+    assert [c.row for c in closest] == [9, 2, 0]
+    assert closest[0].previous_row is None
+    assert closest[2].next_row is None
+
+
+def test_get_closest_record_out_of_order():
+    lines = mock_ndbc_wave_report.splitlines()
+    # swap a couple rows, the way NDBC sometimes does
+    lines[4], lines[5] = lines[5], lines[4]
+    report = buoys.ColumnarReport.from_raw_report("\n".join(lines))
+    desired_time = datetime(2022, 9, 4, 20, 30, tzinfo=UTC_TIME_ZONE)
+    assert buoys.get_closest_record(report, desired_time).row == 3
+
+
+def test_stream_station_report_stops_past_target():
+    async def serve_and_stream(desired_time):
+        async def report(request):
+            resp = web.StreamResponse()
+            await resp.prepare(request)
+            for line in mock_ndbc_wave_report.splitlines(keepends=True):
+                await resp.write(line.encode())
+            return resp
+
+        app = web.Application()
+        app.router.add_get("/46026.spec", report)
+        async with TestServer(app) as server:
+            async with ClientSession(raise_for_status=True) as session:
+                report = await buoys._stream_station_report(
+                    session,
+                    str(server.make_url("/46026.spec")),
+                    desired_time,
+                    cache=ResponseCache(None, 1024 * 1024),
+                )
+        return report
+
+    desired_time = datetime(2022, 9, 4, 21, 20, tzinfo=UTC_TIME_ZONE)
+    report = asyncio.run(serve_and_stream(desired_time))
+    # 22:40 and 21:40 are after the target, then we read 3 more and stop
+    assert len(report) == 2 + buoys.STREAM_RECORDS_PAST_TARGET
+    assert buoys.get_closest_record(report, desired_time).row == 1
+
+
+def test_fetch_with_fallback_hedges_slow_station(monkeypatch):
+    monkeypatch.setattr(buoys, "STATION_HEALTH", StationHealthRegistry())
+    monkeypatch.setattr(FetchConfig, "HEDGE_DEFAULT_DELAY_SECONDS", 0.05)
+    fresh_report = time.strftime("%Y %m %d %H %M", time.gmtime()) + " 175\n"
+
+    async def fetch(station_id):
+        if station_id == 46012:
+            await asyncio.sleep(10)
+        return fresh_report
+
+    started = time.monotonic()
+    result = asyncio.run(
+        buoys._fetch_with_fallback(fetch, 46012, 46026, buoys.NDBCDataTypes.weather)
+    )
+    assert result == fresh_report
+    assert time.monotonic() - started < 1
+
+
+def test_get_station_data_for_times_skips_times_without_records(monkeypatch):
+    reports = {
+        buoys.NDBCDataTypes.weather: mock_ndbc_weather_report,
+        buoys.NDBCDataTypes.waves: mock_ndbc_wave_report,
+    }
+    fetched = []
+
+    async def get_station_report(session, station_id, fallback, report_type, rep_time):
+        fetched.append(report_type)
+        return buoys.ColumnarReport.from_raw_report(reports[report_type])
+
+    monkeypatch.setattr(buoys, "_get_station_report", get_station_report)
+    monkeypatch.setattr(FetchConfig, "RECORD_SELECTION", "closest")
+    monkeypatch.setattr(FetchConfig, "FETCH_SPECTRA", False)
+    spot = buoys.SurfSpotDetails(46237, 46026, 9414290, None)
+    times = [
+        datetime(2022, 9, 4, 16, 50, tzinfo=UTC_TIME_ZONE),
+        datetime(2022, 8, 1, tzinfo=UTC_TIME_ZONE),
+    ]
+    found, missing = asyncio.run(buoys.get_station_data_for_times(None, spot, times))
+    assert len(fetched) == 2
+    assert missing is None
+    assert found.wind_speed == DataPoint("4.0", "m/s")
+    assert found.swell_height == DataPoint("1.5", "m")
+
+
+def test_get_station_data_for_times_splits_at_realtime_edge(monkeypatch):
+    now = datetime.now(UTC_TIME_ZONE).replace(second=0, microsecond=0)
+    recent = now - timedelta(days=2)
+    old = now - timedelta(days=buoys.NDBCArchiveConfig.REALTIME_DAYS + 2)
+    fetched = []
+
+    async def get_station_report(session, station_id, fallback, report_type, rep_time):
+        fetched.append((report_type, rep_time))
+        column, unit, value = (
+            ("WSPD", "m/s", "4.0" if rep_time == recent else "9.0")
+            if report_type == buoys.NDBCDataTypes.weather
+            else ("WVHT", "m", "1.5")
+        )
+        return buoys.ColumnarReport.from_raw_report(
+            f"#YY  MM DD hh mm {column}\n#yr  mo dy hr mn {unit}\n"
+            f"{rep_time:%Y %m %d %H %M} {value}\n"
+        )
+
+    monkeypatch.setattr(buoys, "_get_station_report", get_station_report)
+    monkeypatch.setattr(FetchConfig, "RECORD_SELECTION", "closest")
+    monkeypatch.setattr(FetchConfig, "FETCH_SPECTRA", False)
+    spot = buoys.SurfSpotDetails(46237, 46026, 9414290, None)
+    newer, older = asyncio.run(
+        buoys.get_station_data_for_times(None, spot, [recent, old])
+    )
+    # each side of the edge got its own reports, so realtime2 still reads recent
+    assert sorted(rep_time for _, rep_time in fetched) == [old, old, recent, recent]
+    assert newer.wind_speed == DataPoint("4.0", "m/s")
+    assert older.wind_speed == DataPoint("9.0", "m/s")
+
+
+def test_interpolate_records():
+    report = buoys.ColumnarReport.from_raw_report(mock_ndbc_wave_report)
+    desired_times = [
+        datetime(2022, 9, 4, 21, 10, tzinfo=UTC_TIME_ZONE),
+        # 16:40 and 20:40 are too far apart to interpolate between
+        datetime(2022, 9, 4, 17, 10, tzinfo=UTC_TIME_ZONE),
+    ]
+    interpolated = buoys.interpolate_records(report, desired_times)
+    assert interpolated.values.shape == (2, len(report.numeric_columns))
+    assert [r.row for r in interpolated.closest_records] == [2, 3]
+    assert [r.offset_seconds for r in interpolated.closest_records] == [-1800.0, -1800.0]
+
+    halfway, too_far = [
+        dict(zip(report.numeric_columns, row)) for row in interpolated.values
+    ]
+    assert halfway["SwP"] == 8.0
+    assert halfway["WWH"] == 1.15
+    assert too_far["SwP"] == 9.1
+
+    conditions = buoys.ConditionReport(station_id=46026)
+    conditions.parse_interpolated_values(
+        report, interpolated.values[0], interpolated.closest_records[0]
+    )
+    assert conditions.swell_period == DataPoint("8.0", "sec")
+    # labels come from the closest record, which is the earlier one on a tie
+    assert conditions.swell_direction == DataPoint("NW", "-")
+
+
+def test_interpolate_records_goes_around_the_circle():
+    report = buoys.ColumnarReport.from_raw_report(
+        "#YY  MM DD hh mm WDIR WSPD\n"
+        "#yr  mo dy hr mn degT m/s\n"
+        "2022 09 04 18 00  20  6.0\n"
+        "2022 09 04 17 00 340  4.0\n"
+        "2022 09 04 16 00 350   MM\n"
+    )
+    desired_times = [
+        datetime(2022, 9, 4, 17, 30, tzinfo=UTC_TIME_ZONE),
+        datetime(2022, 9, 4, 16, 15, tzinfo=UTC_TIME_ZONE),
+    ]
+    (wdir, wspd), (early_wdir, early_wspd) = buoys.interpolate_records(
+        report, desired_times
+    ).values
+    assert np.isclose(wdir, 0)
+    assert wspd == 5.0
+    assert np.isclose(early_wdir, 347.5)
+    # a missing value on one side means we take the closest record's
+    assert np.isnan(early_wspd)
+
+
+def test_get_station_data_interpolates_between_records(monkeypatch):
+    reports = {
+        buoys.NDBCDataTypes.weather: mock_ndbc_weather_report,
+        buoys.NDBCDataTypes.waves: mock_ndbc_wave_report,
+    }
+
+    async def get_station_report(session, station_id, fallback, report_type, rep_time):
+        return buoys.ColumnarReport.from_raw_report(reports[report_type])
+
+    async def get_spectral_report(session, station, rep_time):
+        return None
+
+    monkeypatch.setattr(buoys, "_get_station_report", get_station_report)
+    monkeypatch.setattr(buoys, "_get_spectral_report", get_spectral_report)
+    spot = buoys.SurfSpotDetails(46237, 46026, 9414290, None)
+    rep_time = datetime(2022, 9, 4, 21, 25, tzinfo=UTC_TIME_ZONE)
+    conditions = asyncio.run(buoys.get_station_data(None, spot, rep_time))
+    # 19:00 is the newest weather record, so the wind comes from there
+    assert conditions.wind_speed == DataPoint("3.5", "m/s")
+    assert conditions.swell_height == DataPoint("1.6", "m")
+    assert conditions.wind_wave_height == DataPoint("1.2", "m")
+    assert conditions.record_offset_seconds == 2 * 60 * 60 + 25 * 60
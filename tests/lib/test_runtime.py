@@ -0,0 +1,63 @@
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from surf_data import RuntimeConfig
+from surf_data.lib.runtime import SurfDataRuntime
+
+
+async def get_session(session):
+    return session
+
+
+def test_runtime_reuses_loop_and_session():
+    runtime = SurfDataRuntime()
+    first_session = runtime.run(get_session)
+    first_loop = runtime.loop
+    assert runtime.run(get_session) is first_session
+    assert runtime.loop is first_loop
+    runtime.close()
+
+
+def test_runtime_rebuilds_session_after_idle(monkeypatch):
+    runtime = SurfDataRuntime()
+    first_session = runtime.run(get_session)
+    monkeypatch.setattr(RuntimeConfig, "IDLE_RESET_SECONDS", -1)
+    assert runtime.run(get_session) is not first_session
+    assert first_session.closed
+    runtime.close()
+
+
+def test_runtime_only_resends_the_request_on_a_stale_connection():
+    runtime = SurfDataRuntime()
+    requests = []
+    calls = []
+
+    async def report(request):
+        requests.append(request.path)
+        if requests.count(request.path) == 1 and request.path == "/waves":
+            # hang up without answering, like a connection that died while frozen
+            request.transport.close()
+        return web.Response(text=request.path)
+
+    async def start():
+        app = web.Application()
+        app.router.add_get("/{name}", report)
+        server = TestServer(app)
+        await server.start_server()
+        return server
+
+    server = runtime.loop.run_until_complete(start())
+
+    async def fetch_both(session):
+        calls.append(session)
+        results = []
+        for path in ("/weather", "/waves"):
+            async with session.get(server.make_url(path)) as response:
+                results.append(await response.text())
+        return results
+
+    assert runtime.run(fetch_both) == ["/weather", "/waves"]
+    # the weather report wasn't asked for again, and func only ran once
+    assert requests == ["/weather", "/waves", "/waves"]
+    assert len(calls) == 1
+    runtime.loop.run_until_complete(server.close())
+    runtime.close()
@@ -0,0 +1,59 @@
+import asyncio
+import pytest
+from surf_data.lib.single_flight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "report"
+
+    async def main():
+        flight = SingleFlight(result_ttl_seconds=60, max_results=10)
+        results = await asyncio.gather(
+            *(flight.do(("ndbc", 46237, 0), fetch) for _ in range(4)),
+            flight.do(("ndbc", 46026, 0), fetch),
+        )
+        # back to back callers get the result we just fetched
+        results.append(await flight.do(("ndbc", 46237, 0), fetch))
+        return results
+
+    assert asyncio.run(main()) == ["report"] * 6
+    assert len(calls) == 2
+
+
+def test_failures_are_not_shared_with_later_callers():
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        if len(calls) == 1:
+            raise ValueError("buoy is down")
+        return "report"
+
+    async def main():
+        flight = SingleFlight(result_ttl_seconds=60, max_results=10)
+        with pytest.raises(ValueError):
+            await flight.do("key", fetch)
+        return await flight.do("key", fetch)
+
+    assert asyncio.run(main()) == "report"
+
+
+def test_one_caller_timing_out_doesnt_cancel_the_fetch():
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return "report"
+
+    async def main():
+        flight = SingleFlight(result_ttl_seconds=60, max_results=10)
+        impatient = asyncio.wait_for(flight.do("key", fetch), timeout=0.01)
+        patient = flight.do("key", fetch)
+        return await asyncio.gather(impatient, patient, return_exceptions=True)
+
+    impatient, patient = asyncio.run(main())
+    assert isinstance(impatient, asyncio.TimeoutError)
+    assert patient == "report"
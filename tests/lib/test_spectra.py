@@ -0,0 +1,142 @@
+import asyncio
+from aiohttp import ClientSession, web
+from aiohttp.test_utils import TestServer
+import numpy as np
+from surf_data import SurfSpotDetails
+from surf_data.lib import buoys
+from surf_data.lib.http_cache import ResponseCache
+from surf_data.lib.record_helpers import DataPoint
+from surf_data.lib.single_flight import SINGLE_FLIGHT
+from surf_data.lib.station_health import StationHealthRegistry
+from surf_data.lib.time_helpers import get_current_time
+from surf_data.lib.spectra import SpectralReport, SwellPartition, partition_spectra
+
+
+FREQUENCIES = np.round(
+    np.r_[0.02, np.arange(0.0325, 0.1, 0.005), np.arange(0.1, 0.35, 0.01)], 4
+)
+
+
+def make_swell(frequency, height, width):
+    shape = np.exp(-0.5 * ((FREQUENCIES - frequency) / width) ** 2)
+    return shape / np.sum(shape * np.gradient(FREQUENCIES)) * (height / 4) ** 2
+
+
+def make_report(header, rows):
+    lines = [header]
+    for time, values in rows:
+        cells = " ".join(f"{v:.3f} ({f:.4f})" for v, f in zip(values, FREQUENCIES))
+        lines.append(f"{time} {cells}")
+    return "\n".join(lines) + "\n"
+
+
+# a long period south swell under a local northwest windswell
+density = make_swell(1 / 16, 0.8, 0.008) + make_swell(1 / 9, 2.0, 0.015)
+directions = np.where(FREQUENCIES < 0.085, 195.0, 300.0)
+directions[0] = 999.0
+
+mock_data_spec = make_report(
+    "#YY  MM DD hh mm Sep_Freq  < spec_1 (freq_1) spec_2 (freq_2) ... >",
+    [
+        ("2022 09 04 22 40 0.085", density),
+        ("2022 09 04 21 40 9.999", make_swell(1 / 12, 1.5, 0.01)),
+    ],
+)
+mock_swdir = make_report(
+    "#YY  MM DD hh mm alpha1_1 (freq_1) alpha1_2 (freq_2) ...",
+    [("2022 09 04 22 40", directions)],
+)
+
+
+def test_parse_spectral_report():
+    report = SpectralReport.from_raw_report(mock_data_spec)
+    assert report.values.shape == (2, len(FREQUENCIES))
+    np.testing.assert_allclose(report.frequencies, FREQUENCIES)
+    assert report.separation_frequencies[0] == 0.085
+    assert np.isnan(report.separation_frequencies[1])
+    # rows are newest first
+    assert report.sorted_rows.tolist() == [1, 0]
+
+    # records with a different set of bands get dropped
+    truncated = mock_data_spec + "2022 09 04 20 40 0.090 0.100 (0.0200)\n"
+    assert len(SpectralReport.from_raw_report(truncated)) == 2
+
+
+def test_partitions_pick_out_both_swells():
+    report = SpectralReport.from_raw_report(mock_data_spec).with_directions(
+        SpectralReport.from_raw_report(mock_swdir)
+    )
+    windswell_and_ground_swell, single_swell = report.get_partitions([0, 1])
+    assert windswell_and_ground_swell == (
+        SwellPartition(
+            DataPoint("2.0", "m"), DataPoint("9.1", "sec"), DataPoint("298", "degT")
+        ),
+        SwellPartition(
+            DataPoint("0.8", "m"), DataPoint("16.0", "sec"), DataPoint("195", "degT")
+        ),
+    )
+    # the 21:40 record has no direction record to go with it
+    # and its peak lands in the 0.0825 Hz band
+    assert single_swell == (
+        SwellPartition(DataPoint("1.5", "m"), DataPoint("12.1", "sec")),
+    )
+
+
+def test_partition_spectra_handles_many_records_at_once():
+    spectra = np.tile(density, (2000, 1))
+    heights, periods, _ = partition_spectra(spectra, FREQUENCIES, max_partitions=3)
+    assert heights.shape == periods.shape == (2000, 3)
+    np.testing.assert_allclose(heights[:, 0], 2.0, atol=0.05)
+    assert np.isnan(heights[:, 2]).all()
+
+
+def test_spectra_fall_back_as_a_pair(monkeypatch):
+    monkeypatch.setattr(buoys, "RESPONSE_CACHE", ResponseCache(None, 1024 * 1024))
+    monkeypatch.setattr(buoys, "STATION_HEALTH", StationHealthRegistry())
+    SINGLE_FLIGHT.clear()
+    files = {
+        # 46012 has densities but its directions are missing
+        "46012.data_spec": make_report(
+            "#YY  MM DD hh mm Sep_Freq  < spec_1 (freq_1) spec_2 (freq_2) ... >",
+            [("2022 09 04 22 40 0.085", make_swell(1 / 12, 1.5, 0.01))],
+        ),
+        "46026.data_spec": mock_data_spec,
+        "46026.swdir": mock_swdir,
+    }
+    hits = []
+
+    async def serve(request):
+        name = request.match_info["name"]
+        hits.append(name)
+        if name not in files:
+            raise web.HTTPNotFound()
+        return web.Response(text=files[name])
+
+    async def fetch():
+        app = web.Application()
+        app.router.add_get("/{name}", serve)
+        async with TestServer(app) as server:
+            monkeypatch.setattr(buoys, "NDBC_BASE_URL", str(server.make_url("/")))
+            async with ClientSession(raise_for_status=True) as session:
+                return await buoys._get_spectral_report(
+                    session,
+                    SurfSpotDetails(
+                        nbdc_buoy_id=46012,
+                        fallback_buoy_id=46026,
+                        noaa_tide_station_id=9414290,
+                        surfline_spot_id=None,
+                    ),
+                    get_current_time(),
+                )
+
+    report = asyncio.run(fetch())
+    SINGLE_FLIGHT.clear()
+    assert sorted(hits) == [
+        "46012.data_spec", "46012.swdir", "46026.data_spec", "46026.swdir",
+    ]
+    # both halves came from 46026
+    expected = SpectralReport.from_raw_report(mock_data_spec).with_directions(
+        SpectralReport.from_raw_report(mock_swdir)
+    )
+    np.testing.assert_array_equal(report.values, expected.values)
+    np.testing.assert_array_equal(report.directions, expected.directions)
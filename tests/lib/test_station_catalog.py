@@ -0,0 +1,121 @@
+import asyncio
+import json
+import pytest
+from surf_data import SPOT_MAPPING
+from surf_data.lib import station_catalog
+from surf_data.lib.station_catalog import (
+    SpotLocation,
+    StationCatalog,
+    StationIndex,
+    parse_ndbc_stations,
+    parse_noaa_stations,
+)
+
+
+mock_active_stations = b"""<?xml version="1.0" encoding="UTF-8"?>
+<stations created="2022-09-04T19:40:01UTC" count="7">
+<station id="46012" lat="37.363" lon="-122.881" name="HALF MOON BAY"
+  owner="NDBC" pgm="NDBC Meteorological/Ocean" type="buoy"
+  met="y" currents="n" waterquality="n" dart="n"/>
+<station id="46026" lat="37.754" lon="-122.839" name="SAN FRANCISCO"
+  owner="NDBC" pgm="NDBC Meteorological/Ocean" type="buoy"
+  met="y" currents="n" waterquality="n" dart="n"/>
+<station id="46237" lat="37.786" lon="-122.634" name="San Francisco Bar, CA"
+  owner="CDIP" pgm="IOOS Partners" type="buoy"
+  met="n" currents="n" waterquality="n" dart="n"/>
+<station id="46059" lat="38.094" lon="-129.951" name="WEST CALIFORNIA"
+  owner="NDBC" pgm="NDBC Meteorological/Ocean" type="buoy"
+  met="y" currents="n" waterquality="n" dart="n"/>
+<station id="46411" lat="39.333" lon="-127.007" name="MENDOCINO"
+  owner="NDBC" pgm="Tsunami" type="dart"
+  met="n" currents="n" waterquality="n" dart="y"/>
+<station id="46092" lat="36.751" lon="-122.029" name="MBM1 - Monterey Bay"
+  owner="MBARI" pgm="IOOS Partners" type="other"
+  met="y" currents="y" waterquality="y" dart="n"/>
+<station id="FTPC1" lat="37.806" lon="-122.465" name="San Francisco, CA"
+  owner="NOS" pgm="NOS/CO-OPS" type="fixed"
+  met="y" currents="n" waterquality="n" dart="n"/>
+</stations>
+"""
+
+mock_noaa_stations = json.dumps(
+    {
+        "count": 3,
+        "stations": [
+            {"id": "9414290", "name": "San Francisco", "lat": 37.806, "lng": -122.465},
+            {"id": "9413450", "name": "Monterey", "lat": 36.605, "lng": -121.888},
+            {"id": "9414575", "name": "Coyote Point", "lat": 37.592, "lng": -122.314},
+        ],
+    }
+).encode()
+
+
+@pytest.fixture
+def catalog(monkeypatch):
+    catalog = StationCatalog(
+        buoys=StationIndex(parse_ndbc_stations(mock_active_stations)),
+        tide_stations=StationIndex(parse_noaa_stations(mock_noaa_stations)),
+    )
+    monkeypatch.setattr(station_catalog, "_catalog", catalog)
+    return catalog
+
+
+def test_nearest_stations(catalog):
+    # 46237 only measures waves, so it's met="n", but it's the buoy we want.
+    # The DART buoy, the mooring and the C-MAN station aren't candidates.
+    assert [station.station_id for station in catalog.buoys.stations] == [
+        "46012", "46026", "46237", "46059",
+    ]
+    ocean_beach = (37.760, -122.511)
+    nearest = catalog.buoys.nearest(*ocean_beach, k=3)
+    assert [station.station_id for station, _ in nearest] == ["46237", "46026", "46012"]
+    # 46237 is about 11km offshore of Ocean Beach
+    assert 10 < nearest[0][1] < 12
+    (tide_station, _), = catalog.tide_stations.nearest(*ocean_beach)
+    assert tide_station.station_id == "9414290"
+
+
+def test_add_located_spots(catalog, monkeypatch, tmp_path):
+    monkeypatch.setattr(station_catalog, "SPOT_MAPPING", dict(SPOT_MAPPING))
+    path = tmp_path / "spots.json"
+    path.write_text(
+        json.dumps(
+            {
+                "Linda Mar": {"lat": 37.594, "lon": -122.504},
+                "Ocean Beach": {"lat": 0.0, "lon": 0.0},
+            }
+        )
+    )
+    locations = station_catalog.load_spot_locations(str(path))
+    assert locations["Linda Mar"] == SpotLocation(37.594, -122.504)
+
+    added = asyncio.run(station_catalog.add_located_spots(None, locations))
+    # Ocean Beach was already defined, so it keeps its stations
+    assert list(added) == ["Linda Mar"]
+    linda_mar = station_catalog.SPOT_MAPPING["Linda Mar"]
+    assert (linda_mar.nbdc_buoy_id, linda_mar.fallback_buoy_id) == (46237, 46026)
+    assert linda_mar.noaa_tide_station_id == 9414575
+    assert station_catalog.SPOT_MAPPING["Ocean Beach"] == SPOT_MAPPING["Ocean Beach"]
+
+
+def test_carry_on_without_located_spots(monkeypatch, tmp_path):
+    monkeypatch.setattr(station_catalog, "SPOT_MAPPING", dict(SPOT_MAPPING))
+    monkeypatch.setattr(station_catalog, "_located_spots_added", False)
+    monkeypatch.setattr(station_catalog, "_located_spots_failed_at", None)
+    path = tmp_path / "spots.json"
+    path.write_text(json.dumps({"Linda Mar": {"lat": 37.594, "lon": -122.504}}))
+    monkeypatch.setattr(
+        station_catalog.StationCatalogConfig, "SPOT_LOCATIONS_FILE", str(path)
+    )
+    calls = []
+
+    def unreachable(func):
+        calls.append(func)
+        raise asyncio.TimeoutError()
+
+    monkeypatch.setattr(station_catalog.RUNTIME, "run", unreachable)
+    station_catalog.ensure_located_spots()
+    assert "Linda Mar" not in station_catalog.SPOT_MAPPING
+    # and we don't try again straight away
+    station_catalog.ensure_located_spots()
+    assert len(calls) == 1
@@ -0,0 +1,134 @@
+import asyncio
+import time
+import pytest
+from aiohttp import ClientSession, web
+from aiohttp.test_utils import TestServer
+from surf_data import StationHealthConfig
+from surf_data.lib import buoys, http_cache
+from surf_data.lib.station_health import (
+    CircuitState,
+    StationHealth,
+    StationHealthRegistry,
+)
+
+
+def test_circuit_opens_after_repeated_failures():
+    registry = StationHealthRegistry()
+    for _ in range(StationHealthConfig.FAILURE_THRESHOLD):
+        registry.record_failure(46012)
+    assert registry.get(46012).state == CircuitState.open
+    assert registry.order_stations([46012, 46026]) == [46026]
+
+
+def test_open_circuit_gets_probed(monkeypatch):
+    registry = StationHealthRegistry()
+    for _ in range(StationHealthConfig.FAILURE_THRESHOLD):
+        registry.record_failure(46012)
+    monkeypatch.setattr(StationHealthConfig, "PROBE_INTERVAL_SECONDS", 0)
+    assert registry.should_try(46012)
+    assert registry.record_success(46012, newest_record_age=60)
+    assert registry.get(46012).state == CircuitState.closed
+
+
+def test_stale_data_counts_as_failure():
+    registry = StationHealthRegistry()
+    stale_age = StationHealthConfig.STALE_AFTER_SECONDS + 1
+    assert not registry.record_success(46012, newest_record_age=stale_age)
+    assert registry.get(46012).consecutive_failures == 1
+
+
+def test_station_health_round_trips_through_database_item():
+    health = StationHealth(station_id=46026, consecutive_failures=1, opened_at=12.5)
+    health.add_latency("waves", 0.25)
+    health.add_latency("waves", 0.5)
+    restored = StationHealth.from_database_item(health.serialize_for_database())
+    assert restored.opened_at == 12.5
+    assert list(restored.latencies["waves"]) == [0.25, 0.5]
+    assert restored.latency_percentile("weather", 90) is None
+
+
+def test_fetch_skips_dead_station(monkeypatch):
+    registry = StationHealthRegistry()
+    monkeypatch.setattr(buoys, "STATION_HEALTH", registry)
+    for _ in range(StationHealthConfig.FAILURE_THRESHOLD):
+        registry.record_failure(46012)
+    fresh_line = time.strftime("%Y %m %d %H %M", time.gmtime()) + " 175 3.5\n"
+    hits = []
+
+    async def report(request):
+        hits.append(request.path)
+        return web.Response(text="#YY MM DD hh mm WDIR WSPD\n" + fresh_line)
+
+    async def fetch():
+        app = web.Application()
+        app.router.add_get("/{name}", report)
+        async with TestServer(app) as server:
+            monkeypatch.setattr(buoys, "NDBC_BASE_URL", str(server.make_url("/")))
+            async with ClientSession(raise_for_status=True) as session:
+
+                async def get_text(station_id):
+                    url = buoys._get_station_url(station_id, buoys.NDBCDataTypes.weather)
+                    async with session.get(url) as resp:
+                        return await resp.text()
+
+                return await buoys._fetch_with_fallback(
+                    get_text, 46012, 46026, buoys.NDBCDataTypes.weather
+                )
+
+    assert asyncio.run(fetch()).endswith(fresh_line)
+    assert hits == ["/46026.txt"]
+
+
+def test_fetch_falls_back_on_error(monkeypatch):
+    registry = StationHealthRegistry()
+    monkeypatch.setattr(buoys, "STATION_HEALTH", registry)
+
+    async def fetch(station_id):
+        raise asyncio.TimeoutError()
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(
+            buoys._fetch_with_fallback(fetch, 46012, 46026, buoys.NDBCDataTypes.weather)
+        )
+    assert registry.get(46012).consecutive_failures == 1
+    assert registry.get(46026).consecutive_failures == 1
+
+
+def test_latency_only_counts_full_responses(monkeypatch):
+    registry = StationHealthRegistry()
+    monkeypatch.setattr(buoys, "STATION_HEALTH", registry)
+    fresh_report = time.strftime("%Y %m %d %H %M", time.gmtime()) + " 175\n"
+
+    async def fetch(station_id):
+        if station_id == 46026:
+            http_cache.note_full_response("46026.txt")
+        return fresh_report
+
+    for station_id in (46012, 46026):
+        asyncio.run(
+            buoys._fetch_with_fallback(
+                fetch, station_id, station_id, buoys.NDBCDataTypes.weather
+            )
+        )
+    # 46012 came out of the cache, so it says nothing about how fast it is
+    assert registry.get(46012).latencies == {}
+    assert len(registry.get(46026).latencies["weather"]) == 1
+    assert registry.get(46026).latency_percentile("waves", 90) is None
+
+
+def test_spectra_stay_out_of_the_circuit(monkeypatch):
+    registry = StationHealthRegistry()
+    monkeypatch.setattr(buoys, "STATION_HEALTH", registry)
+
+    async def fetch(station_id):
+        raise asyncio.TimeoutError()
+
+    for _ in range(StationHealthConfig.FAILURE_THRESHOLD):
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(
+                buoys._fetch_with_fallback(
+                    fetch, 46012, 46026, buoys.NDBCDataTypes.spectral_density
+                )
+            )
+    assert registry.get(46012).consecutive_failures == 0
+    assert registry.get(46012).state == CircuitState.closed
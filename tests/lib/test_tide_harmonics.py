@@ -0,0 +1,62 @@
+from datetime import datetime
+import numpy as np
+from surf_data.lib.tide_harmonics import CONSTITUENT_ARGUMENTS, TideHarmonics
+from surf_data.lib.time_helpers import UTC_TIME_ZONE
+
+
+# degrees per hour, as published by NOAA
+NOAA_SPEEDS = {
+    "M2": 28.984104,
+    "S2": 30.0,
+    "N2": 28.43973,
+    "K1": 15.041069,
+    "O1": 13.943035,
+    "P1": 14.958931,
+    "Q1": 13.398661,
+    "K2": 30.082138,
+    "L2": 29.528479,
+    "NU2": 28.512583,
+    "MK3": 44.025173,
+    "2MK3": 42.92714,
+    "MS4": 58.984104,
+    "J1": 15.585443,
+    "MF": 1.098033,
+    "T2": 29.958933,
+}
+# how fast each astronomical argument advances, in degrees per hour
+ARGUMENT_SPEEDS = np.array(
+    [15.0, 0.5490165, 0.0410686, 0.0046418, -0.0022064, 0.0000020, 0.0]
+)
+
+mock_harcon = {
+    "HarmonicConstituents": [
+        {"name": "M2", "amplitude": 1.8, "phase_GMT": 190.0, "speed": 28.984104},
+        {"name": "K1", "amplitude": 1.2, "phase_GMT": 105.0, "speed": 15.041069},
+        {"name": "Sa", "amplitude": 0.2, "phase_GMT": 200.0, "speed": 0.041069},
+        {"name": "M10", "amplitude": 0.01, "phase_GMT": 20.0, "speed": 144.92},
+    ]
+}
+mock_datums = {"datums": [{"name": "MLLW", "value": 4.0}, {"name": "MSL", "value": 7.0}]}
+
+
+def test_constituent_arguments_match_noaa_speeds():
+    for name, speed in NOAA_SPEEDS.items():
+        computed_speed = np.dot(CONSTITUENT_ARGUMENTS[name], ARGUMENT_SPEEDS)
+        assert abs(computed_speed - speed) < 1e-4, name
+
+
+def test_from_noaa_skips_unknown_constituents():
+    harmonics = TideHarmonics.from_noaa(9414290, mock_harcon, mock_datums)
+    assert harmonics.names == ("M2", "K1", "SA")
+    assert harmonics.msl_above_mllw == 3.0
+
+
+def test_predicted_rate_is_derivative_of_level():
+    harmonics = TideHarmonics.from_noaa(9414290, mock_harcon, mock_datums)
+    start = datetime(2022, 9, 10, 17, tzinfo=UTC_TIME_ZONE).timestamp()
+    epochs = start + np.arange(0, 6 * 3600, 60)
+    levels, rates = harmonics.predict(epochs)
+    finite_difference = np.gradient(levels, epochs / 3600)
+    assert np.allclose(rates[1:-1], finite_difference[1:-1], atol=1e-3)
+    # M2 + K1 + Sa can't stray further than their amplitudes from mean sea level
+    assert np.all(np.abs(levels - 3.0) <= 1.8 * 1.04 + 1.2 * 1.13 + 0.2)
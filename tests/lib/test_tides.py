@@ -0,0 +1,175 @@
+import asyncio
+from datetime import datetime
+import numpy as np
+import pytest
+from surf_data import TideConfig
+from surf_data.lib import tides
+from surf_data.lib.tides import (
+    HIGH,
+    LOW,
+    TideData,
+    TideEvent,
+    TideSeries,
+    TideSeriesStore,
+)
+from surf_data.lib.single_flight import SINGLE_FLIGHT
+from surf_data.lib.time_helpers import UTC_TIME_ZONE
+
+
+@pytest.fixture(autouse=True)
+def forget_shared_results():
+    SINGLE_FLIGHT.clear()
+
+
+def sine_series(station_id, start, end, step):
+    epochs = np.arange(start, end + step, step, dtype=np.float64)
+    levels = 3 + 2 * np.sin(epochs / 20000)
+    return TideSeries.from_samples(station_id, epochs, levels)
+
+
+def test_tide_series_interpolates_between_hourly_samples():
+    series = sine_series(1, 0, 48 * 3600, 3600)
+    times = np.array([1800.0, 7 * 3600 + 1234, 30 * 3600])
+    levels, rates = series.interpolate(times)
+    assert np.allclose(levels, 3 + 2 * np.sin(times / 20000), atol=0.01)
+    expected_rates = 2 / 20000 * np.cos(times / 20000) * 3600
+    assert np.allclose(rates, expected_rates, atol=0.01)
+
+
+def test_tide_series_refuses_times_it_doesnt_cover():
+    series = sine_series(1, 0, 3600 * 4, 3600)
+    with pytest.raises(ValueError):
+        series.interpolate(np.array([3600 * 5.0]))
+
+
+def test_tide_series_from_noaa_predictions():
+    resp = {
+        "predictions": [
+            {"t": "2023-01-01 00:00", "v": "1.0"},
+            {"t": "2023-01-01 01:00", "v": "2.0"},
+            {"t": "2023-01-01 02:00", "v": "3.0"},
+        ]
+    }
+    series = TideSeries.from_noaa_predictions(1, resp)
+    start = datetime(2023, 1, 1, tzinfo=UTC_TIME_ZONE).timestamp()
+    levels, rates = series.interpolate(np.array([start + 5400]))
+    assert levels[0] == pytest.approx(2.5)
+    assert rates[0] == pytest.approx(1.0)
+
+
+def test_store_fetches_each_month_once(monkeypatch):
+    fetched = []
+
+    async def fake_fetch(session, station_id, start, end):
+        fetched.append((start, end))
+        return sine_series(station_id, start.timestamp(), end.timestamp(), 3600)
+
+    monkeypatch.setattr(TideConfig, "PREDICTION_SOURCE", "noaa")
+    monkeypatch.setattr(tides, "_fetch_noaa_month", fake_fetch)
+    store = TideSeriesStore()
+    times = [
+        datetime(2023, 1, 31, 23, 30, tzinfo=UTC_TIME_ZONE).timestamp(),
+        datetime(2023, 1, 2, tzinfo=UTC_TIME_ZONE).timestamp(),
+        datetime(2023, 2, 1, 0, 30, tzinfo=UTC_TIME_ZONE).timestamp(),
+    ]
+    levels, _ = asyncio.run(store.predict(None, 1, times))
+    asyncio.run(store.predict(None, 1, times[:1]))
+    assert len(fetched) == 2
+    # each block reaches a day into the neighbouring months
+    assert fetched[0][0] == datetime(2022, 12, 31, tzinfo=UTC_TIME_ZONE)
+    assert np.allclose(levels, 3 + 2 * np.sin(np.array(times) / 20000), atol=0.01)
+
+
+def test_store_takes_a_token_per_month_from_noaa(monkeypatch):
+    async def fake_fetch(session, station_id, start, end):
+        return sine_series(station_id, start.timestamp(), end.timestamp(), 3600)
+
+    class CountingBucket:
+        acquired = 0
+
+        async def acquire(self):
+            self.acquired += 1
+
+    monkeypatch.setattr(TideConfig, "PREDICTION_SOURCE", "noaa")
+    monkeypatch.setattr(tides, "_fetch_noaa_month", fake_fetch)
+    store = TideSeriesStore()
+    bucket = CountingBucket()
+    times = [
+        datetime(2023, month, 15, tzinfo=UTC_TIME_ZONE).timestamp()
+        for month in (1, 2, 2, 3)
+    ]
+    asyncio.run(store.predict(None, 1, times, bucket))
+    asyncio.run(store.predict(None, 1, times, bucket))
+    # three months, and the second time they're all in memory
+    assert bucket.acquired == 3
+
+
+def test_store_drops_least_recently_used_months(monkeypatch):
+    async def fake_fetch(session, station_id, start, end):
+        return sine_series(station_id, start.timestamp(), end.timestamp(), 3600)
+
+    monkeypatch.setattr(TideConfig, "PREDICTION_SOURCE", "noaa")
+    monkeypatch.setattr(TideConfig, "MAX_CACHED_MONTHS", 2)
+    monkeypatch.setattr(tides, "_fetch_noaa_month", fake_fetch)
+    store = TideSeriesStore()
+    for month_index in (600, 601, 600, 602):
+        asyncio.run(store.get_month(None, 1, month_index))
+    assert list(store._months) == [(1, 600), (1, 602)]
+
+
+def test_extrema_land_on_the_turns_of_the_tide():
+    # sin(t / 20000) peaks at 20000 * pi / 2 and bottoms out at 20000 * 3 * pi / 2
+    series = sine_series(1, 0, 48 * 3600, 3600)
+    extrema = series.extrema
+    assert list(extrema.is_high[:2]) == [True, False]
+    assert extrema.epochs[0] == pytest.approx(20000 * np.pi / 2, abs=30)
+    assert extrema.epochs[1] == pytest.approx(20000 * 3 * np.pi / 2, abs=30)
+    assert extrema.levels[0] == pytest.approx(5, abs=0.01)
+    assert extrema.levels[1] == pytest.approx(1, abs=0.01)
+
+
+def test_next_and_previous_events():
+    extrema = sine_series(1, 0, 48 * 3600, 3600).extrema
+    high_epoch, low_epoch = extrema.epochs[0], extrema.epochs[1]
+    assert extrema.next_event(0).kind == HIGH
+    assert extrema.next_event(0, LOW).time.timestamp() == pytest.approx(low_epoch)
+    previous_high = extrema.previous_event(low_epoch + 1, HIGH)
+    assert previous_high.height == pytest.approx(5, abs=0.01)
+    assert extrema.previous_event(high_epoch - 1) is None
+    with pytest.raises(ValueError):
+        extrema.next_event(0, "slack")
+
+
+def test_store_looks_in_the_next_month_for_events(monkeypatch):
+    fetched = []
+
+    async def fake_fetch(session, station_id, start, end):
+        fetched.append(start)
+        epochs = np.arange(start.timestamp(), end.timestamp() + 3600, 3600)
+        # a slow tide, so there's no high between here and the end of the padding
+        return TideSeries.from_samples(station_id, epochs, np.sin(epochs / 200000))
+
+    monkeypatch.setattr(TideConfig, "PREDICTION_SOURCE", "noaa")
+    monkeypatch.setattr(tides, "_fetch_noaa_month", fake_fetch)
+    store = TideSeriesStore()
+    epoch = datetime(2023, 2, 1, tzinfo=UTC_TIME_ZONE).timestamp() - 60
+    event = asyncio.run(store.next_event(None, 1, epoch, HIGH))
+    period = 2 * np.pi * 200000
+    first_high = 200000 * np.pi / 2
+    expected = first_high + np.ceil((epoch - first_high) / period) * period
+    assert event.time.timestamp() == pytest.approx(expected, abs=60)
+    assert len(fetched) == 2
+
+
+def test_tide_report_mentions_upcoming_tides():
+    tide = TideData(
+        "3.1",
+        "-0.4",
+        next_high=TideEvent(HIGH, datetime(2023, 1, 1, 20, tzinfo=UTC_TIME_ZONE), 5.23),
+        next_low=TideEvent(LOW, datetime(2023, 1, 1, 18, tzinfo=UTC_TIME_ZONE), 0.51),
+    )
+    report = tide.serialize_for_alexa()
+    assert report.endswith(
+        "The next low tide is 0.5 feet at 10:00 AM. "
+        "The next high tide is 5.2 feet at 12:00 PM. "
+    )
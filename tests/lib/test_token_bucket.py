@@ -0,0 +1,25 @@
+import asyncio
+import time
+import pytest
+from surf_data.lib.token_bucket import TokenBucket
+
+
+def test_token_bucket_allows_a_burst_then_limits_the_rate():
+    bucket = TokenBucket(rate=50, capacity=5)
+
+    async def acquire_all(n):
+        for _ in range(n):
+            await bucket.acquire()
+
+    started = time.monotonic()
+    asyncio.run(acquire_all(5))
+    assert time.monotonic() - started < 0.05
+    started = time.monotonic()
+    asyncio.run(acquire_all(5))
+    # 5 more tokens at 50 a second
+    assert time.monotonic() - started >= 0.09
+
+
+def test_token_bucket_rejects_bad_settings():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0, capacity=5)
@@ -0,0 +1,74 @@
+import subprocess
+import sys
+from ask_sdk_core.handler_input import HandlerInput
+from ask_sdk_model import Intent, IntentRequest, LaunchRequest, RequestEnvelope
+from surf_data.alexa_handlers.lazy_registry import (
+    HANDLER_MODULES,
+    LazyRequestHandler,
+    get_registered_handlers,
+    load_handler_class,
+)
+
+
+# What importing the entrypoint may cost on top of the ask sdk itself.
+# It was around 10ms with lazy handlers and 430ms without.
+IMPORT_BUDGET_SECONDS = 0.1
+# None of these should get imported until a handler that needs them runs
+HEAVY_MODULES = ("boto3", "aiohttp", "numpy", "surf_data.log_entry")
+IMPORT_SCRIPT = """
+import sys
+import ask_sdk_core.skill_builder, ask_sdk_core.utils, ask_sdk_core.dispatch_components
+import surf_data.alexa_entrypoint
+print(",".join(name for name in {heavy_modules!r} if name in sys.modules))
+"""
+
+
+def import_entrypoint():
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            IMPORT_SCRIPT.format(heavy_modules=HEAVY_MODULES),
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    entrypoint_line = next(
+        line
+        for line in result.stderr.splitlines()
+        if line.rstrip().endswith("| surf_data.alexa_entrypoint")
+    )
+    cumulative_microseconds = int(entrypoint_line.split("|")[1])
+    return result.stdout.strip(), cumulative_microseconds / 1e6
+
+
+def test_entrypoint_import_stays_cheap():
+    loaded_heavy_modules, import_seconds = import_entrypoint()
+    assert loaded_heavy_modules == ""
+    assert import_seconds < IMPORT_BUDGET_SECONDS
+
+
+def make_handler_input(request) -> HandlerInput:
+    return HandlerInput(request_envelope=RequestEnvelope(request=request))
+
+
+def test_requests_get_routed_to_their_handlers():
+    handler = LazyRequestHandler()
+    route = handler._get_handler_name
+    assert route(make_handler_input(LaunchRequest())) == "LaunchRequestHandler"
+    for intent_name, expected in (
+        ("get_conditions", "GetConditionsHandler"),
+        ("AMAZON.StopIntent", "CancelOrStopIntentHandler"),
+        ("something_new", "IntentReflectorHandler"),
+    ):
+        request = IntentRequest(intent=Intent(name=intent_name))
+        assert route(make_handler_input(request)) == expected
+
+
+def test_every_registered_handler_can_be_loaded():
+    for class_name in (*get_registered_handlers(), "CatchAllExceptionHandler"):
+        assert class_name in HANDLER_MODULES
+        assert load_handler_class(class_name).__name__ == class_name
@@ -0,0 +1,104 @@
+import asyncio
+from datetime import datetime
+from surf_data import Spots
+from surf_data import bulk_import
+from surf_data.backfill import backfill
+from surf_data.lib.buoys import ConditionReport
+from surf_data.lib.record_helpers import DataPoint
+from surf_data.lib.tides import TideData
+from surf_data.lib.token_bucket import TokenBucket
+from surf_data.lib.time_helpers import ensure_timezone
+from surf_data.log_entry import EnrichmentStatus, LogEntry
+
+
+class FakeDB:
+    """
+    Hands out each spot's items one per page, and records the updates.
+    """
+
+    def __init__(self, items):
+        self.items = items
+        self.updates = {}
+
+    async def query_spot(self, spot_name, page_size):
+        for item in self.items:
+            if item["spot_name"] == spot_name:
+                yield [item]
+
+    async def update_entry(self, key, attributes, remove):
+        self.updates[key["entry_date"]] = (attributes, remove)
+
+
+def make_item(entry_date, **kwargs):
+    entry = LogEntry(
+        entry_date=ensure_timezone(datetime.fromisoformat(entry_date)),
+        spot_name=Spots.pacifica.value,
+        rating="fair",
+        notes="ok",
+        **kwargs,
+    )
+    return entry.serialize_for_database()["Item"]
+
+
+def test_backfill_fetches_only_what_entries_are_missing(monkeypatch):
+    buoy_calls = []
+    tide_calls = []
+
+    async def get_station_data_for_times(session, spot, times):
+        buoy_calls.append(len(times))
+        return [ConditionReport(station_id=spot.nbdc_buoy_id) for _ in times]
+
+    async def get_tide_data_for_times(session, spot, times, rate_limit=None):
+        tide_calls.append(len(times))
+        return [TideData("3.0", "0.5") for _ in times]
+
+    monkeypatch.setattr(
+        bulk_import, "get_station_data_for_times", get_station_data_for_times
+    )
+    monkeypatch.setattr(bulk_import, "get_tide_data_for_times", get_tide_data_for_times)
+    conditions = ConditionReport(station_id=46026, wind_speed=DataPoint("4.0", "m/s"))
+    tide = TideData("2.0", "0.1")
+    legacy_item = {
+        "spot_name": Spots.pacifica.value,
+        "entry_date": "2021-01-05 08:00:00",
+        "rating": "good",
+        "notes": "old",
+        "station_id": 46026,
+        "wind_speed": {"measure": "4.0", "unit": "m/s"},
+        "wind_gust": None,
+        "tide_height": "2.0",
+        "tide_rate_of_change": "0.1",
+    }
+    db = FakeDB(
+        [
+            make_item("2021-03-01T08:00:00", wind_and_waves=conditions, tides=tide),
+            make_item(
+                "2021-03-02T08:00:00",
+                wind_and_waves=conditions,
+                enrichment_status=EnrichmentStatus.failed,
+                enrichment_attempts=8,
+            ),
+            make_item("2021-03-03T08:00:00"),
+            legacy_item,
+        ]
+    )
+    summary = asyncio.run(
+        backfill(None, db, [Spots.pacifica.value], TokenBucket(100, 10))
+    )
+    assert (summary.scanned, summary.selected, summary.complete) == (4, 3, 3)
+    # the complete entry is left alone, and the legacy one needed no fetches
+    assert "2021-03-01 08:00:00" not in db.updates
+    assert buoy_calls == [1]
+    assert tide_calls == [2]
+
+    attributes, remove = db.updates["2021-03-02 08:00:00"]
+    assert attributes["tide_ft"] is not None
+    assert attributes["enrichment_status"] == EnrichmentStatus.done.value
+    assert remove == ["enrich_after"]
+
+    attributes, remove = db.updates["2021-01-05 08:00:00"]
+    assert attributes["v"] == 1
+    assert attributes["buoy"] == 46026
+    assert sorted(remove) == [
+        "station_id", "tide_height", "tide_rate_of_change", "wind_gust", "wind_speed"
+    ]
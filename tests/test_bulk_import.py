@@ -0,0 +1,106 @@
+import asyncio
+import json
+from datetime import datetime
+from surf_data import Spots
+from surf_data import bulk_import
+from surf_data.lib.buoys import ConditionReport
+from surf_data.lib.tides import TideData
+from surf_data.lib.time_helpers import UTC_TIME_ZONE
+from surf_data.log_entry import EnrichmentStatus
+
+
+class FakeDB:
+    def __init__(self):
+        self.items = []
+
+    async def batch_put(self, items, on_batch_written):
+        self.items.extend(items)
+        on_batch_written(len(items))
+
+
+def test_read_entries_from_csv_and_jsonl(tmp_path):
+    csv_path = tmp_path / "sessions.csv"
+    csv_path.write_text(
+        "spot_name,entry_date,rating,notes\n"
+        f"{Spots.ocean_beach.value},2022-09-10 17:00:00,fair,fun\n"
+    )
+    jsonl_path = tmp_path / "sessions.jsonl"
+    jsonl_path.write_text(
+        json.dumps(
+            {
+                "spot_name": Spots.pacifica.value,
+                "entry_date": "2021-03-02T07:30:00-08:00",
+                "rating": "good",
+                "notes": "glassy",
+            }
+        )
+        + "\n"
+    )
+    (from_csv,) = bulk_import.read_entries(str(csv_path))
+    (from_jsonl,) = bulk_import.read_entries(str(jsonl_path))
+    assert from_csv.key == {
+        "spot_name": Spots.ocean_beach.value,
+        "entry_date": "2022-09-10 17:00:00",
+    }
+    assert from_csv.entry_date.tzinfo is not None
+    assert from_jsonl.rating == "good"
+
+
+def test_dates_with_an_offset_are_stored_as_pacific_time():
+    entry = bulk_import.parse_entry(
+        {
+            "spot_name": Spots.ocean_beach.value,
+            "entry_date": "2022-09-10T17:00:00+00:00",
+            "rating": "fair",
+            "notes": "fun",
+        }
+    )
+    assert entry.key["entry_date"] == "2022-09-10 10:00:00"
+    assert entry.entry_date.timestamp() == datetime(
+        2022, 9, 10, 17, tzinfo=UTC_TIME_ZONE
+    ).timestamp()
+
+
+def test_import_groups_fetches_by_buoy_and_month(monkeypatch):
+    buoy_calls = []
+    tide_calls = []
+
+    async def get_station_data_for_times(session, spot, times):
+        buoy_calls.append((spot.nbdc_buoy_id, len(times)))
+        if spot.nbdc_buoy_id == 46237:
+            raise ValueError("buoy is down")
+        return [ConditionReport(station_id=spot.nbdc_buoy_id) for _ in times]
+
+    async def get_tide_data_for_times(session, spot, times, rate_limit=None):
+        tide_calls.append((spot.noaa_tide_station_id, len(times)))
+        return [TideData("3.0", "0.5") for _ in times]
+
+    monkeypatch.setattr(
+        bulk_import, "get_station_data_for_times", get_station_data_for_times
+    )
+    monkeypatch.setattr(bulk_import, "get_tide_data_for_times", get_tide_data_for_times)
+    entries = [
+        bulk_import.parse_entry(
+            {"spot_name": spot, "entry_date": date, "rating": "fair", "notes": "ok"}
+        )
+        for spot, date in (
+            (Spots.pacifica.value, "2022-09-10 17:00:00"),
+            (Spots.montara.value, "2022-09-20 08:00:00"),
+            (Spots.pacifica.value, "2022-10-01 08:00:00"),
+            # already October in UTC, which is how the archives are split up
+            (Spots.montara.value, "2022-09-30 20:00:00"),
+            (Spots.ocean_beach.value, "2022-09-11 08:00:00"),
+            # a duplicate of the first entry
+            (Spots.pacifica.value, "2022-09-10 17:00:00"),
+        )
+    ]
+    db = FakeDB()
+    progress = asyncio.run(bulk_import.import_entries(None, entries, db))
+    assert sorted(buoy_calls) == [(46012, 2), (46012, 3), (46237, 1)]
+    assert sorted(tide_calls) == [(9413450, 5), (9414290, 1)]
+    assert progress.written == len(db.items) == 5
+    ocean_beach = next(
+        item for item in db.items if item["spot_name"] == Spots.ocean_beach.value
+    )
+    assert ocean_beach["enrichment_status"] == EnrichmentStatus.pending.value
+    assert "tide_ft" in ocean_beach
@@ -0,0 +1,167 @@
+import asyncio
+from datetime import datetime
+import time
+import pytest
+from surf_data import EnrichmentConfig
+from surf_data import enrichment, get_data
+from surf_data.lib.buoys import ConditionReport
+from surf_data.lib.tides import TideData
+from surf_data.lib.time_helpers import PST_TIME_ZONE
+from surf_data.log_entry import EnrichmentStatus, LogEntry
+
+
+class FakeDB:
+    def __init__(self):
+        self.updates = []
+        self.table = None
+
+    async def update_entry(self, key, attributes):
+        self.updates.append(attributes)
+
+    async def get_entry(self, key):
+        return {**key, "rating": "fair", "notes": "fun", "enrichment_status": "pending"}
+
+
+def make_entry() -> LogEntry:
+    return LogEntry(
+        entry_date=datetime(2022, 9, 10, 17),
+        spot_name="Ocean Beach",
+        rating="fair",
+        notes="fun",
+        enrichment_status=EnrichmentStatus.pending,
+    )
+
+
+@pytest.fixture
+def spot_data(monkeypatch):
+    results = []
+
+    async def get_spot_data(spot_name, entry_date, session, deadline_seconds):
+        return results.pop(0)
+
+    monkeypatch.setattr(enrichment, "get_spot_data", get_spot_data)
+    return results
+
+
+def enrich(db, entry):
+    return asyncio.run(enrichment.enrich_entry(None, db, entry))
+
+
+def test_entries_get_enriched(spot_data):
+    spot_data.append((ConditionReport(station_id=46237), TideData("3.1", "0.2")))
+    db = FakeDB()
+    assert enrich(db, make_entry())
+    assert db.updates[0]["enrichment_status"] == "done"
+    assert db.updates[0]["buoy"] == 46237
+    assert str(db.updates[0]["tide_ft"]) == "3.1"
+
+
+def test_failed_enrichment_backs_off_then_gives_up(spot_data, monkeypatch):
+    monkeypatch.setattr(EnrichmentConfig, "MAX_ATTEMPTS", 3)
+    db = FakeDB()
+    entry = make_entry()
+    # the tide comes through on the first try, the buoy never does
+    spot_data.extend([(None, TideData("3.1", "0.2")), (None, None), (None, None)])
+    assert not enrich(db, entry)
+    assert not enrich(db, entry)
+    first_delay = db.updates[0]["enrich_after"]
+    second_delay = db.updates[1]["enrich_after"]
+    assert second_delay - first_delay >= EnrichmentConfig.BACKOFF_BASE_SECONDS * 2
+    # we keep the tide we did get
+    assert "tide_ft" in db.updates[1]
+    assert not enrich(db, entry)
+    assert db.updates[2]["enrichment_status"] == "failed"
+    assert db.updates[2]["enrichment_attempts"] == 3
+
+
+def test_get_backoff_seconds_is_capped():
+    assert enrichment.get_backoff_seconds(1) == EnrichmentConfig.BACKOFF_BASE_SECONDS * 2
+    assert enrichment.get_backoff_seconds(50) == EnrichmentConfig.BACKOFF_MAX_SECONDS
+
+
+def test_worker_looks_up_entries_in_pacific_time(monkeypatch):
+    # Lambda runs in UTC, which is what naive times would be read as
+    monkeypatch.setenv("TZ", "UTC")
+    time.tzset()
+    requested = []
+
+    async def get_station_data(session, spot, start_time):
+        requested.append(start_time)
+        return ConditionReport(station_id=spot.nbdc_buoy_id)
+
+    async def get_tide_data(session, spot, start_time):
+        requested.append(start_time)
+        return TideData("3.1", "0.2")
+
+    monkeypatch.setattr(get_data, "get_station_data", get_station_data)
+    monkeypatch.setattr(get_data, "get_tide_data", get_tide_data)
+    db = FakeDB()
+    key = {"spot_name": "Ocean Beach", "entry_date": "2022-09-10 17:00:00"}
+    try:
+        asyncio.run(enrichment._process_message(None, db, key))
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+    expected = datetime(2022, 9, 10, 17, tzinfo=PST_TIME_ZONE).timestamp()
+    assert [t.timestamp() for t in requested] == [expected, expected]
+    assert db.updates[0]["enrichment_status"] == "done"
+
+
+def test_early_messages_go_back_on_the_queue(spot_data, monkeypatch):
+    enrich_after = time.time() + 2 * 60 * 60
+    queued = []
+
+    async def get_entry(key):
+        return {
+            **key,
+            "rating": "fair",
+            "notes": "fun",
+            "enrichment_status": "pending",
+            "enrichment_attempts": 5,
+            "enrich_after": enrich_after,
+        }
+
+    monkeypatch.setattr(
+        enrichment,
+        "enqueue_enrichment",
+        lambda entry, delay_seconds=0: queued.append((entry.key, delay_seconds)),
+    )
+    db = FakeDB()
+    db.get_entry = get_entry
+    key = {"spot_name": "Ocean Beach", "entry_date": "2022-09-10 17:00:00"}
+    asyncio.run(enrichment._process_message(None, db, key))
+    # no fetch, no update, and the attempt isn't counted
+    assert db.updates == []
+    (queued_key, delay_seconds), = queued
+    assert queued_key == key
+    assert 2 * 60 * 60 - 5 < delay_seconds <= 2 * 60 * 60
+
+
+def test_sweep_carries_on_past_entries_that_fail(monkeypatch):
+    monkeypatch.setattr(EnrichmentConfig, "CONCURRENT_ENTRIES", 2)
+    entries = [make_entry() for _ in range(5)]
+    entries[1].notes = "explodes"
+    in_flight = []
+    most_in_flight = []
+
+    async def enrich_entry(session, db, entry):
+        in_flight.append(entry)
+        most_in_flight.append(len(in_flight))
+        await asyncio.sleep(0.01)
+        in_flight.remove(entry)
+        if entry.notes == "explodes":
+            raise ValueError("bad item")
+        return entry is not entries[2]
+
+    monkeypatch.setattr(enrichment, "ensure_located_spots", lambda: None)
+    monkeypatch.setattr(enrichment, "SurfDiaryDB", lambda: FakeDB())
+    monkeypatch.setattr(enrichment, "AsyncSurfDiaryDB", FakeDB)
+    monkeypatch.setattr(enrichment, "scan_pending_entries", lambda table, now: entries)
+    monkeypatch.setattr(enrichment, "enrich_entry", enrich_entry)
+    monkeypatch.setattr(enrichment.RUNTIME, "run", lambda func: asyncio.run(func(None)))
+    assert enrichment.scheduled_handler({}, None) == {
+        "enriched": 3,
+        "retrying": 1,
+        "errors": 1,
+    }
+    assert max(most_in_flight) == 2
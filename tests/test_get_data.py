@@ -0,0 +1,63 @@
+import asyncio
+import pytest
+from surf_data import SPOT_MAPPING, Spots
+from surf_data import get_data
+from surf_data.lib.buoys import ConditionReport
+from surf_data.lib.tides import TideData
+
+
+def test_get_spot_data_returns_partial_results(monkeypatch):
+    async def get_station_data(session, spot, start_time):
+        return ConditionReport(station_id=spot.nbdc_buoy_id)
+
+    async def slow_tide_data(session, spot, start_time):
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(get_data, "get_station_data", get_station_data)
+    monkeypatch.setattr(get_data, "get_tide_data", slow_tide_data)
+    conditions, tide = asyncio.run(
+        get_data.get_spot_data(
+            Spots.ocean_beach.value, session=object(), deadline_seconds=0.1
+        )
+    )
+    assert conditions == ConditionReport(station_id=46237)
+    assert tide is None
+
+
+def test_get_spot_data_raises_when_everything_fails(monkeypatch):
+    async def broken(session, spot, start_time):
+        raise ValueError("no data")
+
+    monkeypatch.setattr(get_data, "get_station_data", broken)
+    monkeypatch.setattr(get_data, "get_tide_data", broken)
+    with pytest.raises(ValueError):
+        asyncio.run(get_data.get_spot_data(Spots.ocean_beach.value, session=object()))
+
+
+def test_get_all_spot_data_fetches_each_station_once(monkeypatch):
+    buoy_calls = []
+    tide_calls = []
+
+    async def get_station_data(session, spot, start_time):
+        buoy_calls.append(spot.nbdc_buoy_id)
+        return ConditionReport(station_id=spot.nbdc_buoy_id)
+
+    async def get_tide_data(session, spot, start_time):
+        tide_calls.append(spot.noaa_tide_station_id)
+        if spot.noaa_tide_station_id == 9414290:
+            raise ValueError("no tides today")
+        return TideData("3.0", "0.5")
+
+    monkeypatch.setattr(get_data, "get_station_data", get_station_data)
+    monkeypatch.setattr(get_data, "get_tide_data", get_tide_data)
+    all_spot_data = asyncio.run(get_data.get_all_spot_data(session=object()))
+    assert sorted(buoy_calls) == [46012, 46059, 46237]
+    assert sorted(tide_calls) == [9413450, 9414290]
+    assert set(all_spot_data) == set(SPOT_MAPPING)
+    pacifica_conditions, pacifica_tide = all_spot_data[Spots.pacifica.value]
+    montara_conditions, _ = all_spot_data[Spots.montara.value]
+    assert pacifica_conditions == montara_conditions == ConditionReport(station_id=46012)
+    # every spot gets its own copy
+    assert pacifica_conditions is not montara_conditions
+    assert pacifica_tide == TideData("3.0", "0.5")
+    assert all_spot_data[Spots.ocean_beach.value][1] is None
@@ -0,0 +1,69 @@
+from surf_data.migrate_diary_items import migrate_items
+
+
+class FakeBatch:
+    def __init__(self, table):
+        self.table = table
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def put_item(self, Item):
+        self.table.put_items.append(Item)
+
+
+class FakeTable:
+    """
+    Hands out the items two pages at a time, like a paginated scan.
+    """
+
+    def __init__(self, items):
+        self.items = items
+        self.put_items = []
+
+    def scan(self, FilterExpression, ExclusiveStartKey=0):
+        page = [
+            item
+            for item in self.items[ExclusiveStartKey:ExclusiveStartKey + 2]
+            if "v" not in item
+        ]
+        resp = {"Items": page}
+        if ExclusiveStartKey + 2 < len(self.items):
+            resp["LastEvaluatedKey"] = ExclusiveStartKey + 2
+        return resp
+
+    def batch_writer(self, overwrite_by_pkeys):
+        return FakeBatch(self)
+
+
+def make_item(day, **attributes):
+    return {
+        "spot_name": "Ocean Beach",
+        "entry_date": f"2022-09-0{day} 17:00:00",
+        "rating": "fair",
+        "notes": "fun",
+        **attributes,
+    }
+
+
+def test_migration_rewrites_only_old_items():
+    table = FakeTable(
+        [
+            make_item(1, station_id=46237, tide_height="3.1", tide_rate_of_change="1"),
+            make_item(2, v=1),
+            make_item(3, wind_speed=None),
+        ]
+    )
+    assert migrate_items(table, dry_run=True) == 2
+    assert table.put_items == []
+    assert migrate_items(table) == 2
+    assert [item["entry_date"] for item in table.put_items] == [
+        "2022-09-01 17:00:00",
+        "2022-09-03 17:00:00",
+    ]
+    assert table.put_items[0]["v"] == 1
+    assert table.put_items[0]["buoy"] == 46237
+    assert "wind_speed" not in table.put_items[1]
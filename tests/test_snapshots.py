@@ -0,0 +1,90 @@
+import asyncio
+import time
+import pytest
+from surf_data import Spots
+from surf_data import snapshots
+from surf_data.lib.buoys import ConditionReport
+from surf_data.lib.record_helpers import DataPoint
+from surf_data.lib.spectra import SwellPartition
+from surf_data.lib.tides import TideData
+from surf_data.snapshots import SnapshotRegistry, SpotSnapshot
+
+
+def make_snapshot(age: float) -> SpotSnapshot:
+    return SpotSnapshot(
+        spot_name=Spots.ocean_beach.value,
+        generated_at=round(time.time() - age, 3),
+        conditions=ConditionReport(
+            station_id=46237,
+            swell_height=DataPoint("1.4", "m"),
+            swell_direction=DataPoint("WNW", "-"),
+            swell_partitions=(
+                SwellPartition(
+                    DataPoint("0.6", "m"),
+                    DataPoint("16.7", "sec"),
+                    DataPoint("195", "degT"),
+                ),
+                SwellPartition(DataPoint("0.3", "m"), DataPoint("8.0", "sec")),
+            ),
+            record_offset_seconds=1200.0,
+        ),
+    )
+
+
+def test_snapshot_round_trips_through_the_database_item():
+    snapshot = make_snapshot(age=0)
+    item = snapshot.serialize_for_database()
+    assert SpotSnapshot.from_database_item(item) == snapshot
+
+
+def run_on_new_loop(func):
+    return asyncio.run(func(None))
+
+
+def test_spot_checks_use_the_snapshot_with_the_tide_for_now(monkeypatch):
+    registry = SnapshotRegistry()
+    tide_times = []
+    monkeypatch.setattr(snapshots, "SNAPSHOTS", registry)
+    monkeypatch.setattr(snapshots.RUNTIME, "run", run_on_new_loop)
+
+    async def get_tide_data(session, spot, start_time):
+        tide_times.append(start_time)
+        return TideData("1.0", "0.2")
+
+    async def get_spot_data(*args, **kwargs):
+        raise AssertionError("the snapshot should have been used")
+
+    monkeypatch.setattr(snapshots, "get_tide_data", get_tide_data)
+    monkeypatch.setattr(snapshots, "get_spot_data", get_spot_data)
+
+    registry.save_all([make_snapshot(age=60)])
+    conditions, tide = snapshots.get_spot_snapshot(Spots.ocean_beach.value)
+    assert conditions.station_id == 46237
+    assert tide == TideData("1.0", "0.2")
+    assert abs(tide_times[0].timestamp() - time.time()) < 5
+
+    # older snapshots are still served as is, the prewarm job refreshes them
+    stale_age = snapshots.SnapshotConfig.REFRESH_AFTER_SECONDS + 1
+    registry.save_all([make_snapshot(age=stale_age)])
+    conditions, _ = snapshots.get_spot_snapshot(Spots.ocean_beach.value)
+    assert conditions.station_id == 46237
+
+
+def test_spot_checks_fetch_live_without_a_usable_snapshot(monkeypatch):
+    registry = SnapshotRegistry()
+    monkeypatch.setattr(snapshots, "SNAPSHOTS", registry)
+    live = (ConditionReport(station_id=46237), TideData("1.0", "0.2"))
+    monkeypatch.setattr(snapshots.RUNTIME, "run", lambda func: live)
+
+    too_old = snapshots.SnapshotConfig.MAX_AGE_SECONDS + 1
+    registry.save_all([make_snapshot(age=too_old)])
+    assert snapshots.get_spot_snapshot(Spots.ocean_beach.value) == live
+    # and the live conditions become the new snapshot
+    assert registry.get(Spots.ocean_beach.value).conditions == live[0]
+
+
+def test_prewarm_needs_a_table(monkeypatch):
+    monkeypatch.setattr(snapshots, "SNAPSHOTS", SnapshotRegistry())
+    monkeypatch.setattr(snapshots.RUNTIME, "run", lambda func: 1 / 0)
+    with pytest.raises(ValueError):
+        snapshots.prewarm_handler({}, None)